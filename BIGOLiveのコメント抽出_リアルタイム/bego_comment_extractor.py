@@ -4,39 +4,99 @@
 BIGO LIVEストリームコメント抽出ツール
 """
 
-from selenium import webdriver
+import time
+
+# 起動時間の計測（--startup-profile）の起点
+SCRIPT_STARTED_AT = time.perf_counter()
+
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import StaleElementReferenceException
-from webdriver_manager.chrome import ChromeDriverManager
-import time
-import csv
-import pandas as pd
 from datetime import datetime
 import os
+import sys
 import argparse
 
-def extract_comments(url, duration_minutes=10, output_file="bigo_comments.csv", headless=False):
+# 共通モジュール（リポジトリ直下のcomment_capture）を読み込めるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from comment_capture.browser import create_driver
+from comment_capture.startup import StartupProfiler
+from comment_capture.platforms import BIGO, stream_id_from_url
+from comment_capture.dedup import CommentDeduplicator
+from comment_capture.capture import PRUNE_KEEP, poll_comments, install_comment_observer, drain_comment_observer
+from comment_capture.network import NetworkCapture, enable_network_capture
+from comment_capture.sinks import OUTPUT_FORMATS, create_sink
+from comment_capture.writer import GroupCommitWriter
+from comment_capture.summary import CommentSummary
+from comment_capture.scheduler import AdaptiveInterval
+from comment_capture.lean import enable_lean_profile, apply_lean_profile
+from comment_capture.watchdog import RECYCLE_MODES, MemoryWatchdog
+from comment_capture.stream_end import StreamEndDetector
+from comment_capture.calibration import SelectorPlanner
+from comment_capture.metrics import CaptureMetrics, MetricsExporter, MetricsRegistry
+from comment_capture.replay import TickRecorder
+from comment_capture.store import CommentStore
+from comment_capture.fanout import FanoutServer
+from comment_capture.console import CommentConsole
+
+def extract_comments(url, duration_minutes=10, output_file="bigo_comments.csv", headless=False, observer=False, startup_profile=False, network=False,
+                     flush_ms=200, fsync=False, output_format="csv",
+                     approx_summary=False, min_interval=0.5, max_interval=10, lean=False,
+                     max_heap_mb=1024, max_rss_mb=4096, recycle_mode="tab", until_end=False,
+                     metrics_port=None, stats_file=None,
+                     repoll_on_loss=False, record_file=None, serve_port=None, serve_replay=100,
+                     console_mode="normal"):
     """
     指定したBIGO LIVEのURLからコメントを抽出する
     
     Parameters:
         url (str): BIGO LIVEのライブストリームURL
-        duration_minutes (int): 抽出を実行する時間（分）
+        duration_minutes (float): 抽出を実行する時間（分）
         output_file (str): 出力するCSVファイル名
         headless (bool): ヘッドレスモードを使用するかどうか
+        observer (bool): MutationObserverで追加されたコメントだけを取得するかどうか
+        startup_profile (bool): 起動から最初のコメント取得までの時間の内訳を表示するかどうか
+        network (bool): 受信したWebSocketのフレームからコメントを取得するかどうか
+        flush_ms (float): コメントを取得してからファイルに書き込むまでの最大の待ち時間（ミリ秒）
+        fsync (bool): 書き込みのたびにディスクへの書き込みまで待つかどうか
+        output_format (str): 出力形式（"csv"、"parquet"、"arrow"、"sqlite"）
+        approx_summary (bool): ユニークユーザー数と上位ユーザーを固定メモリで概算するかどうか
+        min_interval (float): コメントを取得する間隔の最短値（秒）
+        max_interval (float): コメントを取得する間隔の最長値（秒）
+        lean (bool): 映像・画像・フォント・トラッカーの読み込みを止めるかどうか
+        max_heap_mb (float): タブを作り直すJavaScriptのヒープ使用量（MB、0の場合は調べない）
+        max_rss_mb (float): タブを作り直すChromeの全プロセスのRSSの合計（MB、0の場合は調べない）
+        recycle_mode (str): タブの作り直し方（"tab" または "reload"）
+        until_end (bool): 時間で止めず、配信が終了するか停止（Ctrl+C）するまで抽出を続けるかどうか
+            （取得済みのコメント要素はページから取り除き、1回の取得の負荷を一定に保つ）
+        metrics_port (int): 取得ループの計測値をPrometheusの形式で出力するHTTPのポート（Noneの場合は出力しない）
+        stats_file (str): 取得ループの計測値を10秒ごとにJSON Linesで追記するファイル（Noneの場合は出力しない）
+        repoll_on_loss (bool): 取得する前に流れて消えたコメントがあった場合に、待たずにすぐ取得し直すかどうか
+        record_file (str): 取得1回ごとの結果（重複判定の前のコメントの配列と時刻）を追記するファイル
+            （comment_capture.replayで再生できる。Noneの場合は記録しない）
+        serve_port (int): 新しいコメントをWebSocketとServer-Sent Eventsで配信するポート（Noneの場合は配信しない）
+        serve_replay (int): 配信の購読者の接続時に送る直近のコメント数
+        console_mode (str): コンソールの表示方法（"normal": コメントを1件ずつ表示 / "quiet": 10秒ごとに件数だけ表示 /
+            "dashboard": 流量・直近のコメント・上位ユーザー・取得の状態の画面を一定間隔で描き直す）
     
     Returns:
         int: 抽出したコメントの総数
     """
+    profiler = StartupProfiler(startup_profile, SCRIPT_STARTED_AT)
+    profiler.mark("モジュール読み込み")
+    
     print("コメント抽出を開始します...")
     print(f"対象URL: {url}")
-    print(f"実行時間: {duration_minutes}分")
+    print(f"実行時間: {'配信の終了まで（Ctrl+Cで停止）' if until_end else f'{duration_minutes}分'}")
     print(f"出力ファイル: {output_file}")
+    print(f"出力形式: {output_format}")
     print(f"ヘッドレスモード: {'有効' if headless else '無効'}")
+    print(f"監視モード: {'有効' if observer else '無効'}")
+    print(f"取得間隔: {min_interval}〜{max_interval}秒（コメントの流量に合わせて調整）")
+    print(f"ネットワーク取得: {'有効' if network else '無効'}")
+    print(f"軽量プロファイル: {'有効' if lean else '無効'}")
     
     # Chromeの設定
     chrome_options = Options()
@@ -52,21 +112,60 @@ def extract_comments(url, duration_minutes=10, output_file="bigo_comments.csv",
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-dev-shm-usage")
     
-    # ChromeDriverの自動インストールとサービスの設定
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
+    # WebSocketのフレームを受け取るためにパフォーマンスログを有効にする
+    if network:
+        enable_network_capture(chrome_options)
     
-    # CSVファイルを準備
-    with open(output_file, 'w', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        writer.writerow(['タイムスタンプ', 'ユーザー名', 'コメント'])
+    # 映像・画像・フォントなどの読み込みを止めて、CPUとメモリの使用量を減らす
+    if lean:
+        enable_lean_profile(chrome_options, BIGO)
+    
+    # 出力ファイルを準備（書き込みは専用のスレッドでまとめて行い、取得ループはファイルへの書き込みを待たない）
+    sink = create_sink(output_format, output_file, BIGO, url)
+    with GroupCommitWriter(sink, max_delay_ms=flush_ms, fsync=fsync) as writer:
+        
+        # 取得済みのコメントを判定する（メモリ使用量は一定で、同じ内容の連投も残す）
+        deduplicator = CommentDeduplicator()
+        
+        # 抽出結果の概要は取得しながら集計する（終了時に出力ファイルを読み直さない）
+        summary = CommentSummary(BIGO, approx_summary)
         
-        # 前回取得したコメントを記録するセット
-        previous_comments = set()
+        # 実際のページで一致したセレクタだけを使う（保存済みの抽出プランがあればそれを使う）
+        planner = SelectorPlanner(BIGO)
         
+        # 取得ループの計測値（WebDriverの呼び出し時間、取得数、重複、遅れ、エラー）を記録して出力する
+        registry = MetricsRegistry()
+        metrics = registry.register(CaptureMetrics(BIGO.name, stream_id_from_url(url), writer))
+        # 直近のコメントを保持する（計測値のHTTPエンドポイントの /recent と --serve の接続時の送信に使う）
+        store = CommentStore()
+        recent = store.stream(BIGO.name, stream_id_from_url(url))
+        exporter = MetricsExporter(registry, metrics_port, stats_file, store=store)
+        
+        # 途中で失敗してもブラウザや出力のスレッドが残らないように、起動はtryの中で行いfinallyで閉じる
+        recorder = None
+        fanout = None
+        driver = None
         try:
+            exporter.start()
+            
+            # 取得1回ごとの結果を記録する（ブラウザなしで後段の処理を再生できるようにする）
+            if record_file:
+                mode = "network" if network else "observer" if observer else "cursor"
+                recorder = TickRecorder(record_file, BIGO, url, mode)
+            
+            # 新しいコメントをローカルの購読者に配信する（接続時には直近のコメントも送る）
+            if serve_port is not None:
+                fanout = FanoutServer(serve_port, recent, f"{BIGO.name}:{stream_id_from_url(url)}", serve_replay)
+                fanout.start()
+            
+            # ChromeDriverの準備（キャッシュが有効ならネットワークに接続しない）とブラウザの起動
+            driver = create_driver(chrome_options, profiler)
+            if lean:
+                apply_lean_profile(driver, BIGO)
+            
             # URLにアクセス
             driver.get(url)
+            profiler.mark("ページへのアクセス")
             print("ページにアクセスしました。コメント領域を探しています...")
             
             # まずコメント領域が表示されるまで待機（最大20秒）
@@ -88,7 +187,9 @@ def extract_comments(url, duration_minutes=10, output_file="bigo_comments.csv",
                 except Exception as e2:
                     print(f"代替セレクタでも検出できませんでした: {str(e2)}")
                     print("ページのHTMLを確認してください。")
-                    return 0
+                    if not network:
+                        return 0
+                    print("ネットワークから取得するため、このまま続行します")
             
             # ポップアップや同意ボタンがあれば処理
             try:
@@ -103,158 +204,157 @@ def extract_comments(url, duration_minutes=10, output_file="bigo_comments.csv",
             except Exception as e:
                 print(f"ボタン処理中にエラーが発生しました: {str(e)}")
             
-            # 指定時間（デフォルト10分）実行
-            end_time = time.time() + (duration_minutes * 60)
+            profiler.mark("コメント領域の待機")
+            
+            # 指定時間（デフォルト10分）実行（配信の終了まで抽出する場合は時間で止めない）
+            end_time = float("inf") if until_end else time.time() + (duration_minutes * 60)
             total_comments = 0
             
-            print(f"コメントの抽出を開始します。{duration_minutes}分間実行します...")
+            if until_end:
+                print("コメントの抽出を開始します。配信が終了するまで実行します（Ctrl+Cで停止）...")
+            else:
+                print(f"コメントの抽出を開始します。{duration_minutes}分間実行します...")
             
-            while time.time() < end_time:
-                try:
-                    # コメント領域を毎回取得し直す (stale element対策)
-                    comment_container = driver.find_element(By.CLASS_NAME, "chat__container")
-                    
-                    # JavaScriptを使ってコメントデータを抽出
-                    driver.execute_script("""
-                    (function() {
-                        // メモリにコメントデータを保存
-                        window.commentData = [];
-                        var commentContainer = document.querySelector(".chat__container");
-                        if (!commentContainer) return;
+            # 配信の終了まで抽出する場合は、配信の終了を判定し、取得済みのコメント要素をページから取り除く
+            stream_end = StreamEndDetector(BIGO) if until_end else None
+            keep = PRUNE_KEEP if until_end else 0
+            
+            # ネットワーク取得モードではDOMを解析せず、受信したフレームを解析する
+            network_capture = NetworkCapture(driver, BIGO) if network else None
+            
+            # 取得間隔はコメントの流量と表示中のコメント数に合わせて調整する
+            scheduler = AdaptiveInterval(3, min_interval, max_interval, repoll_on_loss=repoll_on_loss)
+            window = {}
+            
+            # ブラウザのメモリ使用量を監視し、上限を超えたらタブを作り直す（重複判定の状態は引き継ぐ）
+            watchdog = MemoryWatchdog(url, BIGO, deduplicator, max_heap_mb, max_rss_mb, mode=recycle_mode,
+                                      prepare_tab=(lambda d: apply_lean_profile(d, BIGO)) if lean else None)
+            
+            # 監視モードではコメント領域にMutationObserverを設置する
+            if observer and not network:
+                install_comment_observer(driver, planner.resolve(driver), keep)
+            
+            # コンソールの表示（quiet / dashboardではコメントの数に関係なく表示の負荷を一定にする）
+            console = CommentConsole(BIGO, console_mode, f"{BIGO.name}:{stream_id_from_url(url)}",
+                                     summary, metrics)
+            console.start()
+            
+            try:
+                while time.time() < end_time:
+                    try:
+                        metrics.begin_tick()
+                        with metrics.timer("webdriver_call"):
+                            if network:
+                                # 前回から受信したフレームのコメントを取り出す（画面外に流れたコメントも含む）
+                                comment_data = network_capture.poll()
+                            elif observer:
+                                # ページ内のキューから追加されたコメントだけを取り出す
+                                comment_data = drain_comment_observer(driver, BIGO)
+                                if comment_data is None:
+                                    # ページの再読み込みなどで監視が外れた場合は設置し直す
+                                    print("コメント領域の監視を再設定します...")
+                                    if not install_comment_observer(driver, planner.resolve(driver), keep):
+                                        time.sleep(1)
+                                    comment_data = []
+                            else:
+                                # 前回から増えたコメントだけを1回の呼び出しで取得する（スクロールも同時に行う）
+                                comment_data = poll_comments(driver, planner.resolve(driver), window, keep)
                         
-                        // コメント要素を探す - BIGO LIVEのコメント要素のセレクタを調整
-                        var commentElements = commentContainer.querySelectorAll(".chat-message, .message-item, [class*='message'], [class*='chat-item']");
+                        if recorder:
+                            recorder.record(comment_data)
                         
-                        // 各コメント要素から情報を抽出
-                        for (var i = 0; i < commentElements.length; i++) {
-                            var element = commentElements[i];
-                            
-                            // ユーザー名の抽出
-                            var username = "不明";
-                            var usernameSelectors = [
-                                ".username", ".user-name", ".author", 
-                                "[class*='username']", "[class*='user-name']", 
-                                "[class*='author']", "[class*='nick']"
-                            ];
-                            
-                            for (var j = 0; j < usernameSelectors.length; j++) {
-                                var usernameElem = element.querySelector(usernameSelectors[j]);
-                                if (usernameElem && usernameElem.textContent.trim()) {
-                                    username = usernameElem.textContent.trim();
-                                    break;
-                                }
-                            }
-                            
-                            // コメントテキストの抽出
-                            var commentText = "";
-                            var commentSelectors = [
-                                ".message-content", ".content", ".text", 
-                                "[class*='message-content']", "[class*='content']", 
-                                "[class*='text']", "[class*='comment']"
-                            ];
-                            
-                            for (var k = 0; k < commentSelectors.length; k++) {
-                                var commentElem = element.querySelector(commentSelectors[k]);
-                                if (commentElem && commentElem.textContent.trim()) {
-                                    commentText = commentElem.textContent.trim();
-                                    break;
-                                }
-                            }
-                            
-                            // コメントが空の場合、要素全体のテキストを使用
-                            if (!commentText) {
-                                var fullText = element.textContent.trim();
-                                // ユーザー名部分を除外
-                                if (username !== "不明" && fullText.includes(username)) {
-                                    commentText = fullText.replace(username, "").trim();
-                                } else {
-                                    commentText = fullText;
-                                }
-                            }
-                            
-                            // 空のコメントはスキップ
-                            if (!commentText) continue;
-                            
-                            // コメントの最終クリーンアップ
-                            // コロン、矢印などの区切り文字を削除
-                            commentText = commentText.replace(/^[：:》>]/, '').trim();
-                            
-                            // 結果を保存
-                            window.commentData.push({
-                                username: username,
-                                comment: commentText
-                            });
-                        }
-                    })();
-                    """)
-                    
-                    # JavaScriptから結果を取得
-                    comment_data = driver.execute_script("return window.commentData;")
-                    
-                    new_comments_count = 0
-                    
-                    if comment_data:
-                        for item in comment_data:
-                            username = item.get('username', '不明')
-                            comment_text = item.get('comment', '')
-                            
-                            # 空のコメントはスキップ
-                            if not comment_text:
-                                continue
-                            
-                            # ユニークな識別子を作成
-                            comment_id = f"{username}:{comment_text}"
-                            
+                        # カーソル方式では、取得する前にページから流れて消えたコメント（取り逃がし）も数える
+                        lost = 0
+                        if not (network or observer):
+                            lost = window.get("lost", 0)
+                            if window.get("js_seconds") is not None:
+                                metrics.observe("js_extract", window["js_seconds"])
+                        
+                        new_comments_count = 0
+                        new_rows = deduplicator.filter(comment_data) if comment_data else []
+                        
+                        if new_rows:
                             # 新しいコメントのみを処理
-                            if comment_id not in previous_comments:
+                            for username, comment_text in new_rows:
+                                # 空のコメントはスキップ
+                                if not comment_text:
+                                    continue
+                                
                                 timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                                writer.writerow([timestamp, username, comment_text])
-                                file.flush()  # すぐにファイルに書き込む
-                                previous_comments.add(comment_id)
+                                row = [timestamp, username, comment_text]
+                                writer.put(row)
+                                summary.add(row)
+                                comment = recent.add_row(BIGO, row)
+                                if fanout:
+                                    fanout.publish(comment)
                                 new_comments_count += 1
                                 total_comments += 1
-                                print(f"{timestamp} - {username}: {comment_text}")
-                    
-                    if new_comments_count > 0:
-                        print(f"{new_comments_count}件の新しいコメントを検出しました。合計: {total_comments}件")
-                    
-                    # コメント欄が動的に更新される場合、スクロールして新しいコメントを表示
-                    try:
-                        # コメント領域をスクロール（BIGO LIVEでは下部に新しいコメントが表示される場合が多い）
-                        driver.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight;", comment_container)
+                                if total_comments == 1:
+                                    profiler.mark("最初のコメント取得")
+                                    profiler.report()
+                                console.comment(row)
+                        
+                        # 監視モード以外は今回の取得数から次の取得までの間隔を決める
+                        if not observer or network:
+                            scheduler.update(comment_data, None if network else window.get("visible"), lost)
+                        # 監視モードの目標の間隔はキューの取り出しの待ち時間（1秒）
+                        metrics.end_tick(comment_data, len(new_rows),
+                                         1.0 if observer and not network else scheduler.interval, lost)
+                        if lost and console.mode != "quiet":
+                            print(f"取得する前に{lost}件のコメントが流れて消えました"
+                                  f"（取り逃がしの割合: {metrics.loss_rate():.1%}）")
+                        
+                        console.tick(new_comments_count, total_comments)
+                        
+                        # メモリ使用量が上限を超えていればタブを作り直す（監視モードは次の取り出しで設置し直す）
+                        if watchdog.check(driver) and recorder:
+                            recorder.record_gap()
+                        
+                        # 配信が終了した場合は抽出を終える
+                        if stream_end and stream_end.check(driver, comment_data):
+                            break
+                        
+                        # 監視モードではキューの取り出し時に待機を行う
+                        if observer and not network:
+                            continue
+                        
                     except Exception as e:
-                        print(f"スクロールエラー: {str(e)}")
+                        metrics.record_error(e)
+                        print(f"エラーが発生しました: {str(e)}")
                     
-                except Exception as e:
-                    print(f"エラーが発生しました: {str(e)}")
-                
-                # 次のチェックまで待機
-                time.sleep(3)
-                
+                    # 次のチェックまで待機（間隔はコメントの流量に合わせて調整する）
+                    time.sleep(scheduler.delay())
+            except KeyboardInterrupt:
+                # Ctrl+Cで停止した場合も、書き込み待ちのコメントを保存して概要を表示する
+                print("\n抽出を停止しました。")
+            finally:
+                # dashboardの画面を閉じてから結果を表示する
+                console.close()
+            
+            profiler.report()
             print(f"コメント抽出を終了しました。合計{total_comments}件のコメントを保存しました。")
-            print(f"結果は {output_file} に保存されています。")
+            if metrics.lost:
+                print(f"取り逃がしたコメント（推定）: {metrics.lost}件（{metrics.loss_rate():.1%}）")
             
         finally:
             # ブラウザを閉じる
-            driver.quit()
+            if driver:
+                driver.quit()
+            exporter.close()
+            if recorder:
+                recorder.close()
+            if fanout:
+                fanout.close()
             
-    # 結果をPandasで整形して表示
-    if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
-        df = pd.read_csv(output_file)
-        print("\n=== 抽出結果の概要 ===")
-        print(f"合計コメント数: {len(df)}")
-        if not df.empty:
-            print(f"ユニークユーザー数: {df['ユーザー名'].nunique()}")
-            print(f"最初のコメント時間: {df['タイムスタンプ'].iloc[0]}")
-            print(f"最後のコメント時間: {df['タイムスタンプ'].iloc[-1]}")
-            print("\n最初の5件のコメント:")
-            print(df.head(5)[['タイムスタンプ', 'ユーザー名', 'コメント']])
-            
-            # トップユーザーの表示
-            print("\n最もコメントの多いユーザー（上位5名）:")
-            top_users = df['ユーザー名'].value_counts().head(5)
-            for user, count in top_users.items():
-                print(f"{user}: {count}件")
+    print(writer.summary())
+    # 出力形式によってはファイル名が変わる（Parquet / Arrowは切り替えた全てのファイル）ため、書き込んだファイルを表示する
+    if sink.paths():
+        print(f"結果は {', '.join(sink.paths())} に保存されています。")
+    else:
+        print("保存したコメントがないため、出力ファイルは作成されていません。")
+    
+    # 結果の概要を表示（集計済みの値を使う）
+    summary.print_report()
     
     return total_comments
 
@@ -263,12 +363,56 @@ def main():
     # コマンドライン引数の設定
     parser = argparse.ArgumentParser(description='BIGO LIVEストリームからコメントを抽出するツール')
     parser.add_argument('url', help='抽出対象のBIGO LIVEストリームURL')
-    parser.add_argument('-t', '--time', type=int, default=10, 
+    parser.add_argument('-t', '--time', type=float, default=10, 
                         help='抽出時間（分）。デフォルトは10分')
     parser.add_argument('-o', '--output', default='bigo_comments.csv',
                         help='出力CSVファイル名。デフォルトはbigo_comments.csv')
     parser.add_argument('--headless', action='store_true',
                         help='ヘッドレスモードで実行（ブラウザウィンドウを表示しない）')
+    parser.add_argument('--observer', action='store_true',
+                        help='MutationObserverで追加されたコメントだけを即座に取得する（ポーリングしない）')
+    parser.add_argument('--startup-profile', action='store_true',
+                        help='起動から最初のコメント取得までの時間の内訳を表示する')
+    parser.add_argument('--network', action='store_true',
+                        help='DOMではなく受信したWebSocketのフレームからコメントを取得する')
+    parser.add_argument('--flush-ms', type=float, default=200,
+                        help='コメントを取得してからファイルに書き込むまでの最大の待ち時間（ミリ秒）。デフォルトは200')
+    parser.add_argument('--fsync', action='store_true',
+                        help='書き込みのたびにディスクへの書き込みまで待つ（停電などでも失うコメントを減らす）')
+    parser.add_argument('--approx-summary', action='store_true',
+                        help='ユニークユーザー数と上位ユーザーを固定メモリで概算する（長時間の配信向け）')
+    parser.add_argument('--min-interval', type=float, default=0.5,
+                        help='コメントを取得する間隔の最短値（秒）。デフォルトは0.5秒')
+    parser.add_argument('--max-interval', type=float, default=10,
+                        help='コメントがない時に延ばす取得間隔の最長値（秒）。デフォルトは10秒')
+    parser.add_argument('--lean', action='store_true',
+                        help='映像・画像・フォント・トラッカーの読み込みを止めてCPUとメモリの使用量を減らす')
+    parser.add_argument('--max-heap-mb', type=float, default=1024,
+                        help='タブを作り直すJavaScriptのヒープ使用量（MB）。0で無効。デフォルトは1024')
+    parser.add_argument('--max-rss-mb', type=float, default=4096,
+                        help='タブを作り直すChromeの全プロセスのメモリ使用量（MB、psutilが必要）。0で無効。デフォルトは4096')
+    parser.add_argument('--recycle', choices=RECYCLE_MODES, default='tab',
+                        help='メモリ使用量が上限を超えた時の作り直し方（tab: 新しいタブで開き直す / reload: 再読み込み）。デフォルトはtab')
+    parser.add_argument('--until-end', action='store_true',
+                        help='時間で止めず、配信が終了するか停止（Ctrl+C）するまで抽出を続ける（-tは無視する）')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv',
+                        help='出力形式。parquet / arrow / sqliteは共通の列で出力する（parquet / arrowはpyarrowが必要）。デフォルトはcsv')
+    parser.add_argument('--metrics-port', type=int,
+                        help='取得ループの計測値をPrometheusの形式で出力するHTTPのポート（http://127.0.0.1:ポート/metrics）')
+    parser.add_argument('--stats-file',
+                        help='取得ループの計測値を10秒ごとにJSON Linesで追記するファイル')
+    parser.add_argument('--repoll-on-loss', action='store_true',
+                        help='取得する前に流れて消えたコメントがあった場合に、待たずにすぐ取得し直す')
+    parser.add_argument('--record',
+                        help='取得1回ごとの結果を記録するファイル（.gzで圧縮）。python -m comment_capture.replay で再生できる')
+    parser.add_argument('--serve', type=int, metavar='PORT',
+                        help='新しいコメントを配信するポート（ws://127.0.0.1:ポート/ws と http://127.0.0.1:ポート/events）')
+    parser.add_argument('--serve-replay', type=int, default=100,
+                        help='配信の購読者の接続時に送る直近のコメント数。デフォルトは100')
+    parser.add_argument('--quiet', action='store_true',
+                        help='コメントを1件ずつ表示せず、10秒ごとに件数と流量だけを表示する（コメントが多い配信向け）')
+    parser.add_argument('--dashboard', action='store_true',
+                        help='流量・直近のコメント・上位ユーザー・取得の状態を一定間隔で描き直す画面で表示する（cursesが必要）')
     
     # 引数を解析
     args = parser.parse_args()
@@ -278,9 +422,36 @@ def main():
     duration_min = args.time
     output_file = args.output
     headless_mode = args.headless
+    observer_mode = args.observer
+    startup_profile = args.startup_profile
+    network_mode = args.network
+    flush_ms = args.flush_ms
+    fsync = args.fsync
+    output_format = args.format
+    approx_summary = args.approx_summary
+    min_interval = args.min_interval
+    max_interval = args.max_interval
+    lean = args.lean
+    max_heap_mb = args.max_heap_mb
+    max_rss_mb = args.max_rss_mb
+    recycle_mode = args.recycle
+    until_end = args.until_end
+    metrics_port = args.metrics_port
+    stats_file = args.stats_file
+    repoll_on_loss = args.repoll_on_loss
+    record_file = args.record
+    serve_port = args.serve
+    serve_replay = args.serve_replay
+    console_mode = "dashboard" if args.dashboard else "quiet" if args.quiet else "normal"
     
-    # コメント抽出実行
-    extract_comments(target_url, duration_min, output_file, headless_mode)
+    # コメント抽出実行（オプションの順番を取り違えないように、名前を付けて渡す）
+    extract_comments(url=target_url, duration_minutes=duration_min, output_file=output_file, headless=headless_mode,
+                     observer=observer_mode, startup_profile=startup_profile, network=network_mode, flush_ms=flush_ms,
+                     fsync=fsync, output_format=output_format, approx_summary=approx_summary,
+                     min_interval=min_interval, max_interval=max_interval, lean=lean, max_heap_mb=max_heap_mb,
+                     max_rss_mb=max_rss_mb, recycle_mode=recycle_mode, until_end=until_end, metrics_port=metrics_port,
+                     stats_file=stats_file, repoll_on_loss=repoll_on_loss, record_file=record_file,
+                     serve_port=serve_port, serve_replay=serve_replay, console_mode=console_mode)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
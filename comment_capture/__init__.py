@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+ライブ配信コメント抽出ツールの共通モジュール
+
+whowatch / BIGO LIVE / Pococha の各抽出スクリプトから共通で利用する処理をまとめたものです。
+各スクリプトはリポジトリ直下をsys.pathに追加してから読み込みます。
+"""
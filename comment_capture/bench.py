@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+代替サーバーを使った抽出のベンチマーク
+
+ローカルの代替サーバー（comment_capture.standin）で各プラットフォームのコメント領域を再現し、
+取得方法（cursor / observer / network）ごとに同じ条件でコメントを抽出して次の値を比べます。
+インターネットに接続せずに実行できます。
+
+- 取得数 / 秒: 1秒あたりに取得できたコメント数
+- 遅延: コメントの送信から取得までの時間（p50 / p90 / p99、ミリ秒）
+- 取得率: 送信したコメントのうち取得できた割合（ページに残すコメント数を超えて消えた分は取り逃がしになる）
+- 重複: 同じコメントを2回以上取得した件数
+- 推定取り逃がし: カーソル方式で検出した取り逃がしの件数（実際の取り逃がし = 送信 - 取得 と比べて検出の精度を確かめる）
+- CPU / RSS: ブラウザ（Chromeの全プロセス）のCPU使用率とRSS（psutilがある場合）、抽出側のPythonのCPU使用率
+
+コメントには送信時のIDと時刻の印（[cc:ID:ミリ秒]）を付け、取得したコメントから読み取って数えます。
+
+使い方:
+    python -m comment_capture.bench [-p whowatch bigo pococha] [-m cursor observer network]
+        [--rate 20] [--pattern burst] [--max-items 100] [-s 60] [--headless]
+"""
+
+import argparse
+import math
+import time
+
+from comment_capture.browser import create_chrome_options, create_driver
+from comment_capture.capture import drain_comment_observer, install_comment_observer, poll_comments, prepare_page
+from comment_capture.dedup import CommentDeduplicator
+from comment_capture.lean_benchmark import BrowserResourceSampler
+from comment_capture.network import NetworkCapture, enable_network_capture
+from comment_capture.platforms import PLATFORMS
+from comment_capture.scheduler import AdaptiveInterval
+from comment_capture.standin import PATTERNS, StandInServer, parse_marker
+
+MODES = ("cursor", "observer", "network")
+
+
+def percentile(values, ratio):
+    """
+    値の百分位数を返す（最近傍法）
+
+    Parameters:
+        values (list): 昇順に並べた値のリスト
+        ratio (float): 0〜1の割合
+
+    Returns:
+        float: 百分位数（値がない場合はNone）
+    """
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, math.ceil(ratio * len(values)) - 1))]
+
+
+class _Fetcher:
+    """
+    取得方法ごとに1回分のコメントを取り出す
+
+    Parameters:
+        driver: Selenium WebDriver
+        platform (Platform): 対象プラットフォームの設定
+        mode (str): 取得方法（"cursor" / "observer" / "network"）
+        min_interval (float): 取得間隔の下限（秒）
+        max_interval (float): 取得間隔の上限（秒）
+    """
+
+    def __init__(self, driver, platform, mode, min_interval=0.5, max_interval=10):
+        self.driver = driver
+        self.platform = platform
+        self.mode = mode
+        self.scheduler = AdaptiveInterval(floor=min_interval, ceiling=max_interval, verbose=False)
+        self.network = NetworkCapture(driver, platform) if mode == "network" else None
+        self.installed = False
+        self.lost = 0
+
+    def fetch(self):
+        """
+        コメントを取り出す（取得方法に合わせて次の取得まで待機する）
+
+        Returns:
+            list: [固有キー, 値...] のリスト（コメント領域が見つからない場合は空のリスト）
+        """
+        if self.mode == "observer":
+            if not self.installed:
+                self.installed = install_comment_observer(self.driver, self.platform)
+                if not self.installed:
+                    prepare_page(self.driver, self.platform)
+                    time.sleep(0.5)
+                    return []
+            rows = drain_comment_observer(self.driver, self.platform)
+            if rows is None:
+                self.installed = False
+                return []
+            return rows
+
+        if self.mode == "network":
+            rows = self.network.poll()
+            self.scheduler.update(rows)
+        else:
+            window = {}
+            rows = poll_comments(self.driver, self.platform, window)
+            if rows is None:
+                prepare_page(self.driver, self.platform)
+                rows = []
+            self.lost += window.get("lost", 0)
+            self.scheduler.update(rows, window.get("visible"), window.get("lost", 0))
+        time.sleep(self.scheduler.interval)
+        return rows
+
+
+def run_case(platform, mode, rate=20, pattern="steady", burst_rate=None, burst_every=30, burst_seconds=5,
+             max_items=100, seconds=60, warmup=5, drain=5, headless=False, seed=1):
+    """
+    1つのプラットフォームと取得方法の組み合わせでベンチマークを実行する
+
+    Parameters:
+        platform (Platform): 再現するプラットフォームの設定
+        mode (str): 取得方法（"cursor" / "observer" / "network"）
+        rate (float): 1秒あたりのコメント数
+        pattern (str): 送信間隔のパターン（"steady" / "poisson" / "burst"）
+        burst_rate (float): burstの間の1秒あたりのコメント数
+        burst_every (float): burstの間隔（秒）
+        burst_seconds (float): 1回のburstの長さ（秒）
+        max_items (int): ページに残すコメント数（0の場合は消さない）
+        seconds (float): コメントを送信する時間（秒）
+        warmup (float): ページを開いてから送信を始めるまでの時間（秒）
+        drain (float): 送信を止めてから取得を続ける時間（秒）
+        headless (bool): ヘッドレスモードを使用するかどうか
+        seed (int): 乱数の種
+
+    Returns:
+        dict: 計測結果
+    """
+    server = StandInServer(platform.name, rate, seed, pattern, burst_rate, burst_every, burst_seconds,
+                           max_items, marker=True)
+    server.sending = False
+    url = server.start_in_thread()
+
+    options = create_chrome_options(headless)
+    if mode == "network":
+        enable_network_capture(options)
+    driver = create_driver(options)
+    comment_index = platform.fields.index("comment")
+    deduplicator = CommentDeduplicator()
+    seen = set()
+    latencies = []
+    duplicates = 0
+
+    def collect(fetcher):
+        nonlocal duplicates
+        for values in deduplicator.filter(fetcher.fetch()):
+            marker = parse_marker(values[comment_index])
+            if marker is None:
+                continue
+            comment_id, sent_at = marker
+            if comment_id in seen:
+                duplicates += 1
+                continue
+            seen.add(comment_id)
+            latencies.append((time.time() - sent_at) * 1000)
+
+    try:
+        driver.get(url)
+        fetcher = _Fetcher(driver, platform, mode)
+        warmup_end = time.monotonic() + warmup
+        while time.monotonic() < warmup_end:
+            fetcher.fetch()
+
+        sampler = _start_sampler(driver)
+        cpu_started = time.process_time()
+        started = time.monotonic()
+        server.started_at = started
+        server.sending = True
+        while time.monotonic() - started < seconds:
+            collect(fetcher)
+            if sampler:
+                sampler.sample()
+        server.stop_sending()
+        sent_seconds = time.monotonic() - started
+
+        # 送信済みのコメントが届くまで取得を続ける
+        drain_end = time.monotonic() + drain
+        while time.monotonic() < drain_end and len(seen) < server.sent:
+            collect(fetcher)
+        elapsed = time.monotonic() - started
+        if sampler:
+            sampler.sample()
+        python_cpu = time.process_time() - cpu_started
+    finally:
+        driver.quit()
+        server.stop()
+
+    latencies.sort()
+    result = {
+        "sent": server.sent,
+        "captured": len(seen),
+        "duplicates": duplicates,
+        "lost_estimate": fetcher.lost if mode == "cursor" else None,
+        "completeness": len(seen) / server.sent if server.sent else None,
+        "throughput": len(seen) / sent_seconds,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p90": percentile(latencies, 0.9),
+        "latency_p99": percentile(latencies, 0.99),
+        "python_cpu_percent": python_cpu / elapsed * 100,
+        "cpu_percent": None,
+        "rss_mb_avg": None,
+        "rss_mb_max": None,
+    }
+    if sampler:
+        result["cpu_percent"] = sampler.cpu_seconds() / elapsed * 100
+        result["rss_mb_avg"] = sum(sampler.rss_samples) / len(sampler.rss_samples) / 1024 / 1024
+        result["rss_mb_max"] = max(sampler.rss_samples) / 1024 / 1024
+    return result
+
+
+def _start_sampler(driver):
+    """ブラウザのCPU時間とRSSの計測を始める（psutilがない場合はNone）"""
+    try:
+        sampler = BrowserResourceSampler(driver)
+    except ImportError as e:
+        print(f"{str(e)}（ブラウザのCPU / RSSは計測しません）")
+        return None
+    sampler.sample()
+    return sampler
+
+
+def _format(value, spec):
+    """値を書式化する（値がない場合は"-"）"""
+    return "-" if value is None else format(value, spec)
+
+
+def run_suite(platform_names, modes, seconds=60, **options):
+    """
+    各プラットフォームと取得方法の組み合わせでベンチマークを実行し、結果を表示する
+
+    Parameters:
+        platform_names (list): プラットフォーム名のリスト
+        modes (list): 取得方法のリスト
+        seconds (float): 1回のコメントを送信する時間（秒）
+        **options: run_caseに渡す設定（rate, pattern, max_itemsなど）
+
+    Returns:
+        list: (プラットフォーム名, 取得方法, 計測結果) のリスト
+    """
+    results = []
+    for name in platform_names:
+        for mode in modes:
+            print(f"[{name}] {mode}で{seconds}秒間計測します...")
+            results.append((name, mode, run_case(PLATFORMS[name], mode, seconds=seconds, **options)))
+
+    print("\n=== 抽出のベンチマーク ===")
+    print(f"{'プラットフォーム':<10} {'取得方法':<9} {'送信':>6} {'取得':>6} {'取得率':>7} {'重複':>5} {'推定取り逃がし':>8} {'件/秒':>7} "
+          f"{'p50(ms)':>8} {'p90(ms)':>8} {'p99(ms)':>8} {'CPU(%)':>7} {'RSS平均(MB)':>11} {'Python CPU(%)':>13}")
+    for name, mode, result in results:
+        completeness = None if result["completeness"] is None else result["completeness"] * 100
+        print(f"{name:<10} {mode:<9} {result['sent']:>6} {result['captured']:>6} {_format(completeness, '>6.1f')}% "
+              f"{result['duplicates']:>5} {_format(result['lost_estimate'], '>8')} {result['throughput']:>7.1f} "
+              f"{_format(result['latency_p50'], '>8.0f')} {_format(result['latency_p90'], '>8.0f')} "
+              f"{_format(result['latency_p99'], '>8.0f')} {_format(result['cpu_percent'], '>7.1f')} "
+              f"{_format(result['rss_mb_avg'], '>11.1f')} {result['python_cpu_percent']:>13.1f}")
+    return results
+
+
+def main():
+    """メイン関数"""
+    # コマンドライン引数の設定
+    parser = argparse.ArgumentParser(description='ローカルの代替サーバーで取得方法ごとの抽出性能を比べるツール')
+    parser.add_argument('-p', '--platforms', nargs='+', choices=sorted(PLATFORMS), default=sorted(PLATFORMS),
+                        help='計測するプラットフォーム。デフォルトは全て')
+    parser.add_argument('-m', '--modes', nargs='+', choices=MODES, default=list(MODES),
+                        help='計測する取得方法。デフォルトは全て')
+    parser.add_argument('--rate', type=float, default=20, help='1秒あたりのコメント数。デフォルトは20')
+    parser.add_argument('--pattern', choices=PATTERNS, default='steady',
+                        help='送信間隔のパターン（steady: 一定 / poisson: ランダム / burst: 一定の間隔で増える）。デフォルトはsteady')
+    parser.add_argument('--burst-rate', type=float,
+                        help='burstの間の1秒あたりのコメント数。デフォルトは--rateの10倍')
+    parser.add_argument('--burst-every', type=float, default=30, help='burstの間隔（秒）。デフォルトは30秒')
+    parser.add_argument('--burst-seconds', type=float, default=5, help='1回のburstの長さ（秒）。デフォルトは5秒')
+    parser.add_argument('--max-items', type=int, default=100,
+                        help='ページに残すコメント数（超えると古いものから消す）。デフォルトは100')
+    parser.add_argument('-s', '--seconds', type=float, default=60,
+                        help='1回のコメントを送信する時間（秒）。デフォルトは60秒')
+    parser.add_argument('--warmup', type=float, default=5,
+                        help='ページを開いてから送信を始めるまでの時間（秒）。デフォルトは5秒')
+    parser.add_argument('--drain', type=float, default=5,
+                        help='送信を止めてから取得を続ける時間（秒）。デフォルトは5秒')
+    parser.add_argument('--seed', type=int, default=1, help='乱数の種。デフォルトは1')
+    parser.add_argument('--headless', action='store_true',
+                        help='ヘッドレスモードで実行（ブラウザウィンドウを表示しない）')
+
+    # 引数を解析
+    args = parser.parse_args()
+
+    # ベンチマーク実行
+    run_suite(args.platforms, args.modes, args.seconds, rate=args.rate, pattern=args.pattern,
+              burst_rate=args.burst_rate, burst_every=args.burst_every, burst_seconds=args.burst_seconds,
+              max_items=args.max_items, warmup=args.warmup, drain=args.drain, headless=args.headless,
+              seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Chromeブラウザの起動
+
+ChromeDriverManager().install()は起動のたびにネットワークでドライバのバージョンを確認するため、
+解決したChromeDriverのパスとChromeのバージョンをローカルにキャッシュしておき、
+Chromeのメジャーバージョンが変わっていなければネットワークに接続せずに起動します。
+"""
+
+import json
+import os
+from datetime import datetime
+
+from selenium import webdriver
+from selenium.common.exceptions import SessionNotCreatedException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+# ChromeDriverのパスのキャッシュ
+DRIVER_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "comment_capture", "chromedriver.json")
+
+
+def create_chrome_options(headless=False, multi_tab=False, stealth=False):
+    """
+    コメント抽出用のChromeの設定を作成する
+
+    Parameters:
+        headless (bool): ヘッドレスモードを使用するかどうか
+        multi_tab (bool): 複数のタブを同時に監視するかどうか
+            （バックグラウンドのタブが間引かれないようにする）
+        stealth (bool): 自動操作であることを隠す設定を追加するかどうか（Pococha用）
+
+    Returns:
+        Options: Chromeの設定
+    """
+    chrome_options = Options()
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--disable-notifications")
+    chrome_options.add_argument("--mute-audio")
+
+    if multi_tab:
+        # 表示されていないタブでもタイマーや描画が止まらないようにする
+        chrome_options.add_argument("--disable-background-timer-throttling")
+        chrome_options.add_argument("--disable-backgrounding-occluded-windows")
+        chrome_options.add_argument("--disable-renderer-backgrounding")
+
+    if stealth:
+        chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        chrome_options.add_experimental_option('useAutomationExtension', False)
+
+    # ヘッドレスモードの設定
+    if headless:
+        chrome_options.add_argument("--headless")
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+
+    return chrome_options
+
+
+def detect_chrome_version():
+    """
+    インストールされているChromeのバージョンを調べる（ネットワークには接続しない）
+
+    Returns:
+        str: Chromeのバージョン。調べられない場合はNone
+    """
+    try:
+        from webdriver_manager.core.os_manager import OperationSystemManager, ChromeType
+        return OperationSystemManager().get_browser_version_from_os(ChromeType.GOOGLE)
+    except Exception:
+        return None
+
+
+def _major_version(version):
+    """バージョン文字列からメジャーバージョンを取り出す"""
+    return version.split(".")[0] if version else None
+
+
+def load_driver_cache():
+    """
+    キャッシュしたChromeDriverの情報を読み込む
+
+    Returns:
+        dict: キャッシュの内容（path / chrome_version / resolved_at）。ない場合はNone
+    """
+    try:
+        with open(DRIVER_CACHE_FILE, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def resolve_driver_path(refresh=False):
+    """
+    ChromeDriverのパスを返す
+
+    キャッシュが有効な場合（ファイルが存在し、Chromeのメジャーバージョンが一致する場合）は
+    ネットワークに接続せずにキャッシュしたパスを返します。
+
+    Parameters:
+        refresh (bool): キャッシュを使わずに解決し直すかどうか
+
+    Returns:
+        str: ChromeDriverのパス
+    """
+    chrome_version = detect_chrome_version()
+    cache = None if refresh else load_driver_cache()
+    if cache and os.path.exists(cache.get("path", "")):
+        cached_version = cache.get("chrome_version")
+        # Chromeのバージョンが調べられない場合もキャッシュを使う（起動に失敗したら解決し直す）
+        if chrome_version is None or _major_version(cached_version) == _major_version(chrome_version):
+            return cache["path"]
+
+    # ChromeDriverの自動インストール（ネットワークに接続する）
+    from webdriver_manager.chrome import ChromeDriverManager
+    path = ChromeDriverManager().install()
+    try:
+        os.makedirs(os.path.dirname(DRIVER_CACHE_FILE), exist_ok=True)
+        with open(DRIVER_CACHE_FILE, 'w', encoding='utf-8') as file:
+            json.dump({
+                "path": path,
+                "chrome_version": chrome_version,
+                "resolved_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }, file, ensure_ascii=False, indent=2)
+    except OSError as e:
+        print(f"ChromeDriverのキャッシュを保存できませんでした: {str(e)}")
+    return path
+
+
+def create_driver(chrome_options, profiler=None):
+    """
+    ChromeDriverを準備してブラウザを起動する
+
+    キャッシュしたChromeDriverで起動できなかった場合は、解決し直してからもう一度起動します。
+
+    Parameters:
+        chrome_options (Options): Chromeの設定
+        profiler (StartupProfiler): 起動時間の計測（省略可）
+
+    Returns:
+        WebDriver: 起動したブラウザ
+    """
+    driver_path = resolve_driver_path()
+    if profiler:
+        profiler.mark("ChromeDriverの準備")
+    try:
+        driver = webdriver.Chrome(service=Service(driver_path), options=chrome_options)
+    except SessionNotCreatedException:
+        print("キャッシュしたChromeDriverで起動できないため、ChromeDriverを解決し直します...")
+        driver_path = resolve_driver_path(refresh=True)
+        driver = webdriver.Chrome(service=Service(driver_path), options=chrome_options)
+    if profiler:
+        profiler.mark("ブラウザの起動")
+    return driver
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""
+セレクタの自動調整（抽出プラン）
+
+whowatch / BIGO LIVE の解析関数は、コメント要素ごとに候補のセレクタ（[class*='content']など）を
+順番に試しています。ここでは実際のページでどのセレクタが一致するかを一度だけ調べ、
+一致したセレクタだけを使う解析関数（抽出プラン）に置き換えます。
+
+- プランはプラットフォームごとにファイルに保存し、次回の起動では調べ直さずに使います。
+- プランのセレクタでコメントが取れなかった要素は、元の候補を順番に試す解析関数で処理するため、
+  ページの構造が変わってもコメントは失われません。その割合が多くなった場合はプランを調べ直します。
+"""
+
+import copy
+import json
+import os
+from datetime import datetime
+
+from comment_capture.platforms import cascade_parse_js
+
+PLAN_DIR = os.path.join(os.path.expanduser("~"), ".cache", "comment_capture", "plans")
+
+# 調整に使うコメント要素の最大数と、調整を始めるのに必要な最小数
+_SAMPLE_SIZE = 30
+_MIN_SAMPLE = 5
+
+# ページ内でセレクタの一致を調べるJavaScript（execute_script用）
+# コメント要素が少ない場合は {pending: true} を返す
+_CALIBRATE_JS = """
+var container = document.querySelector(arguments[0]);
+if (!container) return null;
+var itemSelectors = arguments[1];
+var usernameSelectors = arguments[2];
+var commentSelectors = arguments[3];
+var sampleSize = arguments[4];
+var minSample = arguments[5];
+
+function topLevel(elements, selector) {
+    var result = [];
+    for (var i = 0; i < elements.length; i++) {
+        var parent = elements[i].parentElement;
+        var outer = parent && parent !== container ? parent.closest(selector) : null;
+        if (!outer || !container.contains(outer)) result.push(elements[i]);
+    }
+    return result;
+}
+
+// コメント要素: 最初に一致した候補の中から、一致した要素の全てに一致する単独のセレクタを選ぶ
+var itemSelector = null;
+var items = [];
+for (var i = 0; i < itemSelectors.length && !itemSelector; i++) {
+    var union = ":is(" + itemSelectors[i] + ")";
+    items = topLevel(container.querySelectorAll(union), union);
+    if (!items.length) continue;
+    itemSelector = itemSelectors[i];
+    var alternatives = itemSelectors[i].split(",");
+    for (var a = 0; a < alternatives.length; a++) {
+        var alternative = alternatives[a].trim();
+        var matched = 0;
+        for (var m = 0; m < items.length; m++) {
+            if (items[m].matches(alternative)) matched++;
+        }
+        if (matched === items.length) {
+            itemSelector = alternative;
+            break;
+        }
+    }
+}
+if (items.length < minSample) return {pending: true};
+
+// ユーザー名・コメント: 直近のコメント要素で空でないテキストが最も多く取れたセレクタを選ぶ
+// （中身を空にした取得済みの要素は除く）
+var sample = items.filter(function(item) { return !item.hasAttribute("data-cc-pruned"); }).slice(-sampleSize);
+function best(candidates) {
+    var bestSelector = null;
+    var bestHits = 0;
+    for (var c = 0; c < candidates.length; c++) {
+        var hits = 0;
+        for (var s = 0; s < sample.length; s++) {
+            var found = sample[s].querySelector(candidates[c]);
+            if (found && found.textContent.trim()) hits++;
+        }
+        if (hits > bestHits) {
+            bestSelector = candidates[c];
+            bestHits = hits;
+        }
+    }
+    return bestSelector;
+}
+return {
+    item_selector: itemSelector,
+    username_selector: best(usernameSelectors),
+    comment_selector: best(commentSelectors),
+    sample: sample.length
+};
+"""
+
+# プランのセレクタだけを使う解析関数
+# コメントが取れなかった場合は元の解析関数で処理し、件数をwindow.__ccPlanに記録する
+_PLAN_PARSE_TEMPLATE = """
+    function(element) {
+        var stats = window.__ccPlan || (window.__ccPlan = {hits: 0, misses: 0});
+        var commentElem = element.querySelector(__COMMENT_SELECTOR__);
+        var commentText = commentElem ? commentElem.textContent.trim() : "";
+        __CLEANUP__
+        if (commentText) {
+            var usernameSelector = __USERNAME_SELECTOR__;
+            var usernameElem = usernameSelector ? element.querySelector(usernameSelector) : null;
+            var username = usernameElem ? usernameElem.textContent.trim() : "";
+            stats.hits += 1;
+            return [username || "不明", commentText];
+        }
+        stats.misses += 1;
+        return (__FALLBACK__)(element);
+    }
+"""
+
+# プランの一致状況を取り出してリセットするJavaScript
+# あわせて、プランのコメント要素のセレクタが元の候補と同じ数の要素に一致しているかを数える
+# （_CALIBRATE_JSと同じく、別のコメント要素の中に入れ子になった要素は数えない）
+_PLAN_STATS_JS = """
+var stats = window.__ccPlan || {hits: 0, misses: 0};
+window.__ccPlan = {hits: 0, misses: 0};
+stats.items = 0;
+stats.planned_items = 0;
+var container = document.querySelector(arguments[0]);
+
+function countTopLevel(selector) {
+    var union = ":is(" + selector + ")";
+    var elements = container.querySelectorAll(union);
+    var count = 0;
+    for (var i = 0; i < elements.length; i++) {
+        var parent = elements[i].parentElement;
+        var outer = parent && parent !== container ? parent.closest(union) : null;
+        if (!outer || !container.contains(outer)) count++;
+    }
+    return count;
+}
+
+if (container) {
+    var itemSelectors = arguments[1];
+    for (var i = 0; i < itemSelectors.length; i++) {
+        var count = countTopLevel(itemSelectors[i]);
+        if (count) {
+            stats.items = count;
+            break;
+        }
+    }
+    stats.planned_items = countTopLevel(arguments[2]);
+}
+return stats;
+"""
+
+
+def plan_path(platform, plan_dir=PLAN_DIR):
+    """プラットフォームのプランを保存するファイル名を返す"""
+    return os.path.join(plan_dir, f"{platform.name}.json")
+
+
+def load_plan(platform, plan_dir=PLAN_DIR):
+    """
+    保存したプランを読み込む
+
+    Parameters:
+        platform (Platform): 対象プラットフォームの設定
+        plan_dir (str): プランを保存するフォルダ
+
+    Returns:
+        dict: プラン。ない場合はNone
+    """
+    try:
+        with open(plan_path(platform, plan_dir), encoding='utf-8') as file:
+            plan = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return plan if plan.get("comment_selector") else None
+
+
+def save_plan(platform, plan, plan_dir=PLAN_DIR):
+    """
+    プランを保存する
+
+    Parameters:
+        platform (Platform): 対象プラットフォームの設定
+        plan (dict): calibrateで作成したプラン
+        plan_dir (str): プランを保存するフォルダ
+    """
+    try:
+        os.makedirs(plan_dir, exist_ok=True)
+        with open(plan_path(platform, plan_dir), 'w', encoding='utf-8') as file:
+            json.dump(plan, file, ensure_ascii=False, indent=2)
+    except OSError as e:
+        print(f"抽出プランを保存できませんでした: {str(e)}")
+
+
+def supports_calibration(platform):
+    """セレクタの候補が設定されていて、調整できるプラットフォームかどうか"""
+    return bool(platform.username_selectors and platform.comment_selectors)
+
+
+def calibrate(driver, platform):
+    """
+    ページ内で実際に一致するセレクタを調べてプランを作成する
+
+    Parameters:
+        driver: Selenium WebDriver
+        platform (Platform): 対象プラットフォームの設定
+
+    Returns:
+        dict: プラン。コメント領域やコメント要素が足りず調べられない場合はNone
+    """
+    result = driver.execute_script(_CALIBRATE_JS, platform.container_selector, platform.item_selectors,
+                                   platform.username_selectors, platform.comment_selectors,
+                                   _SAMPLE_SIZE, _MIN_SAMPLE)
+    if not result or result.get("pending") or not result.get("comment_selector"):
+        return None
+    result["calibrated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return result
+
+
+def apply_plan(platform, plan):
+    """
+    プランのセレクタだけを使うプラットフォームの設定を作成する
+
+    Parameters:
+        platform (Platform): 元のプラットフォームの設定
+        plan (dict): プラン
+
+    Returns:
+        Platform: プランを適用した設定（元の設定は変更しない）
+    """
+    planned = copy.copy(platform)
+    # コメント要素は、プランのセレクタで見つからない場合に元の候補を使う
+    planned.item_selectors = [plan["item_selector"]] + [selector for selector in platform.item_selectors
+                                                        if selector != plan["item_selector"]]
+    fallback = cascade_parse_js(platform.username_selectors, platform.comment_selectors,
+                                platform.comment_cleanup_js).strip()
+    planned.parse_item_js = (_PLAN_PARSE_TEMPLATE
+                             .replace("__COMMENT_SELECTOR__", json.dumps(plan["comment_selector"]))
+                             .replace("__USERNAME_SELECTOR__", json.dumps(plan.get("username_selector")))
+                             .replace("__CLEANUP__", platform.comment_cleanup_js)
+                             .replace("__FALLBACK__", fallback))
+    return planned
+
+
+class SelectorPlanner:
+    """
+    抽出プランの読み込み・調整・調べ直しを管理する
+
+    使い方: 毎回の取得でresolve()が返すプラットフォームの設定を使う
+
+    Parameters:
+        platform (Platform): 対象プラットフォームの設定
+        check_every (int): プランの一致状況を確認する間隔（resolveの呼び出し回数）
+        max_miss_rate (float): プランのセレクタでコメントが取れなかった割合がこれを超えたら調べ直す
+        plan_dir (str): プランを保存するフォルダ
+    """
+
+    def __init__(self, platform, check_every=20, max_miss_rate=0.2, plan_dir=PLAN_DIR):
+        self.base = platform
+        self.check_every = check_every
+        self.max_miss_rate = max_miss_rate
+        self.plan_dir = plan_dir
+        self.calls = 0
+        self.plan = load_plan(platform, plan_dir) if supports_calibration(platform) else None
+        self.platform = apply_plan(platform, self.plan) if self.plan else platform
+        if self.plan:
+            print(f"保存済みの抽出プランを使います（{self.plan.get('calibrated_at')}に作成）")
+
+    def resolve(self, driver):
+        """
+        今回の取得に使うプラットフォームの設定を返す
+
+        プランがまだない場合は調整を試み、一定の間隔でプランが一致しているかを確認します。
+
+        Parameters:
+            driver: Selenium WebDriver
+
+        Returns:
+            Platform: 取得に使うプラットフォームの設定
+        """
+        if not supports_calibration(self.base):
+            return self.base
+        self.calls += 1
+        if self.calls % self.check_every == 0:
+            if self.plan is None:
+                self._calibrate(driver)
+            else:
+                self._check(driver)
+        elif self.plan is None and self.calls == 1:
+            self._calibrate(driver)
+        return self.platform
+
+    def _calibrate(self, driver):
+        """プランを作成して保存する"""
+        plan = calibrate(driver, self.base)
+        if plan is None:
+            return
+        self.plan = plan
+        self.platform = apply_plan(self.base, plan)
+        save_plan(self.base, plan, self.plan_dir)
+        print(f"抽出プランを作成しました: コメント要素 {plan['item_selector']} / "
+              f"ユーザー名 {plan['username_selector']} / コメント {plan['comment_selector']}")
+
+    def _check(self, driver):
+        """プランのセレクタでコメントが取れているかを確認し、取れていなければ調べ直す"""
+        stats = driver.execute_script(_PLAN_STATS_JS, self.base.container_selector, self.base.item_selectors,
+                                      self.plan["item_selector"]) or {}
+        hits = stats.get("hits", 0)
+        misses = stats.get("misses", 0)
+        missing_items = stats.get("items", 0) - stats.get("planned_items", 0)
+        if missing_items > 0:
+            print(f"抽出プランのコメント要素のセレクタで{missing_items}件の要素が見つからないため調べ直します")
+        elif misses >= _MIN_SAMPLE and misses > (hits + misses) * self.max_miss_rate:
+            print(f"抽出プランが一致しなくなったため調べ直します（{hits + misses}件中{misses}件が不一致）")
+        else:
+            return
+        self.plan = None
+        self.platform = self.base
+        self._calibrate(driver)
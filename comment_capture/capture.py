@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+"""
+ブラウザ内でのコメント取得処理
+
+取得方法は2通りあります。
+
+- カーソル方式（poll_comments）: 1回のexecute_scriptで、まだ処理していないコメント要素だけを解析し、
+  コンパクトな配列で返します。処理済みの要素にはdata-cc-seq属性で通し番号を付けます。
+- 監視方式（install_comment_observer / drain_comment_observer）: MutationObserverをコメント領域に設置し、
+  追加されたコメント要素だけをページ内のキューに積んでおき、Python側からはそのキューを取り出すだけにします。
+
+どちらもコメント1件を [固有キー, fieldsの順の値...] の配列で返します。固有キーはコメント要素に
+data-id などのプラットフォーム固有の識別子がある場合のみ設定され、ない場合はnullです。
+また、処理済みの要素がページから消えて前回との連続性が失われた場合（再描画や再読み込み）は、
+その位置にnullを挟みます。重複の判定はdedup.CommentDeduplicatorで行います。
+"""
+
+import json
+
+# 配信の終了まで抽出する場合に、ページに残しておく取得済みのコメント要素の数
+PRUNE_KEEP = 200
+
+# 両方式で共通のJavaScript
+# __CONTAINER__ / __ITEM_SELECTORS__ / __PARSE_ITEM__ / __NEWEST_FIRST__ / __KEY_ATTRIBUTES__ / __PRUNE_MODE__ は
+# プラットフォームごとの設定で置き換える
+_COMMON_JS = """
+var containerSelector = __CONTAINER__;
+var itemSelectors = __ITEM_SELECTORS__;
+var parseItem = __PARSE_ITEM__;
+var newestFirst = __NEWEST_FIRST__;
+var keyAttributes = __KEY_ATTRIBUTES__;
+var pruneMode = __PRUNE_MODE__;
+
+// 実際にコメント要素に一致するセレクタを優先順に探す
+function pickItemSelector(container) {
+    for (var i = 0; i < itemSelectors.length; i++) {
+        if (container.querySelector(itemSelectors[i])) return ":is(" + itemSelectors[i] + ")";
+    }
+    return null;
+}
+
+// コメント要素の中に入れ子で一致した要素は別コメントとして扱わない
+function isNestedItem(element, itemSelector, container) {
+    var parent = element.parentElement;
+    if (!parent || parent === container) return false;
+    var outer = parent.closest(itemSelector);
+    return !!outer && container.contains(outer);
+}
+
+// プラットフォーム固有の識別子（data-id など）
+function nativeKey(element) {
+    for (var i = 0; i < keyAttributes.length; i++) {
+        var value = element.getAttribute(keyAttributes[i]);
+        if (value) return keyAttributes[i] + ":" + value;
+    }
+    return null;
+}
+
+function parseOne(element) {
+    var row = null;
+    try {
+        row = parseItem(element);
+    } catch (e) {
+        row = null;
+    }
+    return row ? [nativeKey(element)].concat(row) : null;
+}
+"""
+
+# カーソル方式の取得スクリプト（execute_script用）
+# コメント領域が見つからない場合はnullを返す
+_CURSOR_TEMPLATE = """
+var startedAt = performance.now();
+var report = arguments[0] === true;
+var container = document.querySelector(containerSelector);
+if (!container) return null;
+
+var state = window.__ccCursor;
+var rows = [];
+if (!state || state.container !== container) {
+    // 初回やコメント領域が差し替えられた場合は、前回との連続性がない
+    if (state && state.lossObserver) state.lossObserver.disconnect();
+    state = {container: container, seq: state ? state.seq : 0, itemSelector: null, anchor: null,
+             lost: 0, lossObserver: null};
+    window.__ccCursor = state;
+    rows.push(null);
+} else if (state.anchor && !container.contains(state.anchor)) {
+    // 最後に処理したコメントが消えた場合は再描画された可能性がある
+    rows.push(null);
+    state.anchor = null;
+}
+// コメント要素のセレクタが変わった場合（セレクタの調整後など）は選び直す
+if (!state.itemSelector || state.itemSelectors !== JSON.stringify(itemSelectors)) {
+    state.itemSelector = pickItemSelector(container);
+    state.itemSelectors = JSON.stringify(itemSelectors);
+}
+
+// 取得する前にページから消えたコメント要素（処理済みの印がないもの）を取り逃がしとして数える
+// （取得の間にコメントが流れて表示中の件数を超えた場合）
+if (report && state.itemSelector && !state.lossObserver) {
+    state.lossObserver = new MutationObserver(function(mutations) {
+        var selector = state.itemSelector;
+        if (!selector) return;
+        for (var i = 0; i < mutations.length; i++) {
+            // コメント要素の中身の書き換え（取得済みの要素を空にした場合も含む）は対象にしない
+            var target = mutations[i].target;
+            if (target !== container && target.closest && target.closest(selector)) continue;
+            var removed = mutations[i].removedNodes;
+            for (var j = 0; j < removed.length; j++) {
+                var node = removed[j];
+                if (node.nodeType !== 1) continue;
+                if (node.matches(selector)) {
+                    if (!node.hasAttribute("data-cc-seq")) state.lost += 1;
+                } else {
+                    state.lost += node.querySelectorAll(selector + ":not([data-cc-seq])").length;
+                }
+            }
+        }
+    });
+    state.lossObserver.observe(container, {childList: true, subtree: true});
+}
+
+if (state.itemSelector) {
+    // 処理済みの印がない要素だけを対象にする
+    var fresh = container.querySelectorAll(state.itemSelector + ":not([data-cc-seq])");
+    // 古いコメントから順に通し番号を付ける
+    for (var n = 0; n < fresh.length; n++) {
+        var element = fresh[newestFirst ? fresh.length - 1 - n : n];
+        var nested = isNestedItem(element, state.itemSelector, container);
+        var row = nested ? null : parseOne(element);
+        // 描画途中で中身が空の要素は数回まで次回に持ち越す
+        var tries = Number(element.getAttribute("data-cc-try") || 0);
+        if (!row && !nested && tries < 2) {
+            element.setAttribute("data-cc-try", tries + 1);
+            continue;
+        }
+        state.seq += 1;
+        element.setAttribute("data-cc-seq", state.seq);
+        if (row) {
+            rows.push(row);
+            state.anchor = element;
+        }
+    }
+}
+
+// 2番目の引数に件数が渡された場合は、取得済みのコメント要素を新しいものからその件数だけ残して取り除く
+// （長時間の抽出でコメント領域が大きくなり、1回の処理が重くならないようにする）
+var keep = arguments[1] || 0;
+if (keep && state.itemSelector) {
+    state.sincePrune = (state.sincePrune || 0) + rows.length;
+    if (state.sincePrune >= keep) {
+        state.sincePrune = 0;
+        var captured = container.querySelectorAll(state.itemSelector + "[data-cc-seq]:not([data-cc-pruned])");
+        var excess = captured.length - keep;
+        for (var p = 0; p < excess; p++) {
+            var old = captured[newestFirst ? captured.length - 1 - p : p];
+            if (old === state.anchor) continue;
+            if (pruneMode === "remove") {
+                old.remove();
+            } else {
+                // 要素は残して中身だけを空にする（ページ側のリストの管理を壊さない）
+                old.replaceChildren();
+                old.setAttribute("data-cc-pruned", "1");
+            }
+        }
+    }
+}
+
+var c = container;
+__SCROLL__
+// 最初の引数にtrueが渡された場合は、表示中のコメント数、前回から取り逃がしたコメント数、
+// ページ内の処理時間（ミリ秒）も返す
+if (report) {
+    var visible = state.itemSelector ? container.querySelectorAll(state.itemSelector).length : 0;
+    var lost = state.lost;
+    state.lost = 0;
+    return {rows: rows, visible: visible, lost: lost, elapsed: performance.now() - startedAt};
+}
+return rows;
+"""
+
+# MutationObserverの設置スクリプト（execute_script用）
+_OBSERVER_INSTALL_TEMPLATE = """
+var container = document.querySelector(containerSelector);
+if (!container) return false;
+
+// 既に設置済みの場合は古い監視を止める
+if (window.__ccCapture && window.__ccCapture.observer) {
+    window.__ccCapture.observer.disconnect();
+}
+
+// 設置し直した場合は前回との連続性がないため、先頭にnullを入れておく
+// 最初の引数に件数が渡された場合は、取得済みのコメント要素を古い順にcapturedに覚えておき、
+// 取り出しの時にその件数だけ残してページから取り除く
+var state = {container: container, queue: [null], waiter: null, itemSelector: null, observer: null, anchor: null,
+             keep: arguments[0] || 0, pruneMode: pruneMode, captured: []};
+
+function pushItems(elements) {
+    var rows = [];
+    var captured = [];
+    for (var i = 0; i < elements.length; i++) {
+        if (isNestedItem(elements[i], state.itemSelector, container)) continue;
+        var row = parseOne(elements[i]);
+        if (!row) continue;
+        rows.push(row);
+        if (state.keep) captured.push(elements[i]);
+        // 最も新しいコメント要素を覚えておく
+        if (!newestFirst || rows.length === 1) state.anchor = elements[i];
+    }
+    // 古いコメントから順に入れる
+    if (newestFirst) {
+        rows.reverse();
+        captured.reverse();
+    }
+    for (var j = 0; j < rows.length; j++) state.queue.push(rows[j]);
+    for (var k = 0; k < captured.length; k++) state.captured.push(captured[k]);
+}
+
+// 既に表示されているコメントを先にキューへ入れる
+state.itemSelector = pickItemSelector(container);
+if (state.itemSelector) pushItems(container.querySelectorAll(state.itemSelector));
+
+state.observer = new MutationObserver(function(mutations) {
+    if (!state.itemSelector) {
+        state.itemSelector = pickItemSelector(container);
+        if (!state.itemSelector) return;
+    }
+    // 最後に取得したコメントが消えた場合は再描画された可能性がある
+    if (state.anchor && !container.contains(state.anchor)) {
+        state.queue.push(null);
+        state.anchor = null;
+    }
+    for (var i = 0; i < mutations.length; i++) {
+        var added = mutations[i].addedNodes;
+        for (var j = 0; j < added.length; j++) {
+            var node = added[j];
+            if (node.nodeType !== 1) continue;
+            var elements = [];
+            if (node.matches(state.itemSelector)) elements.push(node);
+            var inner = node.querySelectorAll(state.itemSelector);
+            for (var k = 0; k < inner.length; k++) elements.push(inner[k]);
+            pushItems(elements);
+        }
+    }
+    // 取り出し待ちがあればすぐに返す
+    if (state.queue.length && state.waiter) state.waiter();
+});
+state.observer.observe(container, {childList: true, subtree: true});
+
+window.__ccCapture = state;
+return true;
+"""
+
+# キューの取り出しスクリプト（execute_async_script用）
+# 監視が失われている場合（ページの再読み込みやコメント領域の差し替え）はnullを返す
+_OBSERVER_DRAIN_TEMPLATE = """
+var done = arguments[arguments.length - 1];
+var timeoutMs = arguments[0];
+var state = window.__ccCapture;
+if (!state || !document.contains(state.container)) {
+    done(null);
+    return;
+}
+
+var c = state.container;
+__SCROLL__
+
+// 取得済みのコメント要素が残す件数の2倍に達したら、古いものを取り除く
+// （長時間の抽出でコメント領域が大きくなり、ページの処理が重くならないようにする）
+if (state.keep && state.captured.length >= state.keep * 2) {
+    var excess = state.captured.splice(0, state.captured.length - state.keep);
+    for (var p = 0; p < excess.length; p++) {
+        var old = excess[p];
+        if (old === state.anchor || !state.container.contains(old)) continue;
+        if (state.pruneMode === "remove") {
+            old.remove();
+        } else {
+            // 要素は残して中身だけを空にする（ページ側のリストの管理を壊さない）
+            old.replaceChildren();
+            old.setAttribute("data-cc-pruned", "1");
+        }
+    }
+}
+
+if (state.queue.length) {
+    done(state.queue.splice(0));
+    return;
+}
+
+var timer = setTimeout(function() {
+    state.waiter = null;
+    done(state.queue.splice(0));
+}, timeoutMs);
+state.waiter = function() {
+    clearTimeout(timer);
+    state.waiter = null;
+    done(state.queue.splice(0));
+};
+"""
+
+
+def _with_platform(template, platform):
+    """
+    共通のJavaScriptとテンプレートを結合し、プラットフォームの設定を埋め込む
+
+    Parameters:
+        template (str): 結合するJavaScriptのテンプレート
+        platform (Platform): 対象プラットフォームの設定
+
+    Returns:
+        str: 実行できるJavaScript
+    """
+    return ((_COMMON_JS + template)
+            .replace("__CONTAINER__", json.dumps(platform.container_selector))
+            .replace("__ITEM_SELECTORS__", json.dumps(platform.item_selectors))
+            .replace("__PARSE_ITEM__", platform.parse_item_js.strip())
+            .replace("__NEWEST_FIRST__", json.dumps(platform.newest_first))
+            .replace("__KEY_ATTRIBUTES__", json.dumps(platform.key_attributes))
+            .replace("__PRUNE_MODE__", json.dumps(platform.prune_mode))
+            .replace("__SCROLL__", platform.scroll_js))
+
+
+def build_cursor_script(platform):
+    """
+    未処理のコメントだけを取得するJavaScriptを作成する
+
+    Parameters:
+        platform (Platform): 対象プラットフォームの設定
+
+    Returns:
+        str: execute_scriptで実行するJavaScript
+    """
+    return _with_platform(_CURSOR_TEMPLATE, platform)
+
+
+def build_observer_install_script(platform):
+    """
+    MutationObserverを設置するJavaScriptを作成する
+
+    Parameters:
+        platform (Platform): 対象プラットフォームの設定
+
+    Returns:
+        str: execute_scriptで実行するJavaScript
+    """
+    return _with_platform(_OBSERVER_INSTALL_TEMPLATE, platform)
+
+
+def build_observer_drain_script(platform):
+    """
+    キューを取り出すJavaScriptを作成する
+
+    Parameters:
+        platform (Platform): 対象プラットフォームの設定
+
+    Returns:
+        str: execute_async_scriptで実行するJavaScript
+    """
+    return _OBSERVER_DRAIN_TEMPLATE.replace("__SCROLL__", platform.scroll_js)
+
+
+def poll_comments(driver, platform, window=None, keep=0):
+    """
+    前回から増えたコメントだけを1回のexecute_scriptで取得する
+
+    コメント領域のスクロールも同じ呼び出しの中で行います。
+
+    Parameters:
+        driver: Selenium WebDriver
+        platform (Platform): 対象プラットフォームの設定
+        window (dict): 指定した場合、表示中のコメント数を"visible"に、前回の取得から処理する前にページから
+            消えたコメント数（取り逃がし）を"lost"に、ページ内の処理時間（秒）を"js_seconds"に入れる
+            （同じ呼び出しの中で数える。取り逃がしは最初にwindowを指定して呼び出した時から数える）
+        keep (int): 指定した場合、取得済みのコメント要素を新しいものからこの件数だけ残してページから取り除く
+            （platform.prune_modeが"empty"の場合は要素の中身だけを空にする）
+
+    Returns:
+        list: 新しいコメントのリスト（古い順、連続性が失われた位置にNone）。
+            コメント領域が見つからない場合はNone
+    """
+    if window is None and not keep:
+        return driver.execute_script(build_cursor_script(platform))
+    result = driver.execute_script(build_cursor_script(platform), window is not None, keep)
+    if window is None:
+        return result
+    if result is None:
+        window["visible"] = None
+        window["lost"] = 0
+        window["js_seconds"] = None
+        return None
+    window["visible"] = result["visible"]
+    window["lost"] = result.get("lost", 0)
+    window["js_seconds"] = result.get("elapsed", 0) / 1000
+    return result["rows"]
+
+
+def install_comment_observer(driver, platform, keep=0):
+    """
+    コメント領域にMutationObserverを設置する
+
+    Parameters:
+        driver: Selenium WebDriver
+        platform (Platform): 対象プラットフォームの設定
+        keep (int): 指定した場合、取り出しの時に取得済みのコメント要素を新しいものからこの件数だけ残して
+            ページから取り除く（platform.prune_modeが"empty"の場合は要素の中身だけを空にする）
+
+    Returns:
+        bool: 設置できたかどうか（コメント領域が見つからない場合はFalse）
+    """
+    return bool(driver.execute_script(build_observer_install_script(platform), keep))
+
+
+def drain_comment_observer(driver, platform, timeout=1.0):
+    """
+    ページ内のキューに溜まったコメントを取り出す
+
+    キューが空の場合は新しいコメントが届くか、timeout秒が経過するまで待機します。
+
+    Parameters:
+        driver: Selenium WebDriver
+        platform (Platform): 対象プラットフォームの設定
+        timeout (float): 新しいコメントを待つ最大時間（秒）
+
+    Returns:
+        list: 新しいコメントのリスト（古い順、連続性が失われた位置にNone）。
+            監視が失われている場合はNone
+    """
+    return driver.execute_async_script(build_observer_drain_script(platform), int(timeout * 1000))
+
+
+def prepare_page(driver, platform):
+    """
+    同意ボタンやダイアログなど、コメント領域の表示を妨げるものを閉じる
+
+    待機せずに1回だけ実行するため、コメント領域が見つかるまで繰り返し呼び出します。
+
+    Parameters:
+        driver: Selenium WebDriver
+        platform (Platform): 対象プラットフォームの設定
+    """
+    if platform.prepare_js:
+        driver.execute_script(platform.prepare_js)
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+抽出中のコンソール表示
+
+コメントが多い時に1件ずつ表示すると、端末（SSH越しやログの収集先）への書き込みが取得ループを遅らせます。
+表示方法を3通りから選べます。
+
+- normal: 新しいコメントを1件ずつ表示する（従来の表示）
+- quiet: コメントは表示せず、status_every秒ごとに件数と流量を1行だけ表示する
+- dashboard: cursesの画面をfps回/秒で描き直し、流量・直近のコメント・上位ユーザー・取得の状態を表示する
+  （描画は別スレッドで行い、取得ループは表示するコメントを積むだけ）
+
+quiet / dashboard ではコメントの数に関係なく表示の負荷が一定になります。
+dashboard の間に他の処理が表示した文言は、画面下部のメッセージ欄に表示します。
+"""
+
+import sys
+import threading
+import time
+import unicodedata
+from collections import deque
+
+CONSOLE_MODES = ["normal", "quiet", "dashboard"]
+
+# 流量を計算する期間（秒）
+_RATE_WINDOWS = (10, 60)
+
+
+def _import_curses():
+    """cursesを読み込む（ない場合はNone。Windowsではwindows-cursesが必要）"""
+    try:
+        import curses
+    except ImportError:
+        return None
+    return curses
+
+
+def _fit(text, width):
+    """表示幅（全角文字は2）がwidthに収まるように切り詰める"""
+    used = 0
+    for index, char in enumerate(text):
+        used += 2 if unicodedata.east_asian_width(char) in ("F", "W") else 1
+        if used > width:
+            return text[:index]
+    return text
+
+
+class _MessageLog:
+    """dashboardの間にsys.stdoutに書き込まれた文言を、メッセージ欄に表示するために受け取る"""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.partial = ""
+
+    def write(self, text):
+        lines = (self.partial + text).split("\n")
+        self.partial = lines.pop()
+        for line in lines:
+            if line.strip():
+                self.messages.append(line.strip())
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class CommentConsole:
+    """
+    抽出中のコンソール表示
+
+    with文で使うと、開始と終了（dashboardの画面の片付け）を自動で行います。
+
+    Parameters:
+        platform (Platform): 対象プラットフォームの設定
+        mode (str): 表示方法（"normal"、"quiet"、"dashboard"）
+        stream (str): 表示するストリームの名前
+        summary (CommentSummary): 上位ユーザーとユニークユーザー数に使う集計（Noneの場合は表示しない）
+        metrics (CaptureMetrics): 取得の状態に使う計測値（Noneの場合は表示しない）
+        fps (float): dashboardを描き直す回数（1秒あたり）
+        status_every (float): quietで件数と流量を表示する間隔（秒）
+    """
+
+    def __init__(self, platform, mode="normal", stream="", summary=None, metrics=None, fps=2, status_every=10):
+        if mode not in CONSOLE_MODES:
+            raise ValueError(f"対応していない表示方法です: {mode}（{', '.join(CONSOLE_MODES)}）")
+        self.platform = platform
+        self.stream = stream or platform.name
+        self.summary = summary
+        self.metrics = metrics
+        self.fps = fps
+        self.status_every = status_every
+        self.curses = None
+        if mode == "dashboard":
+            self.curses = _import_curses()
+            if self.curses is None or not sys.stdout.isatty():
+                print("cursesが使えない（Windowsではpip install windows-curses）か端末ではないため、"
+                      "dashboardの代わりにquietで表示します")
+                mode = "quiet"
+        self.mode = mode
+
+        self.lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.total = 0
+        self.recent_rows = deque(maxlen=200)
+        self.messages = deque(maxlen=5)
+        # 取得1回ごとの (時刻, 新しいコメント数)。流量の計算に使う最も長い期間の分だけ残す
+        self.ticks = deque()
+        self.peak_rate = 0.0
+        self.last_status_at = self.started_at
+        self.last_status_total = 0
+
+        self.screen = None
+        self.stdout = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        """dashboardの画面を用意して描画スレッドを開始する（normal / quietでは何もしない）"""
+        if self.mode != "dashboard" or self.thread is not None:
+            return
+        curses = self.curses
+        self.screen = curses.initscr()
+        curses.noecho()
+        try:
+            curses.curs_set(0)
+        except curses.error:
+            pass
+        # 他の処理の表示で画面が崩れないように、表示はメッセージ欄で受け取る
+        self.stdout = sys.stdout
+        sys.stdout = _MessageLog(self.messages)
+        self.thread = threading.Thread(target=self._draw_loop, name="comment-console", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """dashboardの描画を止めて端末を元に戻す（何度呼び出してもよい）"""
+        if self.thread is None:
+            return
+        self.stopped.set()
+        self.thread.join()
+        self.thread = None
+        sys.stdout = self.stdout
+        self.curses.endwin()
+        # 最後に表示していたメッセージは画面を閉じた後も残す
+        for message in self.messages:
+            print(message)
+
+    def comment(self, row):
+        """
+        新しいコメント1件を表示する（quiet / dashboardでは表示せずに積むだけ）
+
+        Parameters:
+            row (list): [タイムスタンプ, 値...]（値はplatform.fieldsの順）
+        """
+        with self.lock:
+            self.total += 1
+            self.recent_rows.append(row)
+        if self.mode == "normal":
+            print(self.platform.format_comment(row[0], row[1:]))
+
+    def tick(self, new_comments, total_comments):
+        """
+        取得1回分の新しいコメント数を表示する
+
+        Parameters:
+            new_comments (int): 今回の取得で保存したコメント数
+            total_comments (int): これまでに保存したコメントの総数
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.ticks.append((now, new_comments))
+            while self.ticks[0][0] < now - _RATE_WINDOWS[-1]:
+                self.ticks.popleft()
+            # 最大の流量は、最も短い期間が経過してから数える（始まった直後の値は振れが大きい）
+            if now - self.started_at >= _RATE_WINDOWS[0]:
+                self.peak_rate = max(self.peak_rate, self._rate(now, _RATE_WINDOWS[0]))
+
+        if self.mode == "normal":
+            if new_comments > 0:
+                print(f"{new_comments}件の新しいコメントを検出しました。合計: {total_comments}件")
+        elif self.mode == "quiet" and now - self.last_status_at >= self.status_every:
+            added = total_comments - self.last_status_total
+            lost = f"、取り逃がし（推定）: {self.metrics.lost}件" if self.metrics and self.metrics.lost else ""
+            print(f"{time.strftime('%H:%M:%S')} 直近{now - self.last_status_at:.0f}秒で{added}件"
+                  f"（{added / (now - self.last_status_at):.1f}件/秒）。合計: {total_comments}件{lost}")
+            self.last_status_total = total_comments
+            self.last_status_at = now
+
+    def _rate(self, now, seconds):
+        """直近seconds秒の1秒あたりのコメント数（lockを取得して呼び出す）"""
+        count = sum(new for at, new in self.ticks if at >= now - seconds)
+        return count / min(seconds, max(now - self.started_at, 1e-9))
+
+    def _draw_loop(self):
+        """fps回/秒で画面を描き直す"""
+        while not self.stopped.wait(1.0 / self.fps):
+            try:
+                self._draw()
+            except self.curses.error:
+                # 端末が小さすぎる場合などは次の描画で描き直す
+                continue
+
+    def _draw(self):
+        """画面全体を描き直す"""
+        now = time.monotonic()
+        height, width = self.screen.getmaxyx()
+        with self.lock:
+            rates = [self._rate(now, seconds) for seconds in _RATE_WINDOWS]
+            peak = self.peak_rate
+            total = self.total
+            rows = list(self.recent_rows)
+            messages = list(self.messages)
+        summary = self.summary.snapshot() if self.summary else None
+        health = self.metrics.snapshot() if self.metrics else None
+
+        elapsed = int(now - self.started_at)
+        lines = [
+            f" {self.platform.display_name} {self.stream}  経過 {elapsed // 3600:02d}:{elapsed // 60 % 60:02d}:{elapsed % 60:02d}"
+            f"  合計 {total}件" + (f"  ユニークユーザー {summary['unique_users']}人" if summary else ""),
+            " 流量: " + "  ".join(f"直近{seconds}秒 {rate:.1f}件/秒" for seconds, rate in zip(_RATE_WINDOWS, rates))
+            + f"  最大 {peak:.1f}件/秒",
+        ]
+        if health:
+            lag = health.get("loop_lag", {}).get("avg_ms", 0.0)
+            call = health.get("webdriver_call", {}).get("avg_ms", 0.0)
+            queued = health.get("writer", {}).get("queue_depth", 0)
+            lines.append(f" 取得の状態: 取り逃がし {health['lost']}件（{health['loss_rate']:.1%}）"
+                         f"  遅れ {lag:.0f}ms  WebDriver {call:.0f}ms  書き込み待ち {queued}件"
+                         f"  エラー {sum(health['errors'].values())}件")
+        if summary and summary["top_users"]:
+            lines.append(" 上位ユーザー: " + "  ".join(f"{name}({count})" for name, count in summary["top_users"]))
+        lines.append("-" * (width - 1))
+
+        # 残りの行を直近のコメントとメッセージ欄に分ける
+        message_lines = [f" {message}" for message in messages[-3:]]
+        comment_space = height - len(lines) - (len(message_lines) + 1 if message_lines else 0)
+        if comment_space > 0:
+            lines.extend(self.platform.format_comment(row[0], row[1:]) for row in rows[-comment_space:])
+        if message_lines:
+            lines.extend([""] * max(0, height - len(message_lines) - 1 - len(lines)))
+            lines.append("-" * (width - 1))
+            lines.extend(message_lines)
+
+        self.screen.erase()
+        for y, line in enumerate(lines[:height]):
+            self.screen.addstr(y, 0, _fit(line, width - 1))
+        self.screen.refresh()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+コメントの重複判定
+
+ブラウザ側で処理済みのコメント要素に印を付けているため、同じ要素が2回返されることはありません。
+そのため「同じユーザーが同じコメントを2回投稿した」場合も別のコメントとして扱えます。
+ここでは次の2つの場合だけを重複として取り除きます。
+
+- プラットフォーム固有のキー（data-id など）が既に取得済みのもの
+- 再描画や再読み込みで印が消えた後、既に取得済みのコメントが再び返されたもの
+  （直近のコメント列と、返されたコメント列の先頭が一致する部分を取り除く）
+
+どちらも固定サイズの8バイトハッシュで記憶するため、長時間の配信でもメモリ使用量は一定です。
+"""
+
+import hashlib
+from collections import OrderedDict, deque
+
+
+def _hash_row(values):
+    """
+    コメント1件の内容から8バイトのハッシュ値を作成する
+
+    Parameters:
+        values (list): コメントの値（ユーザー名、コメントなど）
+
+    Returns:
+        int: ハッシュ値
+    """
+    text = "\x1f".join(str(value) for value in values)
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class CommentDeduplicator:
+    """
+    固定メモリで動作するコメントの重複判定
+
+    Parameters:
+        key_capacity (int): 記憶しておく固有キーの最大数（古いものから忘れる）
+        window_size (int): 再描画時の照合に使う直近コメントの数
+    """
+
+    def __init__(self, key_capacity=10000, window_size=300):
+        self.key_capacity = key_capacity
+        self.recent_keys = OrderedDict()
+        self.recent_rows = deque(maxlen=window_size)
+        self.duplicates = 0
+        self._gap = False
+
+    def mark_gap(self):
+        """
+        前回との連続性が失われたことを記録する（次に渡されるコメントを直近のコメント列と照合する）
+
+        ページの再読み込みなど、ブラウザ側で検出できない場合に呼び出します。
+        """
+        self._gap = True
+
+    def filter(self, rows):
+        """
+        新しいコメントだけを返す
+
+        Parameters:
+            rows (list): ブラウザから取得した [固有キー, 値...] のリスト。
+                連続性が失われた位置にはNoneが入る
+
+        Returns:
+            list: 新しいコメントの値のリスト（固有キーを除いたもの）
+        """
+        new_rows = []
+        segment = []
+        gap = self._gap
+        self._gap = False
+
+        for row in rows:
+            if row is None:
+                new_rows.extend(self._accept(segment, gap))
+                segment = []
+                gap = True
+                continue
+            segment.append(row)
+        new_rows.extend(self._accept(segment, gap))
+        return new_rows
+
+    def _accept(self, segment, gap):
+        """
+        連続した区間のコメントを判定し、新しいものを記録して返す
+
+        Parameters:
+            segment (list): [固有キー, 値...] のリスト
+            gap (bool): この区間の直前で連続性が失われているかどうか
+
+        Returns:
+            list: 新しいコメントの値のリスト
+        """
+        if not segment:
+            return []
+
+        hashes = [_hash_row(row[1:]) for row in segment]
+        skip = self._overlap(hashes) if gap else 0
+        self.duplicates += skip
+
+        accepted = []
+        for row, row_hash in zip(segment[skip:], hashes[skip:]):
+            key = row[0]
+            if key is not None:
+                key_hash = _hash_row([key])
+                if key_hash in self.recent_keys:
+                    self.recent_keys.move_to_end(key_hash)
+                    self.duplicates += 1
+                    continue
+                self.recent_keys[key_hash] = None
+                if len(self.recent_keys) > self.key_capacity:
+                    self.recent_keys.popitem(last=False)
+            self.recent_rows.append(row_hash)
+            accepted.append(row[1:])
+        return accepted
+
+    def _overlap(self, hashes):
+        """
+        直近のコメント列の末尾と一致する、区間の先頭部分の長さを求める
+
+        Parameters:
+            hashes (list): 区間内のコメントのハッシュ値
+
+        Returns:
+            int: 既に取得済みとみなす先頭のコメント数
+        """
+        recent = list(self.recent_rows)
+        for length in range(min(len(hashes), len(recent)), 0, -1):
+            if recent[len(recent) - length:] == hashes[:length]:
+                return length
+        return 0
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+asyncioによるコメント抽出エンジン
+
+WebDriverの呼び出し、CSVへの書き込み、待機をそれぞれ別のタスクで行い、
+あるストリームがブラウザの応答やディスクへの書き込みを待っている間も、
+他のストリームの取得が進むようにします。
+
+WebDriver（Selenium）は同期APIのため、ブラウザごとに専用のスレッドを1つ用意し、
+そのブラウザへの呼び出しは全てそのスレッドで順番に実行します（同じブラウザを
+複数のスレッドから同時に操作しないため）。ブラウザが異なれば呼び出しは並行して進みます。
+CSVへの書き込みと表示は書き込み用のタスクにまとめ、取得のループを止めません。
+
+使い方:
+    python -m comment_capture.engine URL1 URL2 ... [-b ブラウザ数] [-t 分] [-d 出力フォルダ]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from comment_capture.browser import create_chrome_options, create_driver
+from comment_capture.metrics import MetricsExporter, MetricsRegistry
+from comment_capture.multistream import build_streams, wait_for_pococha_login
+from comment_capture.platforms import POCOCHA
+from comment_capture.store import CommentStore
+
+
+class AsyncDriver:
+    """
+    1つのブラウザへの呼び出しを専用のスレッドで実行するラッパー
+
+    Parameters:
+        driver: Selenium WebDriver
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    async def call(self, function, *args):
+        """
+        ブラウザを操作する関数を専用のスレッドで実行する
+
+        Parameters:
+            function (callable): 第1引数にWebDriverを受け取る関数
+            *args: functionに渡す残りの引数
+
+        Returns:
+            functionの戻り値
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, self.driver, *args)
+
+    async def quit(self):
+        """ブラウザを終了してスレッドを止める"""
+        try:
+            await self.call(lambda driver: driver.quit())
+        finally:
+            self.executor.shutdown(wait=False)
+
+
+class AsyncCaptureEngine:
+    """
+    複数のライブストリームをasyncioで並行して抽出するエンジン
+
+    Parameters:
+        urls (list): ライブストリームURLのリスト（プラットフォームの混在可）
+        duration_minutes (float): 抽出を実行する時間（分）
+        output_dir (str): CSVファイルの出力先フォルダ
+        headless (bool): ヘッドレスモードを使用するかどうか
+        observer (bool): MutationObserverで追加されたコメントだけを取得するかどうか
+        interval (float): 各ストリームのコメントを取得する間隔（秒）
+        browsers (int): 起動するブラウザの数（ストリームは順番に割り当て、同じブラウザではタブで分ける）
+        queue_size (int): 書き込み待ちのコメントを保持する最大件数（超えると取得側が待つ）
+        metrics_port (int): ストリームごとの計測値をPrometheusの形式で出力するHTTPのポート（Noneの場合は出力しない）
+        stats_file (str): ストリームごとの計測値を10秒ごとにJSON Linesで追記するファイル（Noneの場合は出力しない）
+    """
+
+    def __init__(self, urls, duration_minutes=10, output_dir=".", headless=False, observer=False,
+                 interval=3, browsers=1, queue_size=1000, metrics_port=None, stats_file=None):
+        # 各ストリームの直近のコメントは、計測値のHTTPエンドポイントの /recent で参照できる
+        self.store = CommentStore()
+        self.streams = build_streams(urls, output_dir, observer, self.store)
+        self.duration_minutes = duration_minutes
+        self.output_dir = output_dir
+        self.headless = headless
+        self.interval = interval
+        self.browser_count = max(1, min(browsers, len(self.streams) or 1))
+        self.queue_size = queue_size
+        self.queue = None
+        self.drivers = []
+        self.registry = MetricsRegistry()
+        for stream in self.streams:
+            stream.metrics.target_interval = interval
+            self.registry.register(stream.metrics)
+        self.exporter = MetricsExporter(self.registry, metrics_port, stats_file, store=self.store)
+
+    async def run(self):
+        """
+        抽出を実行する
+
+        Returns:
+            dict: ストリームごとの抽出したコメント数
+        """
+        if not self.streams:
+            print("抽出対象のストリームがありません。")
+            return {}
+
+        print(f"{len(self.streams)}件のストリームを{self.browser_count}個のブラウザで抽出します...")
+        print(f"実行時間: {self.duration_minutes}分")
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.queue = asyncio.Queue(self.queue_size)
+
+        # ストリームをブラウザに順番に割り当てる
+        groups = [self.streams[index::self.browser_count] for index in range(self.browser_count)]
+        writer_task = None
+        self.exporter.start()
+        try:
+            # ブラウザの起動は並行して行う
+            launched = await asyncio.gather(*(self._launch(group) for group in groups), return_exceptions=True)
+            self.drivers = [driver for driver in launched if isinstance(driver, AsyncDriver)]
+            for result in launched:
+                if isinstance(result, BaseException):
+                    raise result
+            # 手動ログインは入力を取り合わないように1つずつ行う
+            for driver, group in zip(self.drivers, groups):
+                if any(stream.platform is POCOCHA for stream in group):
+                    await driver.call(wait_for_pococha_login)
+            await asyncio.gather(*(self._open(driver, group) for driver, group in zip(self.drivers, groups)))
+
+            print(f"コメントの抽出を開始します。{self.duration_minutes}分間実行します...")
+            writer_task = asyncio.ensure_future(self._write_loop())
+            end_time = time.time() + (self.duration_minutes * 60)
+            await asyncio.gather(*(self._poll_loop(driver, stream, end_time)
+                                   for driver, group in zip(self.drivers, groups) for stream in group))
+            print("コメント抽出を終了しました。")
+        finally:
+            if writer_task is not None:
+                # 書き込み待ちのコメントを全て書き込んでから終了する
+                await self.queue.put(None)
+                await writer_task
+            for stream in self.streams:
+                stream.close()
+            for driver in self.drivers:
+                await driver.quit()
+            self.exporter.close()
+
+        print("\n=== 抽出結果の概要 ===")
+        for stream in self.streams:
+            print(f"{stream.label}: {stream.total_comments}件 ({stream.output_file})")
+        return {stream.url: stream.total_comments for stream in self.streams}
+
+    async def _launch(self, streams):
+        """ブラウザを1つ起動する（起動は時間がかかるため別スレッドで行う）"""
+        needs_login = any(stream.platform is POCOCHA for stream in streams)
+        options = create_chrome_options(self.headless, multi_tab=len(streams) > 1, stealth=needs_login)
+        loop = asyncio.get_running_loop()
+        return AsyncDriver(await loop.run_in_executor(None, create_driver, options))
+
+    async def _open(self, driver, streams):
+        """ブラウザに割り当てたストリームをタブで開く"""
+        for index, stream in enumerate(streams):
+            await driver.call(stream.open, index > 0)
+
+    async def _poll_loop(self, driver, stream, end_time):
+        """
+        1つのストリームのコメントを一定の間隔で取得し、書き込み用のキューに渡す
+
+        Parameters:
+            driver (AsyncDriver): ストリームを開いたブラウザ
+            stream (StreamCapture): 対象のストリーム
+            end_time (float): 終了する時刻
+        """
+        while time.time() < end_time:
+            started = time.time()
+            try:
+                comments = await driver.call(stream.fetch)
+                if comments:
+                    # キューが一杯の場合は書き込みが追いつくまで待つ
+                    await self.queue.put((stream, comments))
+            except Exception as e:
+                stream.metrics.record_error(e)
+                print(f"[{stream.label}] エラーが発生しました: {str(e)}")
+            await asyncio.sleep(max(0, min(self.interval - (time.time() - started), end_time - time.time())))
+
+    async def _write_loop(self):
+        """キューに渡されたコメントを取り出してCSVに書き込む（Noneを受け取ったら終了）"""
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            while True:
+                item = await self.queue.get()
+                if item is None:
+                    return
+                stream, comments = item
+                try:
+                    count = await loop.run_in_executor(executor, stream.write, comments)
+                    print(f"[{stream.label}] {count}件の新しいコメントを検出しました。合計: {stream.total_comments}件")
+                except Exception as e:
+                    print(f"[{stream.label}] 書き込み中にエラーが発生しました: {str(e)}")
+
+
+def run_engine(urls, duration_minutes=10, output_dir=".", headless=False, observer=False, interval=3, browsers=1,
+               metrics_port=None, stats_file=None):
+    """
+    AsyncCaptureEngineで抽出を実行する（同期的に呼び出せる入口）
+
+    Parameters:
+        urls (list): ライブストリームURLのリスト
+        duration_minutes (float): 抽出を実行する時間（分）
+        output_dir (str): CSVファイルの出力先フォルダ
+        headless (bool): ヘッドレスモードを使用するかどうか
+        observer (bool): MutationObserverで追加されたコメントだけを取得するかどうか
+        interval (float): 各ストリームのコメントを取得する間隔（秒）
+        browsers (int): 起動するブラウザの数
+        metrics_port (int): ストリームごとの計測値をPrometheusの形式で出力するHTTPのポート
+        stats_file (str): ストリームごとの計測値を10秒ごとにJSON Linesで追記するファイル
+
+    Returns:
+        dict: ストリームごとの抽出したコメント数
+    """
+    engine = AsyncCaptureEngine(urls, duration_minutes, output_dir, headless, observer, interval, browsers,
+                                metrics_port=metrics_port, stats_file=stats_file)
+    return asyncio.run(engine.run())
+
+
+def main():
+    """メイン関数"""
+    # コマンドライン引数の設定
+    parser = argparse.ArgumentParser(description='複数のライブストリームからasyncioで並行してコメントを抽出するツール')
+    parser.add_argument('urls', nargs='+', help='抽出対象のライブストリームURL（whowatch / BIGO LIVE / Pococha）')
+    parser.add_argument('-t', '--time', type=float, default=10,
+                        help='抽出時間（分）。デフォルトは10分')
+    parser.add_argument('-d', '--output-dir', default='.',
+                        help='CSVファイルの出力先フォルダ。デフォルトはカレントフォルダ')
+    parser.add_argument('-i', '--interval', type=float, default=3,
+                        help='各ストリームのコメントを取得する間隔（秒）。デフォルトは3秒')
+    parser.add_argument('-b', '--browsers', type=int, default=1,
+                        help='起動するブラウザの数。デフォルトは1（全てのストリームをタブで開く）')
+    parser.add_argument('--headless', action='store_true',
+                        help='ヘッドレスモードで実行（ブラウザウィンドウを表示しない）')
+    parser.add_argument('--observer', action='store_true',
+                        help='MutationObserverで追加されたコメントだけを取得する')
+    parser.add_argument('--metrics-port', type=int,
+                        help='ストリームごとの計測値をPrometheusの形式で出力するHTTPのポート（http://127.0.0.1:ポート/metrics）')
+    parser.add_argument('--stats-file',
+                        help='ストリームごとの計測値を10秒ごとにJSON Linesで追記するファイル')
+
+    # 引数を解析
+    args = parser.parse_args()
+
+    # コメント抽出実行
+    run_engine(args.urls, args.time, args.output_dir, args.headless, args.observer, args.interval, args.browsers,
+               args.metrics_port, args.stats_file)
+
+
+if __name__ == "__main__":
+    main()
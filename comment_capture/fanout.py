@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+新しいコメントをローカルの購読者に配信するサーバー
+
+抽出ツールに --serve ポート を付けると、保存した新しいコメントを1件ずつJSONで配信します。
+オーバーレイやボットはCSVを読み直さずに、取得した直後のコメントを受け取れます。
+
+- WebSocket: ws://127.0.0.1:ポート/ws
+- Server-Sent Events: http://127.0.0.1:ポート/events
+
+接続時のクエリで、受け取るコメントを絞り込めます。
+
+    user=名前1,名前2   指定したユーザーのコメントだけ
+    type=user           コメントの種類（user / system）
+    contains=文字列     本文に文字列を含むコメントだけ
+    min_level=10        レベルが指定以上のコメントだけ（レベルのないプラットフォームでは全て）
+    replay=50           接続時に送る直近のコメント数（省略時はサーバーの既定値）
+
+購読者ごとに送信待ちのコメントを最大buffer_size件まで持ち、受け取りが遅い購読者の分は
+古いものから捨てます（捨てた件数は {"dropped": 件数} として次に送ります）。
+配信は別スレッドのイベントループで行うため、取得ループは購読者を待ちません。
+"""
+
+import asyncio
+import json
+import threading
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+from comment_capture.websocket import (OPCODE_CLOSE, accept_websocket, encode_frame, is_websocket_request,
+                                       read_frame, read_http_request, send_http_response)
+
+
+class _Subscriber:
+    """
+    購読者1件の絞り込み条件と送信待ちのコメント
+
+    Parameters:
+        query (dict): 接続時のクエリ（parse_qsの結果）
+        buffer_size (int): 送信待ちにできるコメントの最大件数
+    """
+
+    def __init__(self, query, buffer_size):
+        users = ",".join(query.get("user", []))
+        self.users = set(name for name in users.split(",") if name) or None
+        self.comment_type = query.get("type", [None])[0]
+        self.contains = query.get("contains", [None])[0]
+        self.min_level = int(query["min_level"][0]) if "min_level" in query else None
+        self.pending = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self.ready = asyncio.Event()
+
+    def matches(self, comment):
+        """コメントが絞り込み条件に合うかどうかを返す"""
+        if self.users is not None and comment["username"] not in self.users:
+            return False
+        if self.comment_type and comment["type"] != self.comment_type:
+            return False
+        if self.contains and self.contains not in comment["comment"]:
+            return False
+        if self.min_level is not None and comment["level"] is not None and comment["level"] < self.min_level:
+            return False
+        return True
+
+    def push(self, message):
+        """送信待ちに加える（一杯の場合は最も古いものを捨てる）"""
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1
+        self.pending.append(message)
+        self.ready.set()
+
+    async def next_messages(self):
+        """送信待ちのコメントを全て取り出す（ない場合は届くまで待つ）"""
+        await self.ready.wait()
+        self.ready.clear()
+        messages = list(self.pending)
+        self.pending.clear()
+        if self.dropped:
+            messages.insert(0, json.dumps({"dropped": self.dropped}))
+            self.dropped = 0
+        return messages
+
+
+class FanoutServer:
+    """
+    新しいコメントをWebSocketとServer-Sent Eventsで配信するサーバー
+
+    with文で使うと、開始と停止を自動で行います。
+
+    Parameters:
+        port (int): 待ち受けるポート（0の場合は空いているポート）
+        recent (RecentComments): 接続時に送る直近のコメント（Noneの場合は送らない）
+        stream (str): 配信するコメントに付けるストリームの名前（"プラットフォーム名:ストリームID"）
+        replay (int): 接続時に送る直近のコメント数の既定値
+        buffer_size (int): 購読者ごとに送信待ちにできるコメントの最大件数
+        host (str): 待ち受けるアドレス
+    """
+
+    def __init__(self, port=8765, recent=None, stream="", replay=100, buffer_size=1000, host="127.0.0.1"):
+        self.port = port
+        self.recent = recent
+        self.stream = stream
+        self.replay = replay
+        self.buffer_size = buffer_size
+        self.host = host
+        self.subscribers = set()
+        self.published = 0
+        self._loop = None
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        """
+        別スレッドでサーバーを起動する
+
+        Raises:
+            OSError: 待ち受けを開始できない場合（ポートが使用中など）
+        """
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            # 終了時のasyncio.gather（タスクがない場合）はスレッドの現在のループを使う
+            asyncio.set_event_loop(loop)
+            try:
+                server = loop.run_until_complete(asyncio.start_server(self.handle, self.host, self.port))
+                self.port = server.sockets[0].getsockname()[1]
+                self._loop = loop
+            except Exception as e:
+                # 起動を待っている呼び出し元に失敗を伝える
+                errors.append(e)
+                loop.close()
+                return
+            finally:
+                ready.set()
+            loop.run_forever()
+            # 接続中の購読者の処理を終わらせてから閉じる
+            server.close()
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+
+        self._thread = threading.Thread(target=run, name="fanout-server", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+        print(f"新しいコメントを配信しています: ws://{self.host}:{self.port}/ws"
+              f"（Server-Sent Events: http://{self.host}:{self.port}/events）")
+
+    def close(self):
+        """サーバーを停止する"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    def publish(self, comment):
+        """
+        新しいコメントを購読者に配信する（取得ループのスレッドから呼び出す。待たずに戻る）
+
+        Parameters:
+            comment (dict): RecentComments.add_rowで追加したコメント
+        """
+        if self._loop is None or not self.subscribers:
+            return
+        self.published += 1
+        self._loop.call_soon_threadsafe(self._dispatch, comment)
+
+    def _dispatch(self, comment):
+        """絞り込み条件に合う購読者の送信待ちにコメントを加える（イベントループのスレッドで実行）"""
+        message = None
+        for subscriber in self.subscribers:
+            if subscriber.matches(comment):
+                if message is None:
+                    message = self._encode(comment)
+                subscriber.push(message)
+
+    def _encode(self, comment):
+        """配信するJSONを作成する"""
+        return json.dumps(dict(comment, stream=self.stream), ensure_ascii=False)
+
+    async def handle(self, reader, writer):
+        """HTTPリクエスト1件を処理する（/ws はWebSocket、/events はServer-Sent Events）"""
+        path, headers = await read_http_request(reader)
+        if path is None:
+            writer.close()
+            return
+        url = urlsplit(path)
+        try:
+            query = parse_qs(url.query)
+            subscriber = _Subscriber(query, self.buffer_size)
+            replay = int(query["replay"][0]) if "replay" in query else self.replay
+        except ValueError:
+            await send_http_response(writer, "クエリの値が正しくありません", "text/plain; charset=utf-8",
+                                     "400 Bad Request")
+            return
+
+        if url.path == "/ws" and is_websocket_request(headers):
+            await accept_websocket(writer, headers)
+            closed = asyncio.ensure_future(self._wait_close(reader))
+            send = lambda message: writer.write(encode_frame(message))
+        elif url.path == "/events":
+            writer.write((
+                "HTTP/1.1 200 OK\r\n"
+                "Content-Type: text/event-stream; charset=utf-8\r\n"
+                "Cache-Control: no-store\r\n"
+                "Access-Control-Allow-Origin: *\r\n"
+                "\r\n"
+            ).encode("ascii"))
+            closed = asyncio.ensure_future(reader.read())
+            send = lambda message: writer.write(f"data: {message}\n\n".encode("utf-8"))
+        else:
+            await send_http_response(writer, "/ws または /events に接続してください", "text/plain; charset=utf-8",
+                                     "404 Not Found")
+            return
+
+        # 接続時に直近のコメントを送ってから、新しいコメントの配信を始める
+        if self.recent is not None and replay > 0:
+            for comment in self.recent.last(replay):
+                if subscriber.matches(comment):
+                    subscriber.push(self._encode(comment))
+        self.subscribers.add(subscriber)
+        try:
+            while not closed.done():
+                receiving = asyncio.ensure_future(subscriber.next_messages())
+                await asyncio.wait([receiving, closed], return_when=asyncio.FIRST_COMPLETED)
+                if not receiving.done():
+                    receiving.cancel()
+                    break
+                for message in receiving.result():
+                    send(message)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # サーバーの停止（close）でキャンセルされた場合も接続を閉じて終える
+            pass
+        finally:
+            self.subscribers.discard(subscriber)
+            closed.cancel()
+            writer.close()
+
+    async def _wait_close(self, reader):
+        """WebSocketのクライアントからのクローズ（または切断）を待つ"""
+        try:
+            while True:
+                opcode, _ = await read_frame(reader)
+                if opcode == OPCODE_CLOSE:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+軽量プロファイル（映像・画像・フォント・トラッカーの読み込みを止める）
+
+コメントの抽出には配信の映像は不要ですが、ブラウザは誰も見ていない映像のデコードに
+CPUの大半を使います。軽量プロファイルでは、Chromeの起動オプションとCDPの
+Network.setBlockedURLs で映像・画像・フォント・外部のトラッカーの読み込みを止め、
+コメント欄の表示に必要なHTML / JavaScript / WebSocketだけを読み込みます。
+
+プラットフォームによっては、映像を再生しないとコメントが届かないものがあります。
+その場合はプロファイルのneeds_playbackをTrueにし、映像は止めずに画像・フォント・
+トラッカーだけを止めます（理由はnoteに書きます）。
+"""
+
+# 画像（ページのアイコンやサムネイル、ギフトの画像など）
+IMAGE_PATTERNS = ["*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.avif*", "*.svg*", "*.ico*"]
+
+# フォント
+FONT_PATTERNS = ["*.woff*", "*.woff2*", "*.ttf*", "*.otf*", "*.eot*"]
+
+# 映像・音声（HLS / DASH / FLVのプレイリストとセグメント）
+MEDIA_PATTERNS = ["*.m3u8*", "*.m4s*", "*.flv*", "*.mp4*", "*.m4a*", "*.aac*", "*.ts?*", "*.ts", "*.webm*"]
+
+# 外部のアクセス解析・広告
+TRACKER_PATTERNS = [
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googlesyndication.com*",
+    "*facebook.net*", "*connect.facebook.com*", "*analytics.tiktok.com*", "*bat.bing.com*",
+    "*clarity.ms*", "*hotjar.com*", "*criteo.com*", "*adservice.google.*", "*scorecardresearch.com*",
+]
+
+
+class LeanProfile:
+    """
+    プラットフォームごとの軽量プロファイル
+
+    Parameters:
+        block_media (bool): 映像・音声の読み込みを止めるかどうか
+        block_images (bool): 画像の読み込みを止めるかどうか
+        block_fonts (bool): フォントの読み込みを止めるかどうか
+        block_trackers (bool): 外部のアクセス解析・広告の読み込みを止めるかどうか
+        extra_patterns (list): 追加で読み込みを止めるURLのパターン（*はワイルドカード）
+        needs_playback (bool): コメントを受け取るために映像の再生が必要かどうか
+        images_at_launch (bool): 起動オプションでも画像を止めるかどうか
+            （ログイン画面で画像が必要なプラットフォームではFalseにし、ログイン後にURLのブロックだけで止める）
+        note (str): プロファイルについての補足（表示用）
+    """
+
+    def __init__(self, block_media=True, block_images=True, block_fonts=True, block_trackers=True,
+                 extra_patterns=None, needs_playback=False, images_at_launch=True, note=""):
+        self.block_media = block_media and not needs_playback
+        self.block_images = block_images
+        self.block_fonts = block_fonts
+        self.block_trackers = block_trackers
+        self.extra_patterns = extra_patterns or []
+        self.needs_playback = needs_playback
+        self.images_at_launch = images_at_launch
+        self.note = note
+
+    def blocked_patterns(self):
+        """
+        読み込みを止めるURLのパターンを返す
+
+        Returns:
+            list: Network.setBlockedURLsに渡すパターンのリスト
+        """
+        patterns = []
+        if self.block_media:
+            patterns += MEDIA_PATTERNS
+        if self.block_images:
+            patterns += IMAGE_PATTERNS
+        if self.block_fonts:
+            patterns += FONT_PATTERNS
+        if self.block_trackers:
+            patterns += TRACKER_PATTERNS
+        return patterns + self.extra_patterns
+
+
+PROFILES = {
+    "whowatch": LeanProfile(),
+    "bigo": LeanProfile(),
+    # Pocochaは再生ボタンを押して視聴を始めるまでコメント欄が表示されないため、映像は止めない
+    # また、手動ログインの画面は画像がないと操作しにくいため、画像はログイン後に止める
+    "pococha": LeanProfile(needs_playback=True, images_at_launch=False,
+                           note="Pocochaは再生を開始しないとコメント欄が表示されないため、映像は読み込みます"),
+}
+
+
+def register_profile(platform_name, profile):
+    """
+    プラットフォームの軽量プロファイルを登録する（既存のものは置き換える）
+
+    Parameters:
+        platform_name (str): プラットフォーム名（Platform.name）
+        profile (LeanProfile): 軽量プロファイル
+    """
+    PROFILES[platform_name] = profile
+
+
+def enable_lean_profile(chrome_options, platform):
+    """
+    軽量プロファイルの起動オプションをChromeの設定に追加する
+
+    Parameters:
+        chrome_options (Options): Chromeの設定（ブラウザの起動前に呼び出す）
+        platform (Platform): 対象プラットフォームの設定
+    """
+    profile = PROFILES.get(platform.name, LeanProfile())
+    if profile.block_images and profile.images_at_launch:
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    if profile.block_fonts:
+        chrome_options.add_argument("--disable-remote-fonts")
+    if profile.block_media:
+        # 自動再生を止める（読み込みはapply_lean_profileのURLのブロックで止める）
+        chrome_options.add_argument("--autoplay-policy=user-gesture-required")
+    # キャスト先の探索など、コメントの抽出に関係のないバックグラウンドの処理を止める
+    chrome_options.add_argument("--disable-features=MediaRouter,PreloadMediaEngagementData,AutofillServerCommunication")
+    if profile.note:
+        print(f"軽量プロファイル: {profile.note}")
+
+
+def apply_lean_profile(driver, platform):
+    """
+    CDPで軽量プロファイルのURLのブロックを現在のタブに設定する
+
+    ブロックはタブごとの設定のため、新しいタブを開いた場合はページにアクセスする前に呼び出します。
+
+    Parameters:
+        driver: Selenium WebDriver
+        platform (Platform): 対象プラットフォームの設定
+
+    Returns:
+        int: ブロックするURLのパターンの数
+    """
+    patterns = PROFILES.get(platform.name, LeanProfile()).blocked_patterns()
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    return len(patterns)
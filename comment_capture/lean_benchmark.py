@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+軽量プロファイルのベンチマーク
+
+同じライブストリームを通常の設定と軽量プロファイルで順番に開き、ブラウザ（Chromeの全プロセス）の
+CPU使用率とメモリ使用量（RSS）、その間に取得できたコメント数を比べます。
+コメント数が大きく減る場合は、そのプラットフォームでは軽量プロファイルでコメントが届いていません。
+psutilが必要です（pip install psutil）。
+
+使い方:
+    python -m comment_capture.lean_benchmark URL1 URL2 ... [-s 秒] [--warmup 秒] [--headless]
+"""
+
+import argparse
+import time
+
+from comment_capture.browser import create_chrome_options, create_driver
+from comment_capture.capture import poll_comments, prepare_page
+from comment_capture.dedup import CommentDeduplicator
+from comment_capture.lean import PROFILES, LeanProfile, enable_lean_profile, apply_lean_profile
+from comment_capture.multistream import wait_for_pococha_login
+from comment_capture.platforms import POCOCHA, detect_platform, stream_id_from_url
+
+
+def _import_psutil():
+    """psutilを読み込む（ベンチマークでだけ必要）"""
+    try:
+        import psutil
+    except ImportError:
+        raise ImportError("ベンチマークにはpsutilが必要です: pip install psutil")
+    return psutil
+
+
+class BrowserResourceSampler:
+    """
+    ブラウザ（ChromeDriverから起動したChromeの全プロセス）のCPU時間とRSSを計測する
+
+    計測中に起動したプロセス（タブやiframeのレンダラーなど）も含めます。
+
+    Parameters:
+        driver: Selenium WebDriver
+    """
+
+    def __init__(self, driver):
+        self.psutil = _import_psutil()
+        self.root = self.psutil.Process(driver.service.process.pid)
+        self.baseline = None
+        self.latest = {}
+        self.rss_samples = []
+
+    def _processes(self):
+        """ChromeDriverとその子孫のプロセスを返す"""
+        try:
+            return [self.root] + self.root.children(recursive=True)
+        except self.psutil.NoSuchProcess:
+            return []
+
+    def sample(self):
+        """現在のCPU時間とRSSを記録する（最初の呼び出しが計測の開始になる）"""
+        rss = 0
+        for process in self._processes():
+            try:
+                times = process.cpu_times()
+                self.latest[process.pid] = times.user + times.system
+                rss += process.memory_info().rss
+            except (self.psutil.NoSuchProcess, self.psutil.AccessDenied):
+                continue
+        if self.baseline is None:
+            self.baseline = dict(self.latest)
+        self.rss_samples.append(rss)
+
+    def cpu_seconds(self):
+        """計測の開始から使ったCPU時間の合計（秒）。開始後に起動したプロセスは全てを数える"""
+        return sum(cpu - self.baseline.get(pid, 0.0) for pid, cpu in self.latest.items())
+
+
+def measure(url, platform, lean, seconds=60, warmup=15, headless=False):
+    """
+    1つの設定でライブストリームを開き、ブラウザのCPU使用率とRSSを計測する
+
+    Parameters:
+        url (str): ライブストリームURL
+        platform (Platform): 対象プラットフォームの設定
+        lean (bool): 軽量プロファイルを使うかどうか
+        seconds (float): 計測する時間（秒）
+        warmup (float): ページを開いてから計測を始めるまでの時間（秒）
+        headless (bool): ヘッドレスモードを使用するかどうか
+
+    Returns:
+        dict: CPU使用率（1コアを100%とする）、RSSの平均と最大（MB）、取得したコメント数
+    """
+    options = create_chrome_options(headless, stealth=platform is POCOCHA)
+    if lean:
+        enable_lean_profile(options, platform)
+    driver = create_driver(options)
+    deduplicator = CommentDeduplicator()
+
+    def poll():
+        rows = poll_comments(driver, platform)
+        if rows is None:
+            prepare_page(driver, platform)
+            return 0
+        return len(deduplicator.filter(rows))
+
+    try:
+        if platform is POCOCHA:
+            wait_for_pococha_login(driver)
+        if lean:
+            apply_lean_profile(driver, platform)
+        driver.get(url)
+        if PROFILES.get(platform.name, LeanProfile()).needs_playback:
+            input("ブラウザで再生を開始してから、Enterキーを押してください...")
+
+        # ページの読み込みが落ち着くまで待つ（この間のコメントは数えない）
+        warmup_end = time.monotonic() + warmup
+        while time.monotonic() < warmup_end:
+            poll()
+            time.sleep(1)
+
+        sampler = BrowserResourceSampler(driver)
+        sampler.sample()
+        started = time.monotonic()
+        comments = 0
+        while time.monotonic() - started < seconds:
+            comments += poll()
+            time.sleep(1)
+            sampler.sample()
+        elapsed = time.monotonic() - started
+    finally:
+        driver.quit()
+
+    return {
+        "cpu_percent": sampler.cpu_seconds() / elapsed * 100,
+        "rss_mb_avg": sum(sampler.rss_samples) / len(sampler.rss_samples) / 1024 / 1024,
+        "rss_mb_max": max(sampler.rss_samples) / 1024 / 1024,
+        "comments": comments,
+    }
+
+
+def run_benchmark(urls, seconds=60, warmup=15, headless=False):
+    """
+    各ストリームを通常の設定と軽量プロファイルで計測して比較を表示する
+
+    Parameters:
+        urls (list): ライブストリームURLのリスト
+        seconds (float): 1回の計測時間（秒）
+        warmup (float): ページを開いてから計測を始めるまでの時間（秒）
+        headless (bool): ヘッドレスモードを使用するかどうか
+
+    Returns:
+        list: (ラベル, 設定名, 計測結果) のリスト
+    """
+    results = []
+    for url in urls:
+        platform = detect_platform(url)
+        if platform is None:
+            print(f"対応していないURLのためスキップします: {url}")
+            continue
+        label = f"{platform.name}:{stream_id_from_url(url)}"
+        for lean in (False, True):
+            name = "軽量" if lean else "通常"
+            print(f"[{label}] {name}の設定で{seconds}秒間計測します...")
+            results.append((label, name, measure(url, platform, lean, seconds, warmup, headless)))
+
+    print("\n=== 軽量プロファイルのベンチマーク ===")
+    print(f"{'ストリーム':<30} {'設定':<4} {'CPU(%)':>8} {'RSS平均(MB)':>12} {'RSS最大(MB)':>12} {'コメント数':>8}")
+    for label, name, result in results:
+        print(f"{label:<30} {name:<4} {result['cpu_percent']:>8.1f} {result['rss_mb_avg']:>12.1f} "
+              f"{result['rss_mb_max']:>12.1f} {result['comments']:>8}")
+    return results
+
+
+def main():
+    """メイン関数"""
+    # コマンドライン引数の設定
+    parser = argparse.ArgumentParser(description='軽量プロファイルの有無でブラウザのCPU使用率とメモリ使用量を比べるツール')
+    parser.add_argument('urls', nargs='+', help='計測対象のライブストリームURL（whowatch / BIGO LIVE / Pococha）')
+    parser.add_argument('-s', '--seconds', type=float, default=60,
+                        help='1回の計測時間（秒）。デフォルトは60秒')
+    parser.add_argument('--warmup', type=float, default=15,
+                        help='ページを開いてから計測を始めるまでの時間（秒）。デフォルトは15秒')
+    parser.add_argument('--headless', action='store_true',
+                        help='ヘッドレスモードで実行（ブラウザウィンドウを表示しない）')
+
+    # 引数を解析
+    args = parser.parse_args()
+
+    # ベンチマーク実行
+    run_benchmark(args.urls, args.seconds, args.warmup, args.headless)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+"""
+取得ループの計測値とその出力
+
+取得ループの1回（tick）ごとに次の値を記録し、PrometheusのテキストフォーマットのHTTPエンドポイントや
+JSON Linesの統計ファイルに出力します。複数のストリームを同時に抽出している場合も、
+どのストリームの取得が遅れているか、その原因（ブラウザの呼び出し、ページ内の解析、書き込み、エラー）を比べられます。
+
+- WebDriverの呼び出しの所要時間（webdriver_call）と、ページ内の解析の所要時間（js_extract、カーソル方式のみ）
+- 1回の取得で受け取ったコメント数と、重複判定で取り除いた件数（重複の割合）
+- 取得する前にページから流れて消えたコメント数（取り逃がし、カーソル方式のみ）と取り逃がしの割合
+- 取得の遅れ（前回の取得の開始から目標の間隔を過ぎて開始した時間、loop_lag）
+- 書き込みスレッドのキューの長さ、フラッシュの所要時間、破棄件数（GroupCommitWriter.stats）
+- エラーの種類ごとの件数
+
+使い方:
+    registry = MetricsRegistry()
+    metrics = registry.register(CaptureMetrics("whowatch", "12345", writer))
+    with MetricsExporter(registry, port=9464, stats_file="stats.jsonl"):
+        ...取得ループでbegin_tick / observe / end_tick / record_errorを呼び出す...
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from comment_capture.store import query_recent
+
+# 所要時間のヒストグラムの区切り（秒）
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# 記録する所要時間の種類と説明
+DURATIONS = {
+    "webdriver_call": "WebDriverの呼び出し（取得1回分）の所要時間",
+    "js_extract": "ページ内でのコメントの解析の所要時間",
+    "loop_lag": "目標の間隔を過ぎてから取得を開始するまでの遅れ",
+}
+
+
+class _Histogram:
+    """
+    所要時間のヒストグラム（累積ではなく区切りごとの件数を持つ）
+
+    Parameters:
+        buckets (tuple): 区切り（秒、昇順）
+    """
+
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        """値を1件記録する"""
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+
+class CaptureMetrics:
+    """
+    1つのストリームの取得ループの計測値
+
+    値は取得ループのスレッドから記録し、出力用のスレッドから読み取るため、ロックで保護します。
+
+    Parameters:
+        platform_name (str): プラットフォーム名（Platform.name）
+        stream (str): ストリームID
+        writer (GroupCommitWriter): 書き込みスレッド（指定した場合は書き込みの統計も出力する）
+        target_interval (float): 目標の取得間隔（秒）。end_tickで渡した値で更新する
+    """
+
+    def __init__(self, platform_name, stream, writer=None, target_interval=None):
+        self.platform_name = platform_name
+        self.stream = stream
+        self.writer = writer
+        self.target_interval = target_interval
+        self.lock = threading.Lock()
+        self.histograms = {name: _Histogram() for name in DURATIONS}
+        self.ticks = 0
+        self.rows = 0
+        self.comments = 0
+        self.duplicates = 0
+        self.lost = 0
+        self.last_comments = 0
+        self.errors = {}
+        self.started_at = time.time()
+        self.last_tick_at = None
+        self._tick_started = None
+
+    def begin_tick(self):
+        """取得1回分の開始を記録する（前回の開始から目標の間隔を過ぎていれば遅れとして記録する）"""
+        now = time.monotonic()
+        with self.lock:
+            if self._tick_started is not None and self.target_interval is not None:
+                lag = now - self._tick_started - self.target_interval
+                self.histograms["loop_lag"].observe(max(0.0, lag))
+            self._tick_started = now
+
+    def observe(self, name, seconds):
+        """
+        所要時間を記録する
+
+        Parameters:
+            name (str): 所要時間の種類（DURATIONSのキー）
+            seconds (float): 所要時間（秒）
+        """
+        with self.lock:
+            self.histograms[name].observe(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        """with文の中の処理の所要時間を記録する"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def end_tick(self, rows, new_comments, interval=None, lost=0):
+        """
+        取得1回分の結果を記録する
+
+        Parameters:
+            rows (list): 取得したコメントの行（連続性が失われた位置のNoneを含む。取得できなかった場合はNone）
+            new_comments (int): 重複判定の後に残ったコメント数
+            interval (float): 次の取得までの目標の間隔（秒）。省略時は前回の値のまま
+            lost (int): 前回の取得から、取得する前にページから消えたコメント数
+        """
+        received = sum(1 for row in rows if row is not None) if rows else 0
+        with self.lock:
+            self.ticks += 1
+            self.rows += received
+            self.comments += new_comments
+            self.duplicates += max(0, received - new_comments)
+            self.lost += lost
+            self.last_comments = new_comments
+            self.last_tick_at = time.time()
+            if interval is not None:
+                self.target_interval = interval
+
+    def record_error(self, error):
+        """
+        エラーを種類（例外のクラス名）ごとに数える
+
+        Parameters:
+            error (Exception): 発生したエラー
+        """
+        name = type(error).__name__
+        with self.lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def loss_rate(self):
+        """取得したコメントと取り逃がしたコメントの合計に対する、取り逃がしたコメントの割合"""
+        total = self.comments + self.lost
+        return self.lost / total if total else 0.0
+
+    def snapshot(self):
+        """
+        現在の計測値を返す
+
+        Returns:
+            dict: 計測値（所要時間は件数・平均・最大をミリ秒で返す）
+        """
+        with self.lock:
+            result = {
+                "platform": self.platform_name,
+                "stream": self.stream,
+                "ticks": self.ticks,
+                "rows": self.rows,
+                "comments": self.comments,
+                "duplicates": self.duplicates,
+                "dedup_hit_rate": self.duplicates / self.rows if self.rows else 0.0,
+                "lost": self.lost,
+                "loss_rate": self.loss_rate(),
+                "comments_per_tick": self.comments / self.ticks if self.ticks else 0.0,
+                "last_comments": self.last_comments,
+                "target_interval": self.target_interval,
+                "seconds_since_tick": time.time() - self.last_tick_at if self.last_tick_at else None,
+                "errors": dict(self.errors),
+            }
+            for name, histogram in self.histograms.items():
+                result[name] = {
+                    "count": histogram.count,
+                    "avg_ms": histogram.sum / histogram.count * 1000 if histogram.count else 0.0,
+                    "max_ms": histogram.max * 1000,
+                }
+        if self.writer is not None:
+            result["writer"] = self.writer.stats()
+        return result
+
+
+class MetricsRegistry:
+    """出力の対象にする取得ループの計測値の一覧"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.captures = []
+
+    def register(self, metrics):
+        """
+        計測値を出力の対象に加える
+
+        Parameters:
+            metrics (CaptureMetrics): 取得ループの計測値
+
+        Returns:
+            CaptureMetrics: 加えた計測値
+        """
+        with self.lock:
+            self.captures.append(metrics)
+        return metrics
+
+    def snapshot(self):
+        """全ての取得ループの現在の計測値のリストを返す"""
+        with self.lock:
+            captures = list(self.captures)
+        return [metrics.snapshot() for metrics in captures]
+
+    def render_prometheus(self):
+        """
+        全ての取得ループの計測値をPrometheusのテキストフォーマットにする
+
+        Returns:
+            str: テキストフォーマットの計測値
+        """
+        with self.lock:
+            captures = list(self.captures)
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP comment_capture_{name} {help_text}")
+            lines.append(f"# TYPE comment_capture_{name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape(value_)}"' for key, value_ in labels.items())
+                lines.append(f"comment_capture_{name}{suffix}{{{label_text}}} {value}")
+
+        def labels_of(metrics, **extra):
+            return dict({"platform": metrics.platform_name, "stream": metrics.stream}, **extra)
+
+        counters = [
+            ("ticks_total", "取得の回数", lambda m: m.ticks),
+            ("rows_total", "ブラウザから受け取ったコメント数", lambda m: m.rows),
+            ("comments_total", "重複判定の後に残ったコメント数", lambda m: m.comments),
+            ("duplicates_total", "重複判定で取り除いたコメント数", lambda m: m.duplicates),
+            ("lost_total", "取得する前にページから消えたコメント数（取り逃がし）", lambda m: m.lost),
+        ]
+        for name, help_text, value in counters:
+            family(name, "counter", help_text, [("", labels_of(m), value(m)) for m in captures])
+        family("loss_rate", "gauge", "取得したコメントと取り逃がしたコメントの合計に対する取り逃がしの割合",
+               [("", labels_of(m), f"{m.loss_rate():.6f}") for m in captures])
+        family("last_tick_comments", "gauge", "直近の取得で増えたコメント数",
+               [("", labels_of(m), m.last_comments) for m in captures])
+        family("target_interval_seconds", "gauge", "目標の取得間隔",
+               [("", labels_of(m), m.target_interval or 0) for m in captures])
+        family("errors_total", "counter", "エラーの種類ごとの件数",
+               [("", labels_of(m, type=name), count) for m in captures for name, count in sorted(m.errors.items())])
+
+        for name, help_text in DURATIONS.items():
+            samples = []
+            for m in captures:
+                with m.lock:
+                    histogram = m.histograms[name]
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        samples.append(("_bucket", labels_of(m, le=f"{bound:g}"), cumulative))
+                    samples.append(("_bucket", labels_of(m, le="+Inf"), histogram.count))
+                    samples.append(("_sum", labels_of(m), f"{histogram.sum:.6f}"))
+                    samples.append(("_count", labels_of(m), histogram.count))
+            family(f"{name}_seconds", "histogram", help_text, samples)
+
+        writers = [(m, m.writer.stats()) for m in captures if m.writer is not None]
+        if writers:
+            family("writer_queue_depth", "gauge", "書き込み待ちのコメント数",
+                   [("", labels_of(m), stats["queue_depth"]) for m, stats in writers])
+            family("writer_written_total", "counter", "書き込んだコメント数",
+                   [("", labels_of(m), stats["written"]) for m, stats in writers])
+            family("writer_dropped_total", "counter", "キューが一杯のため捨てたコメント数",
+                   [("", labels_of(m), stats["dropped"]) for m, stats in writers])
+            family("writer_flush_avg_seconds", "gauge", "書き込みとフラッシュの平均所要時間",
+                   [("", labels_of(m), stats["avg_flush_ms"] / 1000) for m, stats in writers])
+            family("writer_flush_max_seconds", "gauge", "書き込みとフラッシュの最大所要時間",
+                   [("", labels_of(m), stats["max_flush_ms"] / 1000) for m, stats in writers])
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    """ラベルの値をエスケープする"""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class MetricsExporter:
+    """
+    計測値をHTTPエンドポイントと統計ファイルに出力する
+
+    with文で使うと、開始と終了（最後の計測値の書き込み）を自動で行います。
+
+    - HTTPエンドポイント: http://host:port/metrics（Prometheusのテキストフォーマット）と /stats（JSON）、
+      storeを指定した場合は /recent（直近のコメントのJSON。comment_capture.store.query_recentを参照）
+    - 統計ファイル: stats_every秒ごとに、取得ループごとの計測値を1行のJSONで追記する
+
+    Parameters:
+        registry (MetricsRegistry): 出力する計測値の一覧
+        port (int): HTTPエンドポイントのポート（Noneの場合は起動しない）
+        stats_file (str): 統計ファイル（Noneの場合は書き込まない）
+        stats_every (float): 統計ファイルに書き込む間隔（秒）
+        host (str): HTTPエンドポイントで待ち受けるアドレス
+        store (CommentStore): /recent で返す直近のコメント（Noneの場合は /recent を提供しない）
+    """
+
+    def __init__(self, registry, port=None, stats_file=None, stats_every=10, host="127.0.0.1", store=None):
+        self.registry = registry
+        self.store = store
+        self.port = port
+        self.stats_file = stats_file
+        self.stats_every = stats_every
+        self.host = host
+        self.server = None
+        self.stopped = threading.Event()
+        self.threads = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        """HTTPエンドポイントと統計ファイルの書き込みスレッドを開始する"""
+        if self.port is not None:
+            self.server = ThreadingHTTPServer((self.host, self.port), _handler_for(self.registry, self.store))
+            self.server.daemon_threads = True
+            self.threads.append(threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True))
+            print(f"計測値を出力しています: http://{self.host}:{self.server.server_address[1]}/metrics")
+        if self.stats_file:
+            self.threads.append(threading.Thread(target=self._write_loop, name="metrics-file", daemon=True))
+            print(f"計測値を{self.stats_every:g}秒ごとに {self.stats_file} に追記します")
+        for thread in self.threads:
+            thread.start()
+
+    def close(self):
+        """出力を止める（統計ファイルには最後の計測値を書き込む）"""
+        self.stopped.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def write_stats(self):
+        """現在の計測値を統計ファイルに追記する"""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with open(self.stats_file, 'a', encoding='utf-8') as file:
+            for snapshot in self.registry.snapshot():
+                file.write(json.dumps(dict({"timestamp": timestamp}, **snapshot), ensure_ascii=False) + "\n")
+
+    def _write_loop(self):
+        """stats_every秒ごとに統計ファイルに追記する（停止時にも1回書き込む）"""
+        while not self.stopped.wait(self.stats_every):
+            self._write_safely()
+        self._write_safely()
+
+    def _write_safely(self):
+        """統計ファイルに追記する（失敗しても取得は止めない）"""
+        try:
+            self.write_stats()
+        except OSError as e:
+            print(f"統計ファイルに書き込めませんでした: {str(e)}")
+
+
+def _handler_for(registry, store=None):
+    """計測値（と直近のコメント）を返すHTTPリクエストのハンドラーを作成する"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            status = 200
+            if url.path == "/metrics":
+                body = registry.render_prometheus().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif url.path == "/stats":
+                body = json.dumps(registry.snapshot(), ensure_ascii=False).encode("utf-8")
+                content_type = "application/json; charset=utf-8"
+            elif url.path == "/recent" and store is not None:
+                try:
+                    result = query_recent(store, parse_qs(url.query))
+                except ValueError as e:
+                    status, result = 400, {"error": str(e)}
+                except KeyError as e:
+                    status, result = 404, {"error": f"ストリームがありません: {e.args[0]}", "streams": store.labels()}
+                body = json.dumps(result, ensure_ascii=False).encode("utf-8")
+                content_type = "application/json; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # アクセスのたびにコンソールに表示しない
+            pass
+
+    return MetricsHandler
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+複数のライブストリームを1つのブラウザで同時に抽出するツール
+
+whowatch / BIGO LIVE / Pococha のURLを混在して指定でき、それぞれを同じChromeのタブで開いて
+順番にコメントを取得します。出力ファイルと重複判定の状態はストリームごとに分かれています。
+
+使い方:
+    python -m comment_capture.multistream URL1 URL2 ... [-t 分] [-d 出力フォルダ]
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime
+
+from comment_capture.browser import create_chrome_options, create_driver
+from comment_capture.calibration import SelectorPlanner
+from comment_capture.capture import (poll_comments, prepare_page, install_comment_observer,
+                                     drain_comment_observer)
+from comment_capture.dedup import CommentDeduplicator
+from comment_capture.metrics import CaptureMetrics, MetricsExporter, MetricsRegistry
+from comment_capture.platforms import POCOCHA, detect_platform, stream_id_from_url
+from comment_capture.sinks import CsvSink
+from comment_capture.store import CommentStore, RecentComments
+from comment_capture.writer import GroupCommitWriter
+
+POCOCHA_LOGIN_URL = "https://www.pococha.com/ja-jp/login"
+
+
+class StreamCapture:
+    """
+    1つのライブストリーム（ブラウザの1タブ）のコメント抽出状態
+
+    Parameters:
+        url (str): ライブストリームURL
+        platform (Platform): 対象プラットフォームの設定
+        output_file (str): 出力するCSVファイル名
+        observer (bool): MutationObserverで追加されたコメントだけを取得するかどうか
+        store (CommentStore): 直近のコメントを保持するストア（省略時はこのストリームだけで保持する）
+    """
+
+    def __init__(self, url, platform, output_file, observer=False, store=None):
+        self.url = url
+        self.platform = platform
+        self.output_file = output_file
+        self.observer = observer
+        self.label = f"{platform.name}:{stream_id_from_url(url)}"
+        self.window_handle = None
+        self.deduplicator = CommentDeduplicator()
+        self.planner = SelectorPlanner(platform)
+        self.metrics = CaptureMetrics(platform.name, stream_id_from_url(url))
+        # 直近のコメント（計測値のHTTPエンドポイントの /recent で、CSVを読み直さずに参照できる）
+        self.recent = (store.stream(platform.name, stream_id_from_url(url)) if store is not None
+                       else RecentComments())
+        self.total_comments = 0
+        self.ready = False
+        self.writer = None
+
+    def open(self, driver, new_tab=True):
+        """
+        タブを開いてライブストリームにアクセスし、出力ファイルを準備する
+
+        Parameters:
+            driver: Selenium WebDriver
+            new_tab (bool): 新しいタブを開くかどうか（Falseの場合は現在のタブを使う）
+        """
+        if new_tab:
+            driver.switch_to.new_window('tab')
+        self.window_handle = driver.current_window_handle
+        driver.get(self.url)
+
+        # CSVへの書き込みは専用のスレッドでまとめて行う
+        self.writer = GroupCommitWriter(CsvSink(self.output_file, self.platform.csv_header))
+        self.writer.start()
+        self.metrics.writer = self.writer
+        print(f"[{self.label}] タブを開きました。出力ファイル: {self.output_file}")
+
+    def fetch(self, driver):
+        """
+        このタブに切り替えて新しいコメントを取得する（CSVには書き込まない）
+
+        Parameters:
+            driver: Selenium WebDriver
+
+        Returns:
+            list: 新しいコメントの値のリスト
+        """
+        self.metrics.begin_tick()
+        window = {}
+        with self.metrics.timer("webdriver_call"):
+            driver.switch_to.window(self.window_handle)
+
+            if self.observer:
+                # 他のタブも順番に処理するため、キューの取り出しでは待機しない
+                comment_data = drain_comment_observer(driver, self.platform, timeout=0)
+            else:
+                comment_data = poll_comments(driver, self.planner.resolve(driver), window)
+
+        if comment_data is None:
+            if self.observer:
+                self.ready = install_comment_observer(driver, self.planner.resolve(driver))
+                if not self.ready:
+                    prepare_page(driver, self.platform)
+            else:
+                # コメント領域が表示されるまでは同意ボタンなどを閉じる
+                prepare_page(driver, self.platform)
+            self.metrics.end_tick(None, 0)
+            return []
+
+        if window.get("js_seconds") is not None:
+            self.metrics.observe("js_extract", window["js_seconds"])
+        if not self.ready:
+            self.ready = True
+            print(f"[{self.label}] コメント領域を検出しました！")
+
+        comments = self.deduplicator.filter(comment_data)
+        lost = window.get("lost", 0)
+        self.metrics.end_tick(comment_data, len(comments), lost=lost)
+        if lost:
+            print(f"[{self.label}] 取得する前に{lost}件のコメントが流れて消えました"
+                  f"（取り逃がしの割合: {self.metrics.loss_rate():.1%}）")
+        return comments
+
+    def write(self, comments):
+        """
+        取得したコメントを書き込みスレッドに渡して表示する
+
+        Parameters:
+            comments (list): fetchで取得したコメントの値のリスト
+
+        Returns:
+            int: 書き込んだコメント数
+        """
+        for values in comments:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            row = [timestamp] + list(values)
+            self.writer.put(row)
+            self.recent.add_row(self.platform, row)
+            print(f"[{self.label}] {self.platform.format_comment(timestamp, values)}")
+
+        self.total_comments += len(comments)
+        return len(comments)
+
+    def poll(self, driver):
+        """
+        このタブに切り替えて新しいコメントを取得し、CSVに書き込む
+
+        Parameters:
+            driver: Selenium WebDriver
+
+        Returns:
+            int: 新しく保存したコメント数
+        """
+        return self.write(self.fetch(driver))
+
+    def close(self):
+        """書き込み待ちのコメントを書き込んで出力ファイルを閉じる"""
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+
+
+def wait_for_pococha_login(driver):
+    """
+    Pocochaの手動ログインを待機する（Pocochaのストリームが含まれる場合のみ）
+
+    Parameters:
+        driver: Selenium WebDriver
+    """
+    driver.get(POCOCHA_LOGIN_URL)
+    print("=" * 60)
+    print("Pocochaのストリームが含まれているため、手動ログインが必要です")
+    print("ブラウザでPocochaにログインし、このターミナルに戻ってEnterキーを押してください")
+    print("=" * 60)
+    input("ログイン完了後、Enterキーを押してください...")
+
+
+def build_streams(urls, output_dir=".", observer=False, store=None):
+    """
+    URLのリストから抽出対象のストリームを作成する（対応していないURLは除く）
+
+    Parameters:
+        urls (list): ライブストリームURLのリスト（プラットフォームの混在可）
+        output_dir (str): CSVファイルの出力先フォルダ
+        observer (bool): MutationObserverで追加されたコメントだけを取得するかどうか
+        store (CommentStore): 各ストリームの直近のコメントを保持するストア
+
+    Returns:
+        list: StreamCaptureのリスト
+    """
+    streams = []
+    used_files = set()
+    for url in urls:
+        platform = detect_platform(url)
+        if platform is None:
+            print(f"対応していないURLのためスキップします: {url}")
+            continue
+        output_file = os.path.join(output_dir, f"{platform.name}_{stream_id_from_url(url)}_comments.csv")
+        # 同じファイル名になる場合は番号を付ける
+        base, ext = os.path.splitext(output_file)
+        number = 2
+        while output_file in used_files:
+            output_file = f"{base}_{number}{ext}"
+            number += 1
+        used_files.add(output_file)
+        streams.append(StreamCapture(url, platform, output_file, observer, store))
+    return streams
+
+
+def extract_multiple_streams(urls, duration_minutes=10, output_dir=".", headless=False, observer=False,
+                             interval=3, metrics_port=None, stats_file=None):
+    """
+    複数のライブストリームから1つのブラウザでコメントを抽出する
+
+    Parameters:
+        urls (list): ライブストリームURLのリスト（プラットフォームの混在可）
+        duration_minutes (float): 抽出を実行する時間（分）
+        output_dir (str): CSVファイルの出力先フォルダ
+        headless (bool): ヘッドレスモードを使用するかどうか
+        observer (bool): MutationObserverで追加されたコメントだけを取得するかどうか
+        interval (float): 全タブを1巡する間隔（秒）
+        metrics_port (int): ストリームごとの計測値をPrometheusの形式で出力するHTTPのポート（Noneの場合は出力しない）
+        stats_file (str): ストリームごとの計測値を10秒ごとにJSON Linesで追記するファイル（Noneの場合は出力しない）
+
+    Returns:
+        dict: ストリームごとの抽出したコメント数
+    """
+    # 各ストリームの直近のコメントは、計測値のHTTPエンドポイントの /recent で参照できる
+    store = CommentStore()
+    streams = build_streams(urls, output_dir, observer, store)
+
+    if not streams:
+        print("抽出対象のストリームがありません。")
+        return {}
+
+    print(f"{len(streams)}件のストリームを1つのブラウザで抽出します...")
+    print(f"実行時間: {duration_minutes}分")
+    print(f"ヘッドレスモード: {'有効' if headless else '無効'}")
+    print(f"監視モード: {'有効' if observer else '無効'}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    needs_login = any(stream.platform is POCOCHA for stream in streams)
+    driver = create_driver(create_chrome_options(headless, multi_tab=True, stealth=needs_login))
+
+    # どのストリームの取得が遅れているかを比べられるように、ストリームごとの計測値を出力する
+    registry = MetricsRegistry()
+    for stream in streams:
+        stream.metrics.target_interval = interval
+        registry.register(stream.metrics)
+    exporter = MetricsExporter(registry, metrics_port, stats_file, store=store)
+    exporter.start()
+
+    try:
+        if needs_login:
+            wait_for_pococha_login(driver)
+
+        for index, stream in enumerate(streams):
+            stream.open(driver, new_tab=index > 0)
+
+        end_time = time.time() + (duration_minutes * 60)
+        print(f"コメントの抽出を開始します。{duration_minutes}分間実行します...")
+
+        while time.time() < end_time:
+            cycle_start = time.time()
+            # 全タブを順番に処理する
+            for stream in streams:
+                try:
+                    new_comments_count = stream.poll(driver)
+                    if new_comments_count > 0:
+                        print(f"[{stream.label}] {new_comments_count}件の新しいコメントを検出しました。"
+                              f"合計: {stream.total_comments}件")
+                except Exception as e:
+                    stream.metrics.record_error(e)
+                    print(f"[{stream.label}] エラーが発生しました: {str(e)}")
+
+            # 次の巡回まで待機
+            time.sleep(max(0, interval - (time.time() - cycle_start)))
+
+        print("コメント抽出を終了しました。")
+
+    finally:
+        for stream in streams:
+            stream.close()
+        # ブラウザを閉じる
+        driver.quit()
+        exporter.close()
+
+    print("\n=== 抽出結果の概要 ===")
+    for stream in streams:
+        print(f"{stream.label}: {stream.total_comments}件 ({stream.output_file})")
+
+    return {stream.url: stream.total_comments for stream in streams}
+
+
+def main():
+    """メイン関数"""
+    # コマンドライン引数の設定
+    parser = argparse.ArgumentParser(description='複数のライブストリームから1つのブラウザでコメントを抽出するツール')
+    parser.add_argument('urls', nargs='+', help='抽出対象のライブストリームURL（whowatch / BIGO LIVE / Pococha）')
+    parser.add_argument('-t', '--time', type=float, default=10,
+                        help='抽出時間（分）。デフォルトは10分')
+    parser.add_argument('-d', '--output-dir', default='.',
+                        help='CSVファイルの出力先フォルダ。デフォルトはカレントフォルダ')
+    parser.add_argument('-i', '--interval', type=float, default=3,
+                        help='全タブを1巡する間隔（秒）。デフォルトは3秒')
+    parser.add_argument('--headless', action='store_true',
+                        help='ヘッドレスモードで実行（ブラウザウィンドウを表示しない）')
+    parser.add_argument('--observer', action='store_true',
+                        help='MutationObserverで追加されたコメントだけを取得する')
+    parser.add_argument('--metrics-port', type=int,
+                        help='ストリームごとの計測値をPrometheusの形式で出力するHTTPのポート（http://127.0.0.1:ポート/metrics）')
+    parser.add_argument('--stats-file',
+                        help='ストリームごとの計測値を10秒ごとにJSON Linesで追記するファイル')
+
+    # 引数を解析
+    args = parser.parse_args()
+
+    # コメント抽出実行
+    extract_multiple_streams(args.urls, args.time, args.output_dir, args.headless, args.observer, args.interval,
+                             args.metrics_port, args.stats_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+ネットワーク（WebSocketのフレーム）からのコメント取得
+
+ページの表示（DOM）を解析する代わりに、Chrome DevTools Protocol（CDP）の
+Network.webSocketFrameReceived / Network.eventSourceMessageReceived イベントを
+ChromeDriverのパフォーマンスログから受け取り、配信サイトが受信したメッセージを直接解析します。
+セレクタのクラス名が変わっても影響を受けず、画面外にスクロールしたコメントも取りこぼしません。
+
+メッセージの形式はプラットフォームごとに異なるため、デコーダ（フレーム1件からコメントの
+リストを返す関数）をプラットフォームごとに登録して切り替えます。
+既定のデコーダはJSON形式のメッセージから、プラットフォームごとに決めたユーザー名のキーと
+コメントのキーを両方持つオブジェクトを探します（"name"と"message"だけのエラーや状態の通知は
+コメントとみなしません）。実際の形式に合わない場合は register_decoder で差し替えてください。
+"""
+
+import base64
+import json
+import re
+from functools import partial
+
+# socket.io / engine.io のパケット種別（"42[...]" の "42" など）
+_SOCKET_IO_PREFIX = re.compile(r"^\d+")
+
+# 既定のデコーダがコメントの各項目を探すキー（優先順、"user.name"は入れ子のキー）
+# ユーザー名のキーとコメントのキーを両方持つオブジェクトだけをコメントとみなす
+FRAME_PATHS = {
+    "whowatch": {
+        "username": ["user.name", "user.nickname", "user_name", "nickname"],
+        "comment": ["message", "comment"],
+    },
+    "bigo": {
+        "username": ["nick_name", "nickname", "user.nick_name", "user.name", "user_name"],
+        "comment": ["content", "msg", "message"],
+    },
+    "pococha": {
+        "username": ["user.name", "user.nickname", "user_name", "nickname"],
+        "comment": ["text", "message", "comment"],
+    },
+}
+LEVEL_PATHS = ["user.level", "user.lv", "level", "lv"]
+KEY_PATHS = ["id", "comment_id", "message_id", "msg_id", "uuid"]
+# Pocochaの運営メッセージとみなすtypeの値
+SYSTEM_TYPES = {"system", "notice", "info", "announcement"}
+
+
+def enable_network_capture(chrome_options):
+    """
+    CDPのネットワークイベントをパフォーマンスログに記録するようにChromeの設定を変更する
+
+    Parameters:
+        chrome_options (Options): Chromeの設定（ブラウザの起動前に呼び出す）
+    """
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    chrome_options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+
+
+def _lookup(obj, path):
+    """入れ子のキー（"user.name"など）の値を取り出す。文字列・数値以外はNone"""
+    value = obj
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _first(obj, paths):
+    """pathsの中で最初に値が見つかったものを返す"""
+    for path in paths:
+        value = _lookup(obj, path)
+        if value is not None:
+            return value
+    return None
+
+
+def load_payload(payload):
+    """
+    フレームの内容をJSONとして読み込む（socket.ioの種別の数字は取り除く）
+
+    Parameters:
+        payload (str): フレームの内容
+
+    Returns:
+        JSONの値。JSONでない場合はNone
+    """
+    text = _SOCKET_IO_PREFIX.sub("", payload.strip(), count=1)
+    if not text or text[0] not in "[{":
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def simple_row(obj, paths):
+    """
+    ユーザー名とコメントだけのプラットフォーム（whowatch / BIGO LIVE）用の変換
+
+    Parameters:
+        obj (dict): メッセージ内のオブジェクト
+        paths (dict): ユーザー名とコメントのキーの候補（FRAME_PATHSの値）
+
+    Returns:
+        list: [固有キー, ユーザー名, コメント]。コメントでない場合はNone
+    """
+    username = _first(obj, paths["username"])
+    comment_text = _first(obj, paths["comment"])
+    if username is None or comment_text is None:
+        return None
+    return [_first(obj, KEY_PATHS), username, comment_text]
+
+
+def pococha_row(obj, paths=FRAME_PATHS["pococha"]):
+    """
+    Pococha用の変換（運営メッセージとレベル付きのユーザーコメント）
+
+    Parameters:
+        obj (dict): メッセージ内のオブジェクト
+        paths (dict): ユーザー名とコメントのキーの候補（FRAME_PATHSの値）
+
+    Returns:
+        list: [固有キー, ユーザー名, レベル, コメント, コメントタイプ]。コメントでない場合はNone
+    """
+    comment_text = _first(obj, paths["comment"])
+    if comment_text is None:
+        return None
+    key = _first(obj, KEY_PATHS)
+    if (_lookup(obj, "type") or "").lower() in SYSTEM_TYPES:
+        return [key, "運営", "", comment_text, "system"]
+    username = _first(obj, paths["username"])
+    if username is None:
+        return None
+    return [key, username, _first(obj, LEVEL_PATHS) or "", comment_text, "user"]
+
+
+class JsonFrameDecoder:
+    """
+    JSON形式のフレームからコメントを取り出すデコーダ
+
+    メッセージ全体をたどり、build_rowがコメントと判定したオブジェクトを全て返します。
+    文字列の中にJSONが埋め込まれている場合（二重にエンコードされたメッセージ）もたどります。
+
+    Parameters:
+        build_row (callable): オブジェクト1つを [固有キー, 値...] に変換する関数（コメントでなければNone）
+        max_depth (int): たどる入れ子の深さの上限
+    """
+
+    def __init__(self, build_row, max_depth=8):
+        self.build_row = build_row
+        self.max_depth = max_depth
+
+    def __call__(self, payload):
+        """
+        フレーム1件を解析する
+
+        Parameters:
+            payload (str or bytes): フレームの内容（バイナリフレームはbytes）
+
+        Returns:
+            list: [固有キー, 値...] のリスト
+        """
+        if isinstance(payload, bytes):
+            try:
+                payload = payload.decode("utf-8")
+            except UnicodeDecodeError:
+                # protobufなどのバイナリ形式は専用のデコーダが必要
+                return []
+        rows = []
+        self._walk(load_payload(payload), rows, 0)
+        return rows
+
+    def _walk(self, node, rows, depth):
+        """nodeの中からコメントを探してrowsに追加する"""
+        if depth > self.max_depth:
+            return
+        if isinstance(node, dict):
+            row = self.build_row(node)
+            if row is not None:
+                rows.append(row)
+                return
+            children = node.values()
+        elif isinstance(node, list):
+            children = node
+        elif isinstance(node, str) and node[:1] in ("{", "["):
+            children = [load_payload(node)]
+        else:
+            return
+        for child in children:
+            self._walk(child, rows, depth + 1)
+
+
+# プラットフォームごとのデコーダ
+DECODERS = {
+    "whowatch": JsonFrameDecoder(partial(simple_row, paths=FRAME_PATHS["whowatch"])),
+    "bigo": JsonFrameDecoder(partial(simple_row, paths=FRAME_PATHS["bigo"])),
+    "pococha": JsonFrameDecoder(partial(pococha_row, paths=FRAME_PATHS["pococha"])),
+}
+
+
+def register_decoder(platform_name, decoder):
+    """
+    プラットフォームのデコーダを登録する（既存のものは置き換える）
+
+    Parameters:
+        platform_name (str): プラットフォーム名（Platform.name）
+        decoder (callable): フレームの内容（str、バイナリフレームはbytes）を受け取り、
+            [固有キー, 値...] のリストを返す関数
+    """
+    DECODERS[platform_name] = decoder
+
+
+class NetworkCapture:
+    """
+    パフォーマンスログに記録されたWebSocketのフレームからコメントを取得する
+
+    enable_network_capture で設定したブラウザで使います。ログはブラウザ全体で1つのため、
+    1つのブラウザで1つのストリームだけを抽出する場合に使ってください。
+
+    Parameters:
+        driver: Selenium WebDriver
+        platform (Platform): 対象プラットフォームの設定
+        decoder (callable): 使用するデコーダ（省略時はプラットフォームに登録されたもの）
+        url_pattern (str): 対象にするWebSocketのURLの正規表現（省略時は全て）
+    """
+
+    def __init__(self, driver, platform, decoder=None, url_pattern=None):
+        self.driver = driver
+        self.platform = platform
+        self.decoder = decoder or DECODERS[platform.name]
+        self.url_pattern = re.compile(url_pattern) if url_pattern else None
+        self.sockets = {}
+        self.frames = 0
+        self.comments = 0
+        self.decode_errors = 0
+
+    def poll(self):
+        """
+        前回から受信したフレームを解析する
+
+        Returns:
+            list: [固有キー, 値...] のリスト（deduplicator.filterにそのまま渡せる形式）
+        """
+        rows = []
+        for entry in self.driver.get_log("performance"):
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, TypeError, ValueError):
+                continue
+            method = message.get("method")
+            params = message.get("params", {})
+
+            if method == "Network.webSocketCreated":
+                self.sockets[params.get("requestId")] = params.get("url", "")
+            elif method == "Network.webSocketClosed":
+                self.sockets.pop(params.get("requestId"), None)
+            elif method == "Network.webSocketFrameReceived":
+                if self.url_pattern and not self.url_pattern.search(self.sockets.get(params.get("requestId"), "")):
+                    continue
+                response = params.get("response", {})
+                payload = response.get("payloadData", "")
+                if response.get("opcode") == 2:
+                    # バイナリフレームはbase64で記録されている
+                    payload = base64.b64decode(payload)
+                rows.extend(self._decode(payload))
+            elif method == "Network.eventSourceMessageReceived":
+                rows.extend(self._decode(params.get("data", "")))
+        return rows
+
+    def _decode(self, payload):
+        """フレーム1件をデコーダで解析する（解析に失敗したフレームは数えて読み飛ばす）"""
+        self.frames += 1
+        try:
+            rows = self.decoder(payload)
+        except Exception:
+            self.decode_errors += 1
+            return []
+        self.comments += len(rows)
+        return rows
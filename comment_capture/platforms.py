@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+配信プラットフォームごとのコメント抽出設定
+
+コメント領域やコメント要素のセレクタ、コメント要素1件を解析するJavaScriptを
+プラットフォームごとにまとめています。
+"""
+
+import json
+import re
+from urllib.parse import urlparse
+
+
+# コメント要素にこれらの属性があれば、プラットフォーム固有のキーとして重複判定に使う
+DEFAULT_KEY_ATTRIBUTES = ["data-id", "data-key", "data-message-id", "data-comment-id"]
+
+
+def _format_simple(timestamp, values):
+    """ユーザー名とコメントだけのプラットフォーム用の表示形式"""
+    username, comment_text = values
+    return f"{timestamp} - {username}: {comment_text}"
+
+
+def _format_pococha(timestamp, values):
+    """Pococha用の表示形式（運営メッセージとレベル付きのユーザーコメント）"""
+    username, level, comment_text, comment_type = values
+    if comment_type == "system":
+        return f"{timestamp} - [運営] {comment_text}"
+    return f"{timestamp} - {username}(Lv.{level}): {comment_text}"
+
+
+# ユーザー名とコメントの要素を、候補のセレクタを優先順に試して探す解析関数
+_CASCADE_PARSE_TEMPLATE = """
+    function(element) {
+        // ユーザー名の抽出
+        var username = "不明";
+        var usernameSelectors = __USERNAME_SELECTORS__;
+        for (var j = 0; j < usernameSelectors.length; j++) {
+            var usernameElem = element.querySelector(usernameSelectors[j]);
+            if (usernameElem && usernameElem.textContent.trim()) {
+                username = usernameElem.textContent.trim();
+                break;
+            }
+        }
+
+        // コメントテキストの抽出
+        var commentText = "";
+        var commentSelectors = __COMMENT_SELECTORS__;
+        for (var k = 0; k < commentSelectors.length; k++) {
+            var commentElem = element.querySelector(commentSelectors[k]);
+            if (commentElem && commentElem.textContent.trim()) {
+                commentText = commentElem.textContent.trim();
+                break;
+            }
+        }
+
+        // コメントが空の場合、要素全体のテキストを使用
+        if (!commentText) {
+            var fullText = element.textContent.trim();
+            // ユーザー名部分を除外
+            if (username !== "不明" && fullText.includes(username)) {
+                commentText = fullText.replace(username, "").trim();
+            } else {
+                commentText = fullText;
+            }
+        }
+
+        __CLEANUP__
+        if (!commentText) return null;
+        return [username, commentText];
+    }
+"""
+
+
+def cascade_parse_js(username_selectors, comment_selectors, cleanup_js=""):
+    """
+    候補のセレクタを優先順に試してユーザー名とコメントを取り出す解析関数を作成する
+
+    Parameters:
+        username_selectors (list): ユーザー名の要素のCSSセレクタ（優先順）
+        comment_selectors (list): コメントの要素のCSSセレクタ（優先順）
+        cleanup_js (str): コメントテキスト（変数commentText）を整えるJavaScript
+
+    Returns:
+        str: [ユーザー名, コメント] を返すJavaScript関数
+    """
+    return (_CASCADE_PARSE_TEMPLATE
+            .replace("__USERNAME_SELECTORS__", json.dumps(username_selectors, ensure_ascii=False))
+            .replace("__COMMENT_SELECTORS__", json.dumps(comment_selectors, ensure_ascii=False))
+            .replace("__CLEANUP__", cleanup_js))
+
+
+class Platform:
+    """
+    配信プラットフォームのコメント抽出設定
+
+    Parameters:
+        name (str): プラットフォーム名
+        display_name (str): 表示用のプラットフォーム名
+        url_keywords (list): URLにこの文字列が含まれていればこのプラットフォームと判定する
+        csv_header (list): 出力CSVのヘッダー（先頭はタイムスタンプ、以降はfieldsの順）
+        format_comment (callable): コンソール表示用の文字列を作る関数（タイムスタンプ, 値のリスト）
+        container_selector (str): コメント領域のCSSセレクタ
+        item_selectors (list): コメント要素のCSSセレクタ（優先順に試す）
+        fields (list): parse_item_jsが返す配列の各要素の名前
+        parse_item_js (str): コメント要素1件を解析し、fieldsの順の配列を返すJavaScript関数
+            （解析できない場合はnullを返す）。省略時はusername_selectors / comment_selectorsから作成する
+        scroll_js (str): コメント領域をスクロールするJavaScript（変数cがコメント領域）
+        newest_first (bool): 新しいコメントがコメント領域の上部に追加されるかどうか
+        key_attributes (list): コメントを一意に識別できる属性名（優先順に試す）
+        prepare_js (str): コメント領域が見つからない間に実行する、同意ボタンなどを閉じるJavaScript
+        username_selectors (list): ユーザー名の要素のCSSセレクタの候補（優先順）
+        comment_selectors (list): コメントの要素のCSSセレクタの候補（優先順）
+        comment_cleanup_js (str): コメントテキスト（変数commentText）を整えるJavaScript
+        prune_mode (str): 取得済みのコメント要素の取り除き方（"empty": 中身だけを空にする /
+            "remove": 要素ごと取り除く。ページ側のリストの管理が取り除かれた要素を扱える場合のみ）
+        offline_texts (list): 配信の終了時にページに表示される文言（配信の終了の判定に使う）
+    """
+
+    def __init__(self, name, display_name, url_keywords, csv_header, format_comment,
+                 container_selector, item_selectors, fields, parse_item_js=None, scroll_js="",
+                 newest_first=False, key_attributes=None, prepare_js="", username_selectors=None,
+                 comment_selectors=None, comment_cleanup_js="", prune_mode="empty", offline_texts=None):
+        self.name = name
+        self.display_name = display_name
+        self.url_keywords = url_keywords
+        self.csv_header = csv_header
+        self.format_comment = format_comment
+        self.container_selector = container_selector
+        self.item_selectors = item_selectors
+        self.fields = fields
+        self.username_selectors = username_selectors
+        self.comment_selectors = comment_selectors
+        self.comment_cleanup_js = comment_cleanup_js
+        if parse_item_js is None:
+            parse_item_js = cascade_parse_js(username_selectors, comment_selectors, comment_cleanup_js)
+        self.parse_item_js = parse_item_js
+        self.scroll_js = scroll_js
+        self.newest_first = newest_first
+        self.key_attributes = key_attributes if key_attributes is not None else DEFAULT_KEY_ATTRIBUTES
+        self.prepare_js = prepare_js
+        self.prune_mode = prune_mode
+        self.offline_texts = offline_texts or []
+
+
+WHOWATCH = Platform(
+    name="whowatch",
+    display_name="Whowatch",
+    url_keywords=["whowatch"],
+    csv_header=['タイムスタンプ', 'ユーザー名', 'コメント'],
+    format_comment=_format_simple,
+    container_selector="div.pc-comments.live-viewer",
+    item_selectors=[".comment-item", "[class*='comment-item']", "[class*='comment']"],
+    fields=["username", "comment"],
+    username_selectors=["[class*='username']", "[class*='user-name']", "[class*='author']"],
+    comment_selectors=["[class*='comment-text']", "[class*='message']", "[class*='content']"],
+    # whowatchでは新しいコメントが上部に表示される
+    scroll_js="c.scrollTop = 0;",
+    newest_first=True,
+    offline_texts=["配信は終了しました", "この配信は終了しています"],
+)
+
+
+BIGO = Platform(
+    name="bigo",
+    display_name="BIGO LIVE",
+    url_keywords=["bigo"],
+    csv_header=['タイムスタンプ', 'ユーザー名', 'コメント'],
+    format_comment=_format_simple,
+    container_selector=".chat__container",
+    item_selectors=[".chat-message, .message-item, [class*='message'], [class*='chat-item']"],
+    fields=["username", "comment"],
+    username_selectors=[
+        ".username", ".user-name", ".author",
+        "[class*='username']", "[class*='user-name']",
+        "[class*='author']", "[class*='nick']"
+    ],
+    comment_selectors=[
+        ".message-content", ".content", ".text",
+        "[class*='message-content']", "[class*='content']",
+        "[class*='text']", "[class*='comment']"
+    ],
+    # コロン、矢印などの区切り文字を削除
+    comment_cleanup_js="commentText = commentText.replace(/^[：:》>]/, '').trim();",
+    # BIGO LIVEでは下部に新しいコメントが表示される場合が多い
+    scroll_js="c.scrollTop = c.scrollHeight;",
+    offline_texts=["Live has ended", "The live has ended", "配信は終了しました", "ライブは終了しました"],
+    # 年齢確認や同意ボタンの処理
+    prepare_js="""
+    var buttons = document.querySelectorAll("button[class*='confirm'], button[class*='agree'], button[class*='accept']");
+    for (var i = 0; i < buttons.length; i++) {
+        if (buttons[i].offsetParent !== null) buttons[i].click();
+    }
+    """,
+)
+
+
+POCOCHA = Platform(
+    name="pococha",
+    display_name="Pococha",
+    url_keywords=["pococha"],
+    csv_header=['タイムスタンプ', 'ユーザー名', 'レベル', 'コメント', 'コメントタイプ'],
+    format_comment=_format_pococha,
+    container_selector="div.messages_messagesWrapper__l2Aus",
+    item_selectors=["div.messages_messagesItem__PpIZU"],
+    fields=["username", "level", "comment", "type"],
+    parse_item_js="""
+    function(item) {
+        var messageWrapper = item.querySelector("div.messages_messageWrapper__cF93S");
+        if (!messageWrapper) return null;
+
+        var messageBody = messageWrapper.querySelector("div.common-message-styles_messageBody__89Pbc");
+        if (!messageBody) return null;
+
+        // 運営からのお知らせかチェック
+        if (messageBody.classList.contains("live-news-message_info__L_ooM")) {
+            var messageText = messageBody.querySelector("span");
+            if (!messageText) return null;
+            return ["運営", "", messageText.textContent.trim(), "system"];
+        }
+
+        // 一般ユーザーのコメントの場合
+        var nameWrapper = messageBody.querySelector("span.name_wrapper__jpk5P");
+        var username = "不明";
+        var level = "";
+        if (nameWrapper) {
+            var nameElement = nameWrapper.querySelector("span.name_name__1stkJ");
+            if (nameElement) {
+                username = nameElement.textContent.trim();
+            }
+            var levelElement = nameWrapper.querySelector("span.name_level__dHiJG");
+            if (levelElement) {
+                level = levelElement.textContent.trim();
+            }
+        }
+
+        // コメントテキストを取得（ユーザー名の後のspan要素）
+        var commentSpans = messageBody.querySelectorAll("span");
+        var commentText = "";
+        for (var j = 0; j < commentSpans.length; j++) {
+            var span = commentSpans[j];
+            if (!span.classList.contains("name_wrapper__jpk5P") &&
+                !span.closest(".name_wrapper__jpk5P")) {
+                commentText = span.textContent.trim();
+                break;
+            }
+        }
+
+        if (!commentText) return null;
+        return [username, level, commentText, "user"];
+    }
+    """,
+    offline_texts=["配信は終了しました", "ライブは終了しました", "ライブ配信は終了しました"],
+    # 「Web版Pocochaへようこそ」ダイアログのOKボタンと、ライブストリームの再生ボタン
+    prepare_js="""
+    var buttons = document.querySelectorAll("button");
+    for (var i = 0; i < buttons.length; i++) {
+        if (buttons[i].textContent.trim().toLowerCase() === "ok") buttons[i].click();
+    }
+    var playButton = document.querySelector("div[class*='playButton']");
+    if (playButton) playButton.click();
+    """,
+)
+
+
+PLATFORMS = {platform.name: platform for platform in (WHOWATCH, BIGO, POCOCHA)}
+
+
+def detect_platform(url):
+    """
+    URLから配信プラットフォームを判定する
+
+    Parameters:
+        url (str): ライブストリームURL
+
+    Returns:
+        Platform: 判定したプラットフォームの設定。判定できない場合はNone
+    """
+    lowered = url.lower()
+    for platform in PLATFORMS.values():
+        if any(keyword in lowered for keyword in platform.url_keywords):
+            return platform
+    return None
+
+
+def stream_id_from_url(url):
+    """
+    URLからファイル名に使えるストリームIDを作成する
+
+    Parameters:
+        url (str): ライブストリームURL
+
+    Returns:
+        str: ストリームID（URLの最後のパス部分）
+    """
+    segments = [segment for segment in urlparse(url).path.split("/") if segment]
+    stream_id = segments[-1] if segments else "stream"
+    return re.sub(r"[^0-9A-Za-z_-]", "_", stream_id)
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+起動済みブラウザのプール
+
+Chromeの起動、ChromeDriverの準備、配信サイトへの初回アクセスを事前に済ませたブラウザを
+プールしておき、抽出ジョブはそれを借りて使い、終わったら終了せずに初期状態に戻して返します。
+新しく配信が始まったストリームでも、数秒以内にコメントの取得を始められます。
+
+使い方（標準入力からURLを1行ずつ受け付けて、それぞれ別のブラウザで抽出する）:
+    python -m comment_capture.pool -n 3 -t 30 -d output
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+from comment_capture.browser import create_chrome_options, create_driver
+from comment_capture.multistream import StreamCapture, wait_for_pococha_login
+from comment_capture.platforms import PLATFORMS, POCOCHA, detect_platform, stream_id_from_url
+
+# 事前にアクセスしておく各プラットフォームのページ（キャッシュや接続を温めておく）
+WARM_URLS = {
+    "whowatch": "https://whowatch.tv/",
+    "bigo": "https://www.bigo.tv/",
+    "pococha": "https://www.pococha.com/",
+}
+
+
+class PooledBrowser:
+    """
+    プール内のブラウザ1つ
+
+    Parameters:
+        driver: Selenium WebDriver
+        platform (Platform): 事前にアクセスしておくプラットフォーム（Noneの場合は空白ページ）
+    """
+
+    def __init__(self, driver, platform=None):
+        self.driver = driver
+        self.platform = platform
+        self.jobs = 0
+        # Pocochaに手動ログイン済みかどうか（起動し直したブラウザはログインしていない）
+        self.logged_in = False
+
+    def warm_up(self):
+        """事前アクセス用のページを開いておく"""
+        self.driver.get(WARM_URLS[self.platform.name] if self.platform else "about:blank")
+
+    def reset(self):
+        """
+        ジョブで使った状態を片付ける（ブラウザは終了しない）
+
+        余分なタブを閉じてから事前アクセス用のページに戻します。ログイン状態（Cookie）は残します。
+        """
+        handles = self.driver.window_handles
+        for handle in handles[1:]:
+            self.driver.switch_to.window(handle)
+            self.driver.close()
+        self.driver.switch_to.window(handles[0])
+        self.warm_up()
+
+
+class BrowserPool:
+    """
+    起動済みブラウザのプール
+
+    Parameters:
+        size (int): プールするブラウザの数
+        platforms (list): 事前にアクセスしておくプラットフォーム（ブラウザに順番に割り当てる）
+        headless (bool): ヘッドレスモードを使用するかどうか
+    """
+
+    def __init__(self, size=2, platforms=None, headless=False):
+        self.size = size
+        self.platforms = platforms or []
+        self.headless = headless
+        self.idle = []
+        self.condition = threading.Condition()
+        self.browsers = []
+        # 起動し直している途中のブラウザの数（その間は返却を待つ）
+        self.relaunching = 0
+
+    def _launch(self, platform):
+        """
+        ブラウザを1つ起動して事前アクセスまで済ませる
+
+        Parameters:
+            platform (Platform): 事前にアクセスしておくプラットフォーム
+
+        Returns:
+            PooledBrowser: 起動したブラウザ
+        """
+        options = create_chrome_options(self.headless, stealth=platform is POCOCHA)
+        browser = PooledBrowser(create_driver(options), platform)
+        browser.warm_up()
+        return browser
+
+    def start(self):
+        """
+        プールするブラウザをまとめて起動する（起動は並列に行う）
+        """
+        print(f"{self.size}個のブラウザを起動しています...")
+        started = time.time()
+        results = [None] * self.size
+        errors = []
+
+        def launch(index):
+            platform = self.platforms[index % len(self.platforms)] if self.platforms else None
+            try:
+                results[index] = self._launch(platform)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=launch, args=(index,)) for index in range(self.size)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for browser in results:
+            if browser is None:
+                continue
+            # Pocochaはログインが必要なため、起動時に1回だけ手動ログインしておく
+            if browser.platform is POCOCHA:
+                wait_for_pococha_login(browser.driver)
+                browser.logged_in = True
+                browser.warm_up()
+            with self.condition:
+                self.browsers.append(browser)
+                self.idle.append(browser)
+
+        for e in errors:
+            print(f"ブラウザの起動に失敗しました: {str(e)}")
+        print(f"{len(self.browsers)}個のブラウザを起動しました（{time.time() - started:.1f}秒）")
+
+    def lease(self, platform=None, timeout=None):
+        """
+        ブラウザを借りる
+
+        指定したプラットフォームで事前アクセスしたブラウザを優先し、空きがなければ返却を待ちます。
+        Pocochaの抽出には、手動ログイン済みのブラウザだけを貸し出します。
+
+        Parameters:
+            platform (Platform): 抽出するプラットフォーム
+            timeout (float): 空きを待つ最大時間（秒）。Noneの場合は無制限
+
+        Returns:
+            PooledBrowser: 借りたブラウザ。timeoutまでに空きがなければNone
+
+        Raises:
+            RuntimeError: 貸し出せるブラウザがプールに1つもない場合（起動に失敗した場合など）
+        """
+        def usable(browser):
+            return platform is not POCOCHA or browser.logged_in
+
+        with self.condition:
+            # 返却を待っても貸し出せるブラウザがない場合は、待たずに失敗する
+            ready = self.condition.wait_for(
+                lambda: any(usable(browser) for browser in self.idle)
+                or not (self.relaunching or any(usable(browser) for browser in self.browsers)), timeout)
+            candidates = [browser for browser in self.idle if usable(browser)]
+            if not candidates:
+                if ready:
+                    name = platform.display_name if platform else "抽出"
+                    raise RuntimeError(f"{name}に使えるブラウザがプールにありません")
+                return None
+            for browser in candidates:
+                if browser.platform is platform:
+                    break
+            else:
+                browser = candidates[0]
+            self.idle.remove(browser)
+            return browser
+
+    def release(self, browser):
+        """
+        借りたブラウザを初期状態に戻してプールに返す
+
+        片付けに失敗した場合は、そのブラウザを終了して新しいブラウザを起動し直します
+        （起動し直したブラウザはPocochaにログインしていないため、Pocochaの抽出には貸し出しません）。
+        起動し直せなかった場合は、そのブラウザをプールから外します。
+
+        Parameters:
+            browser (PooledBrowser): 返却するブラウザ
+        """
+        browser.jobs += 1
+        try:
+            browser.reset()
+        except Exception as e:
+            print(f"ブラウザの片付けに失敗したため起動し直します: {str(e)}")
+            try:
+                browser.driver.quit()
+            except Exception:
+                pass
+            with self.condition:
+                self.browsers.remove(browser)
+                self.relaunching += 1
+            try:
+                browser = self._launch(browser.platform)
+            except Exception as e:
+                print(f"ブラウザを起動し直せなかったため、プールから外します: {str(e)}")
+                with self.condition:
+                    self.relaunching -= 1
+                    # 待っているジョブが、貸し出せるブラウザがなくなったことに気付けるようにする
+                    self.condition.notify_all()
+                return
+            with self.condition:
+                self.relaunching -= 1
+                self.browsers.append(browser)
+        with self.condition:
+            self.idle.append(browser)
+            self.condition.notify_all()
+
+    def close(self):
+        """プールしている全てのブラウザを終了する"""
+        with self.condition:
+            browsers = self.browsers
+            self.browsers = []
+            self.idle = []
+            self.condition.notify_all()
+        for browser in browsers:
+            try:
+                browser.driver.quit()
+            except Exception:
+                pass
+
+
+def run_pooled_capture(pool, url, duration_minutes=10, output_file=None, observer=False, interval=3):
+    """
+    プールのブラウザを借りて1つのライブストリームからコメントを抽出する
+
+    Parameters:
+        pool (BrowserPool): ブラウザのプール
+        url (str): ライブストリームURL
+        duration_minutes (float): 抽出を実行する時間（分）
+        output_file (str): 出力するCSVファイル名（省略時はURLから作成）
+        observer (bool): MutationObserverで追加されたコメントだけを取得するかどうか
+        interval (float): コメントを取得する間隔（秒）
+
+    Returns:
+        int: 抽出したコメントの総数
+    """
+    platform = detect_platform(url)
+    if platform is None:
+        print(f"対応していないURLです: {url}")
+        return 0
+    if output_file is None:
+        output_file = f"{platform.name}_{stream_id_from_url(url)}_comments.csv"
+
+    requested = time.time()
+    try:
+        browser = pool.lease(platform)
+    except RuntimeError as e:
+        print(f"{url} の抽出を開始できません: {str(e)}")
+        return 0
+    stream = StreamCapture(url, platform, output_file, observer)
+    try:
+        stream.open(browser.driver, new_tab=False)
+        end_time = time.time() + (duration_minutes * 60)
+        while time.time() < end_time:
+            try:
+                stream.poll(browser.driver)
+            except Exception as e:
+                print(f"[{stream.label}] エラーが発生しました: {str(e)}")
+            if not stream.ready:
+                # コメント領域が表示されるまでは短い間隔で確認する
+                time.sleep(0.2)
+                continue
+            if requested is not None:
+                print(f"[{stream.label}] 依頼からコメント領域の検出まで {time.time() - requested:.1f}秒")
+                requested = None
+            time.sleep(interval)
+        print(f"[{stream.label}] コメント抽出を終了しました。合計{stream.total_comments}件")
+    finally:
+        stream.close()
+        pool.release(browser)
+    return stream.total_comments
+
+
+def main():
+    """メイン関数"""
+    # コマンドライン引数の設定
+    parser = argparse.ArgumentParser(description='起動済みブラウザのプールを使い、標準入力で受け取ったURLからコメントを抽出するツール')
+    parser.add_argument('-n', '--size', type=int, default=2,
+                        help='プールするブラウザの数。デフォルトは2')
+    parser.add_argument('-p', '--platforms', default='whowatch,bigo',
+                        help='事前にアクセスしておくプラットフォーム（カンマ区切り）。デフォルトはwhowatch,bigo')
+    parser.add_argument('-t', '--time', type=float, default=10,
+                        help='1ストリームあたりの抽出時間（分）。デフォルトは10分')
+    parser.add_argument('-d', '--output-dir', default='.',
+                        help='CSVファイルの出力先フォルダ。デフォルトはカレントフォルダ')
+    parser.add_argument('--headless', action='store_true',
+                        help='ヘッドレスモードで実行（ブラウザウィンドウを表示しない）')
+    parser.add_argument('--observer', action='store_true',
+                        help='MutationObserverで追加されたコメントだけを取得する')
+
+    # 引数を解析
+    args = parser.parse_args()
+    platforms = [PLATFORMS[name] for name in args.platforms.split(',') if name in PLATFORMS]
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    pool = BrowserPool(args.size, platforms, args.headless)
+    pool.start()
+    jobs = []
+    try:
+        print("抽出するライブストリームのURLを1行ずつ入力してください（Ctrl+Dで終了）")
+        for line in sys.stdin:
+            url = line.strip()
+            if not url:
+                continue
+            platform = detect_platform(url)
+            name = platform.name if platform else "unknown"
+            output_file = os.path.join(args.output_dir, f"{name}_{stream_id_from_url(url)}_comments.csv")
+            job = threading.Thread(target=run_pooled_capture,
+                                   args=(pool, url, args.time, output_file, args.observer))
+            job.start()
+            jobs.append(job)
+        for job in jobs:
+            job.join()
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
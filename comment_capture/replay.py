@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+取得結果の記録と再生
+
+抽出ツールに --record を付けると、取得1回（tick）ごとにブラウザから受け取ったコメントの配列
+（重複判定の前の [固有キー, 値...] と、連続性が失われた位置のnull）を時刻とともにファイルに追記します。
+記録したファイルは、ブラウザやライブストリームなしで重複判定・出力・概要の集計に流し直せるため、
+後段の調整や不具合の再現、処理性能の計測に使えます。
+
+記録ファイルはJSON Linesで、1行目が記録の情報、2行目以降が1行につき取得1回分です。
+拡張子が .gz の場合はgzipで圧縮します（追記のたびにgzipのメンバーが増えるため、途中で止まっても
+それまでの記録は読めます）。
+
+    {"version": 1, "platform": "whowatch", "url": "...", "mode": "cursor", "started_at": "..."}
+    [1700000000.123, [["data-id:1", "ユーザー", "コメント"], null, ...]]   取得1回分（取得できなかった場合はnull）
+    [1700000001.456, "gap"]                                                 タブの作り直しなど（mark_gap）
+
+使い方:
+    python "whowatchのコメント抽出_リアルタイム/whowatch_comment_extractor.py" URL --record session.jsonl.gz
+    python -m comment_capture.replay session.jsonl.gz -o replay.csv [--speed 1 | --fast]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+from datetime import datetime
+
+from comment_capture.dedup import CommentDeduplicator
+from comment_capture.platforms import PLATFORMS
+from comment_capture.sinks import OUTPUT_FORMATS, create_sink
+from comment_capture.summary import CommentSummary
+from comment_capture.writer import GroupCommitWriter
+
+RECORDING_VERSION = 1
+
+# 連続性が失われたことを表す記録
+_GAP = "gap"
+
+
+def _open_recording(path, mode):
+    """記録ファイルを開く（拡張子が.gzの場合はgzip）"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class TickRecorder:
+    """
+    取得1回ごとの結果を記録ファイルに追記する
+
+    with文で使うと、終了時にファイルを閉じます。
+
+    Parameters:
+        path (str): 記録ファイル（既にある場合は追記する）
+        platform (Platform): 対象プラットフォームの設定
+        url (str): ライブストリームURL
+        mode (str): 取得方法（"cursor" / "observer" / "network"）
+    """
+
+    def __init__(self, path, platform, url="", mode="cursor"):
+        self.path = path
+        self.ticks = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.file = _open_recording(path, "a")
+        self._write({
+            "version": RECORDING_VERSION,
+            "platform": platform.name,
+            "url": url,
+            "mode": mode,
+            "started_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        })
+        print(f"取得結果を {path} に記録します")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def record(self, rows):
+        """
+        取得1回分の結果を記録する
+
+        Parameters:
+            rows (list): ブラウザから受け取ったコメントの配列（重複判定の前のもの。取得できなかった場合はNone）
+        """
+        self._write([round(time.time(), 3), rows])
+        self.ticks += 1
+
+    def record_gap(self):
+        """連続性が失われたこと（deduplicator.mark_gapを呼び出したこと）を記録する"""
+        self._write([round(time.time(), 3), _GAP])
+
+    def close(self):
+        """記録ファイルを閉じる"""
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def _write(self, item):
+        """1行を追記してフラッシュする（途中で止まってもそれまでの記録を残す）"""
+        self.file.write(json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.file.flush()
+
+
+def read_recording(path):
+    """
+    記録ファイルを読み込む
+
+    同じファイルに複数回記録した場合は、記録の情報の行が途中にも入ります（連続性が失われたものとして、
+    時刻がNoneの"gap"を返す）。途中で止まった記録の最後の不完全な行は読み飛ばします。
+
+    Parameters:
+        path (str): 記録ファイル
+
+    Returns:
+        tuple: (記録の情報（dict）, (時刻, コメントの配列または"gap") を返すイテレータ)
+    """
+    def ticks():
+        with _open_recording(path, "r") as file:
+            try:
+                for index, line in enumerate(file):
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(item, list):
+                        yield item[0], item[1]
+                    elif index > 0:
+                        yield None, _GAP
+            except EOFError:
+                # gzipの最後のメンバーが途中で切れている場合
+                return
+
+    with _open_recording(path, "r") as file:
+        header = json.loads(file.readline())
+    if not isinstance(header, dict) or header.get("platform") not in PLATFORMS:
+        raise ValueError(f"記録ファイルの形式が正しくありません: {path}")
+    return header, ticks()
+
+
+def replay(path, output_file=None, output_format="csv", speed=1.0, approx_summary=False, echo=False):
+    """
+    記録したファイルを重複判定・出力・概要の集計に流し直す
+
+    Parameters:
+        path (str): 記録ファイル
+        output_file (str): 出力ファイル名（省略時は記録ファイル名から作る）
+        output_format (str): 出力形式（"csv"、"parquet"、"arrow"、"sqlite"）
+        speed (float): 再生の速さ（1で記録と同じ間隔、2で2倍速。0の場合は待たずにできるだけ速く流す）
+        approx_summary (bool): ユニークユーザー数と上位ユーザーを固定メモリで概算するかどうか
+        echo (bool): コメントを1件ずつ表示するかどうか
+
+    Returns:
+        dict: 取得回数、受け取ったコメント数、保存したコメント数、処理時間（秒）、1秒あたりの処理件数
+    """
+    header, ticks = read_recording(path)
+    platform = PLATFORMS[header["platform"]]
+    if output_file is None:
+        base = path[:-3] if path.endswith(".gz") else path
+        output_file = os.path.splitext(base)[0] + "_replay.csv"
+    comment_index = platform.fields.index("comment")
+
+    print(f"記録ファイル: {path}（{platform.display_name}、{header.get('mode')}、{header.get('started_at')}に記録）")
+    print(f"出力ファイル: {output_file}")
+    print(f"再生の速さ: {'できるだけ速く' if not speed else f'{speed:g}倍'}")
+
+    deduplicator = CommentDeduplicator()
+    summary = CommentSummary(platform, approx_summary)
+    tick_count = 0
+    rows_count = 0
+    total_comments = 0
+    started = time.perf_counter()
+    base_tick = None
+    base_clock = None
+
+    sink = create_sink(output_format, output_file, platform, header.get("url", ""))
+    with GroupCommitWriter(sink) as writer:
+        try:
+            for tick_time, rows in ticks:
+                if tick_time is None:
+                    # 別の回の記録の始まり（記録していない間の時間は待たない）
+                    deduplicator.mark_gap()
+                    base_tick = None
+                    continue
+
+                # 記録と同じ間隔（speed倍）になるまで待つ
+                if speed:
+                    if base_tick is None:
+                        base_tick, base_clock = tick_time, time.perf_counter()
+                    wait = (tick_time - base_tick) / speed - (time.perf_counter() - base_clock)
+                    if wait > 0:
+                        time.sleep(wait)
+
+                if rows == _GAP:
+                    deduplicator.mark_gap()
+                    continue
+                tick_count += 1
+                if not rows:
+                    continue
+                rows_count += sum(1 for row in rows if row is not None)
+
+                timestamp = datetime.fromtimestamp(tick_time).strftime("%Y-%m-%d %H:%M:%S")
+                for values in deduplicator.filter(rows):
+                    # 空のコメントはスキップ（抽出ツールと同じ）
+                    if not values[comment_index]:
+                        continue
+                    row = [timestamp] + list(values)
+                    writer.put(row)
+                    summary.add(row)
+                    total_comments += 1
+                    if echo:
+                        print(platform.format_comment(timestamp, values))
+        except KeyboardInterrupt:
+            print("\n再生を停止しました。")
+
+    elapsed = time.perf_counter() - started
+    result = {
+        "ticks": tick_count,
+        "rows": rows_count,
+        "comments": total_comments,
+        "seconds": elapsed,
+        "comments_per_second": total_comments / elapsed if elapsed else 0.0,
+    }
+    print(f"再生を終了しました。取得{tick_count}回分、{rows_count}件から{total_comments}件のコメントを保存しました。")
+    print(f"処理時間: {elapsed:.2f}秒（{result['comments_per_second']:.0f}件/秒）")
+    print(writer.summary())
+    if sink.paths():
+        print(f"結果は {', '.join(sink.paths())} に保存されています。")
+    summary.print_report()
+    return result
+
+
+def main():
+    """メイン関数"""
+    # コマンドライン引数の設定
+    parser = argparse.ArgumentParser(description='記録した取得結果をブラウザなしで重複判定・出力・集計に流し直すツール')
+    parser.add_argument('recording', help='抽出ツールの--recordで記録したファイル')
+    parser.add_argument('-o', '--output',
+                        help='出力ファイル名。デフォルトは記録ファイル名_replay.csv')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv',
+                        help='出力形式。デフォルトはcsv')
+    parser.add_argument('--speed', type=float, default=1,
+                        help='再生の速さ（1で記録と同じ間隔、2で2倍速）。デフォルトは1')
+    parser.add_argument('--fast', action='store_true',
+                        help='記録の間隔を無視してできるだけ速く流す（処理性能の計測用）')
+    parser.add_argument('--approx-summary', action='store_true',
+                        help='ユニークユーザー数と上位ユーザーを固定メモリで概算する')
+    parser.add_argument('--echo', action='store_true',
+                        help='コメントを1件ずつ表示する')
+
+    # 引数を解析
+    args = parser.parse_args()
+
+    # 再生実行
+    replay(args.recording, args.output, args.format, 0 if args.fast else args.speed, args.approx_summary, args.echo)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+コメントの流量に合わせた取得間隔の調整
+
+固定の間隔で取得すると、コメントの少ない配信では無駄な取得が増え、多い配信では
+画面から流れて消えたコメントを取り逃がします。ここでは1回の取得で得たコメント数から
+流量（件/秒）を推定し、次の取得までに表示中のコメントの一定割合しか増えないように間隔を決めます。
+
+- コメントが増えたり、表示中のコメント数に対して1回の取得数が多くなった場合は間隔を短くする
+- 前回の取得位置のコメントが消えていた場合（取り逃がした可能性がある場合）や、取得する前にページから
+  消えたコメントがあった場合（取り逃がした場合）は最短の間隔にする（repoll_on_lossでは待たずに取得し直す）
+- コメントがない場合は間隔を倍々に延ばす
+
+間隔は floor 〜 ceiling の範囲に収めます。
+"""
+
+import time
+
+# 流量の推定に使う指数移動平均の重み（新しい値の割合）
+_RATE_WEIGHT = 0.5
+
+# 表示中のコメント数が分からない場合に、1回の取得で取る目安の件数
+_DEFAULT_TARGET_COUNT = 10
+
+# 間隔の変化がこの割合より小さい場合は表示しない
+_LOG_THRESHOLD = 0.2
+
+
+class AdaptiveInterval:
+    """
+    コメントの流量に合わせて取得間隔を調整する
+
+    使い方: 取得のたびにupdate()を呼び出し、intervalの秒数だけ待機する
+
+    Parameters:
+        initial (float): 最初の取得間隔（秒）
+        floor (float): 取得間隔の最短値（秒）
+        ceiling (float): 取得間隔の最長値（秒）
+        fill_ratio (float): 次の取得までに増えてよいコメント数の、表示中のコメント数に対する割合
+        backoff (float): コメントがなかった場合に間隔に掛ける倍率
+        verbose (bool): 間隔を変更した時に表示するかどうか
+        repoll_on_loss (bool): コメントを取り逃がした場合に、待たずにすぐ取得し直すかどうか（続けては行わない）
+    """
+
+    def __init__(self, initial=3, floor=0.5, ceiling=10, fill_ratio=0.5, backoff=2.0, verbose=True,
+                 repoll_on_loss=False):
+        if floor <= 0 or ceiling < floor:
+            raise ValueError(f"取得間隔の範囲が正しくありません: {floor}〜{ceiling}秒")
+        self.floor = floor
+        self.ceiling = ceiling
+        self.fill_ratio = fill_ratio
+        self.backoff = backoff
+        self.verbose = verbose
+        self.repoll_on_loss = repoll_on_loss
+        self.repoll = False
+        self.interval = min(max(initial, floor), ceiling)
+        self.rate = None
+        self.ticks = 0
+        self.last_tick = None
+        self.overflows = 0
+        self.lost = 0
+
+    def update(self, rows, visible=None, lost=0):
+        """
+        今回の取得結果から次の取得間隔を決める
+
+        Parameters:
+            rows (list): 今回取得したコメントのリスト（連続性が失われた位置にNone）。取得できなかった場合はNone
+            visible (int): ページに表示されているコメントの数（分からない場合はNone）
+            lost (int): 前回の取得から、取得する前にページから消えたコメントの数
+
+        Returns:
+            float: 次の取得までの間隔（秒）
+        """
+        now = time.monotonic()
+        elapsed = now - self.last_tick if self.last_tick is not None else self.interval
+        self.last_tick = now
+        self.ticks += 1
+
+        rows = rows or []
+        count = sum(1 for row in rows if row is not None)
+        # 最初の取得では前回の位置がないため、Noneが入っていても取り逃がしではない
+        gap = self.ticks > 1 and any(row is None for row in rows)
+
+        if count:
+            rate = count / max(elapsed, 1e-3)
+            self.rate = rate if self.rate is None else _RATE_WEIGHT * rate + (1 - _RATE_WEIGHT) * self.rate
+
+        if lost:
+            # 取得する前に流れて消えたコメントがあったため、最短の間隔にする
+            self.lost += lost
+            self.overflows += 1
+            interval = self.floor
+            reason = f"{lost}件のコメントを取り逃がした"
+        elif gap or (visible and count >= visible * self.fill_ratio):
+            # 表示中のコメントが前回の取得位置まで流れた（または流れそうな）ため、すぐに取得し直す
+            self.overflows += 1
+            interval = self.floor
+            reason = f"表示中の{visible}件のうち{count}件が新しいコメント" if not gap else "取得位置のコメントが消えた"
+        elif count:
+            target = visible * self.fill_ratio if visible else _DEFAULT_TARGET_COUNT
+            interval = target / self.rate
+            reason = f"{self.rate:.1f}件/秒"
+        else:
+            interval = self.interval * self.backoff
+            reason = "新しいコメントなし"
+
+        # 取り逃がした直後は待たずに取得し直す（取得し直しても取り逃がす場合は最短の間隔で続ける）
+        self.repoll = self.repoll_on_loss and bool(lost) and not self.repoll
+        self._set(min(max(interval, self.floor), self.ceiling), reason)
+        return self.interval
+
+    def delay(self):
+        """
+        次の取得まで待機する時間を返す
+
+        Returns:
+            float: 待機する時間（秒）。取り逃がした直後に取得し直す場合は0
+        """
+        return 0 if self.repoll else self.interval
+
+    def _set(self, interval, reason):
+        """取得間隔を変更し、変化が大きい場合は表示する"""
+        changed = abs(interval - self.interval) > self.interval * _LOG_THRESHOLD
+        self.interval = interval
+        if changed and self.verbose:
+            print(f"取得間隔を{interval:.1f}秒に変更しました（{reason}）")
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+ログイン状態の保存と再利用
+
+ログインが必要なプラットフォーム（Pococha）で、毎回手動でログインしなくても抽出を始められるようにします。
+ログイン状態の保存方法は2通りあります。
+
+- プロファイルフォルダ（use_profile_dir）: 抽出専用のChromeのユーザーデータフォルダを使い、
+  Cookie・localStorageなどをChrome自身に保存させる（既定）。同じフォルダは同時に1つのブラウザでしか使えないため、
+  別の抽出で使用中の場合は、その実行の間だけ複製したフォルダ（copy_profile）を使います。
+- セッションファイル（save_session / restore_session）: Cookieとページ（オリジン）のlocalStorageを
+  JSONファイルに保存し、起動のたびに書き戻す。複数のブラウザで同じログイン状態を使う場合に使います。
+
+ログイン状態が有効かどうかの判定はプラットフォームごとに呼び出し側で行います。
+"""
+
+import json
+import os
+import shutil
+import socket
+import tempfile
+from datetime import datetime
+
+SESSION_DIR = os.path.join(os.path.expanduser("~"), ".cache", "comment_capture", "sessions")
+
+# localStorageの内容を取り出すJavaScript
+_DUMP_LOCAL_STORAGE_JS = """
+var items = {};
+for (var i = 0; i < window.localStorage.length; i++) {
+    var key = window.localStorage.key(i);
+    items[key] = window.localStorage.getItem(key);
+}
+return items;
+"""
+
+# localStorageに書き戻すJavaScript
+_RESTORE_LOCAL_STORAGE_JS = """
+var items = arguments[0];
+for (var key in items) {
+    window.localStorage.setItem(key, items[key]);
+}
+return Object.keys(items).length;
+"""
+
+
+def default_profile_dir(platform_name):
+    """
+    プラットフォームの抽出専用プロファイルフォルダを返す
+
+    Parameters:
+        platform_name (str): プラットフォーム名（Platform.name）
+
+    Returns:
+        str: プロファイルフォルダのパス
+    """
+    return os.path.join(SESSION_DIR, f"{platform_name}-profile")
+
+
+def use_profile_dir(chrome_options, directory):
+    """
+    ログイン状態を保存するプロファイルフォルダを使うようにChromeの設定を変更する
+
+    Parameters:
+        chrome_options (Options): Chromeの設定（ブラウザの起動前に呼び出す）
+        directory (str): プロファイルフォルダ（ない場合は作成する）
+    """
+    directory = os.path.abspath(directory)
+    os.makedirs(directory, exist_ok=True)
+    chrome_options.add_argument(f"--user-data-dir={directory}")
+
+
+def profile_in_use(directory):
+    """
+    プロファイルフォルダを別のChromeが使用中かどうかを調べる
+
+    Linux / macOSではSingletonLock（「ホスト名-プロセスID」へのシンボリックリンク）、
+    Windowsでは開いたままのlockfileで判定します。同じホストで終了したプロセスのロックは使用中とみなしません。
+    ロックのファイルは変更しません。
+
+    Parameters:
+        directory (str): プロファイルフォルダ
+
+    Returns:
+        bool: 使用中かどうか
+    """
+    lock = os.path.join(directory, "SingletonLock")
+    if os.path.islink(lock):
+        host, _, pid = os.readlink(lock).rpartition("-")
+        if host != socket.gethostname() or not pid.isdigit():
+            return True
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            pass
+        return True
+    lockfile = os.path.join(directory, "lockfile")
+    if os.path.exists(lockfile):
+        # 使用中のChromeは他のプロセスと共有せずに開いているため、開けなければ使用中（ロックはChromeが片付ける）
+        try:
+            with open(lockfile, 'rb'):
+                pass
+        except OSError:
+            return True
+    return False
+
+
+def copy_profile(directory):
+    """
+    プロファイルフォルダを一時フォルダに複製する（キャッシュとロックは複製しない）
+
+    複製したフォルダでのログインやCookieの更新は元のフォルダに反映されません。
+    使い終わったら削除してください。
+
+    Parameters:
+        directory (str): 複製するプロファイルフォルダ
+
+    Returns:
+        str: 複製した一時フォルダのパス
+    """
+    copy = tempfile.mkdtemp(prefix="comment_capture-profile-")
+    shutil.copytree(directory, copy, symlinks=True, dirs_exist_ok=True,
+                    ignore=shutil.ignore_patterns("Singleton*", "lockfile", "*Cache*", "Service Worker"))
+    return copy
+
+
+def save_session(driver, path):
+    """
+    現在のページのCookieとlocalStorageをファイルに保存する
+
+    Parameters:
+        driver: Selenium WebDriver（ログイン済みのプラットフォームのページを開いた状態）
+        path (str): 保存するファイル
+
+    Returns:
+        bool: 保存できたかどうか
+    """
+    try:
+        session = {
+            "origin": driver.execute_script("return window.location.origin;"),
+            "cookies": driver.get_cookies(),
+            "local_storage": driver.execute_script(_DUMP_LOCAL_STORAGE_JS),
+            "saved_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(session, file, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"ログイン状態を保存できませんでした: {str(e)}")
+        return False
+    return True
+
+
+def restore_session(driver, path):
+    """
+    保存したCookieとlocalStorageをブラウザに書き戻す
+
+    CookieとlocalStorageはそのオリジンのページを開いていないと設定できないため、
+    保存時のオリジンを開いてから書き戻します（書き戻した後にページを開き直してください）。
+
+    Parameters:
+        driver: Selenium WebDriver
+        path (str): save_sessionで保存したファイル
+
+    Returns:
+        bool: 書き戻せたかどうか（ファイルがない場合はFalse）
+    """
+    try:
+        with open(path, encoding='utf-8') as file:
+            session = json.load(file)
+    except (OSError, ValueError):
+        return False
+
+    driver.get(session["origin"])
+    restored = 0
+    for cookie in session.get("cookies", []):
+        # 期限切れのCookieは書き戻さない
+        if cookie.get("expiry") and cookie["expiry"] < datetime.now().timestamp():
+            continue
+        try:
+            driver.add_cookie(cookie)
+            restored += 1
+        except Exception:
+            continue
+    driver.execute_script(_RESTORE_LOCAL_STORAGE_JS, session.get("local_storage", {}))
+    print(f"保存済みのログイン状態を書き戻しました（{session.get('saved_at')}に保存、Cookie {restored}件）")
+    return True
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+抽出したコメントの出力先
+
+出力先（シンク）は次のメソッドを持つオブジェクトです。GroupCommitWriterが専用のスレッドから呼び出します。
+
+- write_rows(rows): コメントの行（[タイムスタンプ, 値...]）のリストをまとめて書き込む
+- flush(fsync): 書き込んだ内容をOSに渡す（fsyncがTrueならディスクへの書き込みまで待つ）
+- close(): 出力先を閉じる
+- paths(): 書き込んだファイルのパスのリストを返す
+
+CSVはプラットフォームごとの列で出力します。Parquet / Arrow / SQLiteは3つのプラットフォームで共通の列
+（UNIFIED_COLUMNS）で出力するため、複数のプラットフォームのコメントをまとめて分析できます。
+"""
+
+import csv
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+from comment_capture.platforms import stream_id_from_url
+
+OUTPUT_FORMATS = ("csv", "parquet", "arrow", "sqlite")
+
+# Parquet / Arrow / SQLiteで共通の列（PocochaのレベルとコメントタイプはCSVと同じ名前）
+UNIFIED_COLUMNS = ['タイムスタンプ', 'プラットフォーム', 'ストリーム', 'ユーザー名', 'レベル', 'コメント', 'コメントタイプ']
+
+
+class CsvSink:
+    """
+    CSVファイルへの出力
+
+    Parameters:
+        output_file (str): 出力するCSVファイル名
+        header (list): CSVのヘッダー
+    """
+
+    def __init__(self, output_file, header):
+        self.output_file = output_file
+        self.file = open(output_file, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(header)
+        self.file.flush()
+
+    def write_rows(self, rows):
+        """コメントの行をまとめて書き込む"""
+        self.writer.writerows(rows)
+
+    def flush(self, fsync=False):
+        """書き込んだ内容をOSに渡す（fsyncがTrueならディスクへの書き込みまで待つ）"""
+        self.file.flush()
+        if fsync:
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        """ファイルを閉じる"""
+        self.file.close()
+
+    def paths(self):
+        """書き込んだファイルのパスのリストを返す"""
+        return [self.output_file]
+
+
+def _import_pyarrow():
+    """pyarrowを読み込む（Parquet / Arrowで出力する場合だけ必要）"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet / Arrowで出力するにはpyarrowが必要です: pip install pyarrow")
+    return pyarrow
+
+
+def unified_schema(pa):
+    """
+    Parquet / Arrowの共通スキーマを作成する
+
+    繰り返しの多い列（プラットフォーム、ストリーム、ユーザー名、コメントタイプ）は辞書エンコードします。
+
+    Parameters:
+        pa: pyarrowモジュール
+
+    Returns:
+        Schema: 共通スキーマ
+    """
+    text = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('タイムスタンプ', pa.timestamp('s')),
+        ('プラットフォーム', text),
+        ('ストリーム', text),
+        ('ユーザー名', text),
+        ('レベル', pa.int16()),
+        ('コメント', pa.string()),
+        ('コメントタイプ', text),
+    ])
+
+
+def parse_level(level):
+    """レベルの表示（"12"、"Lv.12"など）から数値を取り出す"""
+    match = re.search(r"\d+", level or "")
+    return int(match.group()) if match else None
+
+
+def to_unified(platform, stream_id, row):
+    """
+    プラットフォームごとのコメントの行を共通の列の値に変換する
+
+    Parameters:
+        platform (Platform): 対象プラットフォームの設定
+        stream_id (str): ストリームID
+        row (list): [タイムスタンプ, 値...]
+
+    Returns:
+        tuple: UNIFIED_COLUMNSの順の値
+    """
+    values = dict(zip(platform.fields, row[1:]))
+    return (row[0], platform.name, stream_id, values.get("username"), parse_level(values.get("level")),
+            values.get("comment"), values.get("type", "user"))
+
+
+class ColumnarSink:
+    """
+    Parquet / Arrow IPC（ストリーム形式）への出力（一定の時間またはサイズごとにファイルを切り替える）
+
+    Parquetは行グループ（row_group_size件か、最初のコメントからrow_group_seconds秒）ごとにファイルへ
+    書き込むため、それまでのコメントはメモリ上に保持され、フラッシュ（--flush-ms / --fsync）では書き込まれません。
+    また、ファイルは閉じる（切り替える）まで完成しないため、他のプログラムからは読めず、
+    途中で異常終了すると開いているファイルのコメントは失われます。
+    書き込みの遅れを小さくしたい場合や、取得中に読みたい場合はArrow（フラッシュのたびに書き込む）を使ってください。
+    行グループの時間の上限とファイルの切り替えは書き込みとフラッシュのたびに確認します（GroupCommitWriterは
+    コメントがない間もmax_delay_msごとにフラッシュするため、コメントが少ない配信でも時間どおりに書き込み・切り替えます）。
+
+    Parameters:
+        output_prefix (str): 出力ファイル名の先頭部分（後ろに開始時刻と番号、拡張子を付ける）
+        platform (Platform): 対象プラットフォームの設定
+        stream_id (str): ストリームID
+        file_format (str): "parquet" または "arrow"
+        roll_minutes (float): ファイルを切り替える間隔（分）
+        roll_mb (float): ファイルを切り替えるサイズ（MB）
+        row_group_size (int): Parquetの行グループの件数
+        row_group_seconds (float): Parquetでコメントをためておく最大の時間（秒）
+    """
+
+    def __init__(self, output_prefix, platform, stream_id, file_format="parquet", roll_minutes=60, roll_mb=256,
+                 row_group_size=10000, row_group_seconds=60):
+        self.pa = _import_pyarrow()
+        self.schema = unified_schema(self.pa)
+        self.output_prefix = output_prefix
+        self.platform = platform
+        self.stream_id = stream_id
+        self.file_format = file_format
+        self.roll_seconds = roll_minutes * 60
+        self.roll_bytes = roll_mb * 1024 * 1024
+        self.row_group_size = row_group_size if file_format == "parquet" else 1
+        self.row_group_seconds = row_group_seconds
+        self.columns = {name: [] for name in UNIFIED_COLUMNS}
+        self.buffered = 0
+        self.buffered_since = 0
+        self.file = None
+        self.writer = None
+        self.opened_at = 0
+        self.file_number = 0
+        self.files = []
+
+    def write_rows(self, rows):
+        """コメントの行を共通の列に変換してためる（Parquetは行グループの件数に達したら書き込む）"""
+        if rows and not self.buffered:
+            self.buffered_since = time.time()
+        for row in rows:
+            for name, value in zip(UNIFIED_COLUMNS, to_unified(self.platform, self.stream_id, row)):
+                self.columns[name].append(value)
+        self.buffered += len(rows)
+        if self.buffered >= self.row_group_size:
+            self._write_batch()
+
+    def flush(self, fsync=False):
+        """
+        書き込んだ内容をOSに渡す
+
+        Arrowはためているコメントもここで書き込みます。Parquetは最初にためたコメントから
+        row_group_seconds秒が経っていれば書き込みます。切り替えの時間またはサイズに達していれば、
+        コメントがなくてもファイルを閉じます（次のコメントは新しいファイルに書き込む）。
+        """
+        if self.buffered and (self.file_format == "arrow"
+                              or time.time() - self.buffered_since >= self.row_group_seconds):
+            self._write_batch()
+        elif self.writer is not None and self._should_roll():
+            self._close_file()
+        if self.file:
+            self.file.flush()
+            if fsync:
+                os.fsync(self.file.fileno())
+
+    def close(self):
+        """ためているコメントを書き込んでファイルを閉じる"""
+        if self.buffered:
+            self._write_batch()
+        self._close_file()
+
+    def paths(self):
+        """書き込んだファイルのパスのリストを返す（コメントがなかった場合は空）"""
+        return list(self.files)
+
+    def _write_batch(self):
+        """ためているコメントを1つのバッチ（行グループ）として書き込む"""
+        pa = self.pa
+        if self.writer is None or self._should_roll():
+            self._open_file()
+        self.columns['タイムスタンプ'] = [datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+                                     for timestamp in self.columns['タイムスタンプ']]
+        arrays = []
+        for field in self.schema:
+            if pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(self.columns[field.name], pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(self.columns[field.name], field.type))
+        table = pa.Table.from_arrays(arrays, schema=self.schema)
+        self.writer.write_table(table)
+        self.columns = {name: [] for name in UNIFIED_COLUMNS}
+        self.buffered = 0
+
+    def _should_roll(self):
+        """ファイルを切り替える時間またはサイズに達したかどうか"""
+        if time.time() - self.opened_at >= self.roll_seconds:
+            return True
+        return self.file.tell() >= self.roll_bytes
+
+    def _open_file(self):
+        """新しいファイルを開く（開いているファイルは閉じる）"""
+        self._close_file()
+        self.file_number += 1
+        extension = "parquet" if self.file_format == "parquet" else "arrows"
+        path = f"{self.output_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.file_number:03d}.{extension}"
+        self.file = open(path, 'wb')
+        if self.file_format == "parquet":
+            self.writer = self.pa.parquet.ParquetWriter(self.file, self.schema, compression="zstd")
+        else:
+            self.writer = self.pa.ipc.new_stream(self.file, self.schema)
+        self.opened_at = time.time()
+        self.files.append(path)
+        print(f"出力ファイルを作成しました: {path}")
+
+    def _close_file(self):
+        """開いているファイルを閉じる"""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class SqliteSink:
+    """
+    SQLiteデータベース（WALモード）への出力
+
+    全てのプラットフォーム・ストリームのコメントを共通の列の1つのテーブル（comments）に書き込みます。
+    WALモードのため、抽出中でも他のプロセスから検索でき、複数の抽出プロセスが同じデータベースに
+    書き込むこともできます（書き込みが重なった場合はbusy_timeoutの間待ちます）。
+    コメントはフラッシュのたびに1つのトランザクションでまとめて挿入します。
+
+    Parameters:
+        database (str): データベースファイル名
+        platform (Platform): 対象プラットフォームの設定
+        stream_id (str): ストリームID
+        busy_timeout_ms (int): 他のプロセスの書き込みを待つ最大時間（ミリ秒）
+    """
+
+    def __init__(self, database, platform, stream_id, busy_timeout_ms=10000):
+        self.database = database
+        self.platform = platform
+        self.stream_id = stream_id
+        self.pending = []
+        self.synchronous = None
+        # 作成したスレッドとは別の書き込みスレッドから使う（同時に使うのは1つのスレッドだけ）
+        self.connection = sqlite3.connect(database, isolation_level=None, check_same_thread=False)
+        self.connection.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS comments (
+                id INTEGER PRIMARY KEY,
+                タイムスタンプ TEXT NOT NULL,
+                プラットフォーム TEXT NOT NULL,
+                ストリーム TEXT NOT NULL,
+                ユーザー名 TEXT,
+                レベル INTEGER,
+                コメント TEXT,
+                コメントタイプ TEXT
+            );
+            -- ストリームIDはプラットフォームの中でだけ一意のため、プラットフォームとストリームの組で引く
+            DROP INDEX IF EXISTS idx_comments_stream_time;
+            DROP INDEX IF EXISTS idx_comments_stream_user;
+            CREATE INDEX IF NOT EXISTS idx_comments_platform_stream_time ON comments (プラットフォーム, ストリーム, タイムスタンプ);
+            CREATE INDEX IF NOT EXISTS idx_comments_platform_stream_user ON comments (プラットフォーム, ストリーム, ユーザー名);
+        """)
+
+    def write_rows(self, rows):
+        """コメントの行を共通の列に変換してためる（挿入はflushでまとめて行う）"""
+        self.pending.extend(to_unified(self.platform, self.stream_id, row) for row in rows)
+
+    def flush(self, fsync=False):
+        """ためているコメントを1つのトランザクションで挿入する（fsyncがTrueならsynchronous=FULL）"""
+        synchronous = "FULL" if fsync else "NORMAL"
+        if synchronous != self.synchronous:
+            self.connection.execute(f"PRAGMA synchronous = {synchronous}")
+            self.synchronous = synchronous
+        if not self.pending:
+            return
+        # 最初に書き込みロックを取り、他のプロセスと競合した場合はbusy_timeoutの間待つ
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            self.connection.executemany(
+                "INSERT INTO comments (タイムスタンプ, プラットフォーム, ストリーム, ユーザー名, レベル, コメント, コメントタイプ)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)", self.pending)
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.pending = []
+
+    def close(self):
+        """ためているコメントを挿入してデータベースを閉じる"""
+        self.flush()
+        self.connection.close()
+
+    def paths(self):
+        """書き込んだファイルのパスのリストを返す"""
+        return [self.database]
+
+
+def create_sink(output_format, output_file, platform, url=""):
+    """
+    出力形式に合わせた出力先を作成する
+
+    Parameters:
+        output_format (str): "csv"、"parquet"、"arrow"、"sqlite" のいずれか
+        output_file (str): 出力ファイル名（Parquet / Arrowでは拡張子を除いた部分をファイル名の先頭に使い、
+            SQLiteでは拡張子が.db / .sqlite / .sqlite3以外の場合は.dbに変える）
+        platform (Platform): 対象プラットフォームの設定
+        url (str): ライブストリームURL（共通の列のストリームIDに使う）
+
+    Returns:
+        出力先
+    """
+    if output_format == "csv":
+        return CsvSink(output_file, platform.csv_header)
+    if output_format in ("parquet", "arrow"):
+        return ColumnarSink(os.path.splitext(output_file)[0], platform, stream_id_from_url(url), output_format)
+    if output_format == "sqlite":
+        base, ext = os.path.splitext(output_file)
+        database = output_file if ext in (".db", ".sqlite", ".sqlite3") else base + ".db"
+        return SqliteSink(database, platform, stream_id_from_url(url))
+    raise ValueError(f"出力形式は{OUTPUT_FORMATS}のいずれかを指定してください: {output_format}")
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""
+配信サイトの代わりになるローカルのWebSocketサーバー（動作確認用）
+
+ブラウザで開くと、WebSocketで受信したコメントを各プラットフォームと同じ構造のDOMに追加する
+ページを返します。同じコメントをWebSocketのフレームとDOMの両方で受け取れるため、
+ネットワークからの取得（--network）とDOMからの取得を、実際の配信なしで比較できます。
+
+コメントの送信間隔は一定（steady）のほか、ランダム（poisson）や、一定の間隔で流量が跳ね上がる（burst）
+パターンを選べます。ページに残すコメント数（--max-items）を指定すると、実際の配信と同じように
+古いコメントがページから消えるため、取得の間隔が長すぎる場合の取り逃がしも再現できます。
+
+使い方:
+    python -m comment_capture.standin --platform whowatch --rate 5
+    python "whowatchのコメント抽出_リアルタイム/whowatch_comment_extractor.py" http://127.0.0.1:8765/ --network
+
+BIGO LIVEも同じように bego_comment_extractor.py で確認できます。Pocochaの抽出ツールはログインと
+再生ボタンの操作を待つため代替サーバーには使えません。Pocochaのページは comment_capture.bench で使います。
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import threading
+import time
+
+from comment_capture.websocket import (OPCODE_CLOSE, accept_websocket, encode_frame, is_websocket_request,
+                                       read_frame, read_http_request, send_http_response)
+
+SAMPLE_USERS = ["さくら", "たろう", "hanako", "ゆうき", "Ken", "みさき", "りょう", "あおい"]
+SAMPLE_COMMENTS = ["こんばんは！", "初見です", "かわいい", "888888", "おつかれさま",
+                   "今日も楽しみにしてました", "wwww", "すごい！", "また来ます"]
+SAMPLE_NOTICES = ["ライブが始まりました", "ランキングが更新されました"]
+
+PATTERNS = ("steady", "poisson", "burst")
+
+# ベンチマーク用にコメントの末尾に付ける印（コメントのIDと送信時刻のミリ秒）
+MARKER_PATTERN = re.compile(r"\[cc:(\d+):(\d+)\]")
+
+
+def parse_marker(comment_text):
+    """
+    コメントの末尾の印からコメントのIDと送信時刻を取り出す
+
+    Parameters:
+        comment_text (str): コメント
+
+    Returns:
+        tuple: (コメントのID, 送信時刻（エポック秒）)。印がない場合はNone
+    """
+    match = MARKER_PATTERN.search(comment_text or "")
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2)) / 1000
+
+# 受信したコメントをプラットフォームと同じ構造のDOMに追加するJavaScript
+_RENDER_JS = {
+    "whowatch": """
+    var list = document.querySelector("div.pc-comments.live-viewer");
+    function render(c) {
+        var item = document.createElement("div");
+        item.className = "comment-item";
+        item.innerHTML = '<span class="username"></span><span class="comment-text"></span>';
+        item.children[0].textContent = c.user.name;
+        item.children[1].textContent = c.message;
+        list.insertBefore(item, list.firstChild);
+    }
+    function onFrame(data) { data.comments.forEach(render); }
+    """,
+    "bigo": """
+    var list = document.querySelector(".chat__container");
+    function onFrame(text) {
+        var packet = JSON.parse(text.replace(/^\\d+/, ""));
+        var c = packet[1];
+        var item = document.createElement("div");
+        item.className = "chat-message";
+        item.innerHTML = '<span class="username"></span><span class="message-content"></span>';
+        item.children[0].textContent = c.nick_name;
+        item.children[1].textContent = c.content;
+        list.appendChild(item);
+        list.scrollTop = list.scrollHeight;
+    }
+    """,
+    "pococha": """
+    var list = document.querySelector("div.messages_messagesWrapper__l2Aus");
+    function onFrame(data) {
+        var c = data.data;
+        var item = document.createElement("div");
+        item.className = "messages_messagesItem__PpIZU";
+        var body = '<div class="messages_messageWrapper__cF93S"><div class="common-message-styles_messageBody__89Pbc';
+        if (c.type === "system") {
+            body += ' live-news-message_info__L_ooM"><span></span></div></div>';
+            item.innerHTML = body;
+            item.querySelector("span").textContent = c.text;
+        } else {
+            body += '"><span class="name_wrapper__jpk5P"><span class="name_name__1stkJ"></span>' +
+                '<span class="name_level__dHiJG"></span></span><span class="comment"></span></div></div>';
+            item.innerHTML = body;
+            item.querySelector(".name_name__1stkJ").textContent = c.user.name;
+            item.querySelector(".name_level__dHiJG").textContent = c.user.level;
+            item.querySelector(".comment").textContent = c.text;
+        }
+        list.appendChild(item);
+    }
+    """,
+}
+
+# 新しいコメントを上部に追加するプラットフォーム（古いコメントを下から消す）
+_NEWEST_FIRST = {"whowatch": True}
+
+_CONTAINERS = {
+    "whowatch": '<div class="pc-comments live-viewer" style="height:600px;overflow:auto"></div>',
+    "bigo": '<div class="chat__container" style="height:600px;overflow:auto"></div>',
+    "pococha": '<div class="messages_messagesWrapper__l2Aus" style="height:600px;overflow:auto"></div>',
+}
+
+_PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="ja">
+<head><meta charset="utf-8"><title>stand-in: __PLATFORM__</title></head>
+<body>
+__CONTAINER__
+<script>
+__RENDER__
+var maxItems = __MAX_ITEMS__;
+var newestFirst = __NEWEST_FIRST__;
+// 実際の配信と同じように、残すコメント数を超えたら古いコメントから消す
+function trim() {
+    while (maxItems > 0 && list.children.length > maxItems) {
+        list.removeChild(newestFirst ? list.lastElementChild : list.firstElementChild);
+    }
+}
+var socket = new WebSocket("ws://" + location.host + "/ws");
+socket.onmessage = function(event) {
+    var text = event.data;
+    onFrame(text.charAt(0) === "{" ? JSON.parse(text) : text);
+    trim();
+};
+</script>
+</body>
+</html>
+"""
+
+
+def build_page(platform_name, max_items=0):
+    """
+    プラットフォームのコメント領域を再現したページのHTMLを作成する
+
+    Parameters:
+        platform_name (str): プラットフォーム名
+        max_items (int): ページに残すコメント数（0の場合は消さない）
+
+    Returns:
+        str: HTML
+    """
+    return (_PAGE_TEMPLATE
+            .replace("__PLATFORM__", platform_name)
+            .replace("__CONTAINER__", _CONTAINERS[platform_name])
+            .replace("__RENDER__", _RENDER_JS[platform_name])
+            .replace("__MAX_ITEMS__", str(int(max_items)))
+            .replace("__NEWEST_FIRST__", json.dumps(_NEWEST_FIRST.get(platform_name, False))))
+
+
+def build_frame(platform_name, comment_id, rng=random, marker=False):
+    """
+    プラットフォームのメッセージに似せたコメントのフレームを作成する
+
+    Parameters:
+        platform_name (str): プラットフォーム名
+        comment_id (int): コメントのID
+        rng (Random): 乱数生成器
+        marker (bool): コメントの末尾にIDと送信時刻の印を付けるかどうか（ベンチマーク用）
+
+    Returns:
+        str: フレームの内容
+    """
+    username = rng.choice(SAMPLE_USERS)
+    comment_text = rng.choice(SAMPLE_COMMENTS)
+    notice_text = rng.choice(SAMPLE_NOTICES)
+    if marker:
+        suffix = f" [cc:{comment_id}:{int(time.time() * 1000)}]"
+        comment_text += suffix
+        notice_text += suffix
+    if platform_name == "whowatch":
+        return json.dumps({"type": "comments", "comments": [
+            {"id": comment_id, "user": {"name": username}, "message": comment_text}
+        ]}, ensure_ascii=False)
+    if platform_name == "bigo":
+        # socket.ioのイベント形式
+        return "42" + json.dumps(["chat", {"msg_id": str(comment_id), "nick_name": username,
+                                           "content": comment_text}], ensure_ascii=False)
+    if rng.random() < 0.05:
+        return json.dumps({"type": "system", "data": {"id": comment_id, "type": "system",
+                                                      "text": notice_text}}, ensure_ascii=False)
+    return json.dumps({"type": "message", "data": {
+        "id": comment_id, "type": "comment", "user": {"name": username, "level": rng.randint(1, 99)},
+        "text": comment_text,
+    }}, ensure_ascii=False)
+
+
+class StandInServer:
+    """
+    コメントをWebSocketに送信するローカルサーバー
+
+    Parameters:
+        platform_name (str): 再現するプラットフォーム名
+        rate (float): 1秒あたりのコメント数
+        seed (int): 乱数の種（同じ値なら同じコメント列になる）
+        pattern (str): 送信間隔のパターン（"steady": 一定 / "poisson": ランダム / "burst": 一定の間隔で増える）
+        burst_rate (float): burstの間の1秒あたりのコメント数（省略時はrateの10倍）
+        burst_every (float): burstの間隔（秒）
+        burst_seconds (float): 1回のburstの長さ（秒）
+        max_items (int): ページに残すコメント数（0の場合は消さない）
+        marker (bool): コメントの末尾にIDと送信時刻の印を付けるかどうか（ベンチマーク用）
+    """
+
+    def __init__(self, platform_name, rate=5, seed=None, pattern="steady", burst_rate=None, burst_every=30,
+                 burst_seconds=5, max_items=0, marker=False):
+        if pattern not in PATTERNS:
+            raise ValueError(f"patternは{PATTERNS}のいずれかを指定してください: {pattern}")
+        self.platform_name = platform_name
+        self.rate = rate
+        self.rng = random.Random(seed)
+        self.pattern = pattern
+        self.burst_rate = burst_rate or rate * 10
+        self.burst_every = burst_every
+        self.burst_seconds = burst_seconds
+        self.max_items = max_items
+        self.marker = marker
+        self.ids = itertools.count(1)
+        self.sent = 0
+        self.sending = True
+        self.started_at = time.monotonic()
+        self._loop = None
+
+    def next_delay(self):
+        """
+        次のコメントを送信するまでの待ち時間を返す
+
+        Returns:
+            float: 待ち時間（秒）
+        """
+        rate = self.rate
+        if self.pattern == "burst" and (time.monotonic() - self.started_at) % self.burst_every < self.burst_seconds:
+            rate = self.burst_rate
+        if self.pattern == "poisson":
+            return self.rng.expovariate(rate)
+        return 1 / rate
+
+    def stop_sending(self):
+        """コメントの送信を止める（接続はそのまま）"""
+        self.sending = False
+
+    async def handle(self, reader, writer):
+        """HTTPリクエスト1件を処理する（/ws はWebSocket、それ以外はページを返す）"""
+        path, headers = await read_http_request(reader)
+        if path is None:
+            writer.close()
+            return
+        if not is_websocket_request(headers):
+            await send_http_response(writer, build_page(self.platform_name, self.max_items))
+            return
+
+        await accept_websocket(writer, headers)
+        closed = asyncio.ensure_future(self._wait_close(reader))
+        try:
+            while not closed.done():
+                if self.sending:
+                    frame = build_frame(self.platform_name, next(self.ids), self.rng, self.marker)
+                    writer.write(encode_frame(frame))
+                    await writer.drain()
+                    self.sent += 1
+                await asyncio.sleep(self.next_delay())
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # サーバーの停止（stop）でキャンセルされた場合も接続を閉じて終える
+            pass
+        finally:
+            closed.cancel()
+            writer.close()
+
+    async def _wait_close(self, reader):
+        """クライアントからのクローズ（または切断）を待つ"""
+        try:
+            while True:
+                opcode, _ = await read_frame(reader)
+                if opcode == OPCODE_CLOSE:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        """サーバーを起動して停止されるまで待つ"""
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"{self.platform_name}の代替サーバーを起動しました: http://{host}:{port}/")
+        async with server:
+            await server.serve_forever()
+
+    def start_in_thread(self, host="127.0.0.1", port=0):
+        """
+        サーバーを別スレッドで起動する（ベンチマークなど、同じプロセスから使う場合）
+
+        Parameters:
+            host (str): 待ち受けるアドレス
+            port (int): 待ち受けるポート（0の場合は空いているポート）
+
+        Returns:
+            str: ページのURL
+
+        Raises:
+            OSError: 待ち受けを開始できない場合（ポートが使用中など）
+        """
+        ready = threading.Event()
+        address = {}
+
+        def run():
+            loop = asyncio.new_event_loop()
+            # 終了時のasyncio.gather（タスクがない場合）はスレッドの現在のループを使う
+            asyncio.set_event_loop(loop)
+            try:
+                server = loop.run_until_complete(asyncio.start_server(self.handle, host, port))
+                address["port"] = server.sockets[0].getsockname()[1]
+                self._loop = loop
+            except Exception as e:
+                # 起動を待っている呼び出し元に失敗を伝える
+                address["error"] = e
+                loop.close()
+                return
+            finally:
+                ready.set()
+            loop.run_forever()
+            # 接続中のクライアントの処理を終わらせてから閉じる
+            server.close()
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+
+        threading.Thread(target=run, name="standin-server", daemon=True).start()
+        ready.wait()
+        if "error" in address:
+            raise address["error"]
+        return f"http://{host}:{address['port']}/"
+
+    def stop(self):
+        """start_in_threadで起動したサーバーを停止する"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
+
+def main():
+    """メイン関数"""
+    # コマンドライン引数の設定
+    parser = argparse.ArgumentParser(description='配信サイトの代わりにコメントを送信するローカルのWebSocketサーバー')
+    parser.add_argument('--platform', choices=sorted(_CONTAINERS), default='whowatch',
+                        help='再現するプラットフォーム。デフォルトはwhowatch')
+    parser.add_argument('--rate', type=float, default=5,
+                        help='1秒あたりのコメント数。デフォルトは5')
+    parser.add_argument('--host', default='127.0.0.1', help='待ち受けるアドレス。デフォルトは127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help='待ち受けるポート。デフォルトは8765')
+    parser.add_argument('--seed', type=int, help='乱数の種')
+    parser.add_argument('--pattern', choices=PATTERNS, default='steady',
+                        help='送信間隔のパターン（steady: 一定 / poisson: ランダム / burst: 一定の間隔で増える）。デフォルトはsteady')
+    parser.add_argument('--burst-rate', type=float,
+                        help='burstの間の1秒あたりのコメント数。デフォルトは--rateの10倍')
+    parser.add_argument('--burst-every', type=float, default=30, help='burstの間隔（秒）。デフォルトは30秒')
+    parser.add_argument('--burst-seconds', type=float, default=5, help='1回のburstの長さ（秒）。デフォルトは5秒')
+    parser.add_argument('--max-items', type=int, default=0,
+                        help='ページに残すコメント数（超えると古いものから消す）。デフォルトは0（消さない）')
+    parser.add_argument('--marker', action='store_true',
+                        help='コメントの末尾にIDと送信時刻の印を付ける（ベンチマーク用）')
+
+    # 引数を解析
+    args = parser.parse_args()
+
+    server = StandInServer(args.platform, args.rate, args.seed, args.pattern, args.burst_rate, args.burst_every,
+                           args.burst_seconds, args.max_items, args.marker)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"停止しました。送信したコメント: {server.sent}件")
+
+
+if __name__ == "__main__":
+    main()
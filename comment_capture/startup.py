@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+起動から最初のコメント取得までの時間計測（--startup-profile）
+"""
+
+import time
+
+
+class StartupProfiler:
+    """
+    起動処理の段階ごとの所要時間を記録する
+
+    Parameters:
+        enabled (bool): 計測結果を表示するかどうか
+        started_at (float): 計測の起点（time.perf_counter()の値）。省略時は作成した時点
+    """
+
+    def __init__(self, enabled=False, started_at=None):
+        self.enabled = enabled
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.last = self.started_at
+        self.phases = []
+        self.reported = False
+
+    def mark(self, phase):
+        """
+        前回の記録から現在までを1つの段階として記録する
+
+        Parameters:
+            phase (str): 段階の名前
+        """
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        """
+        段階ごとの所要時間を表示する（表示は1回だけ）
+        """
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        print("\n=== 起動時間の内訳 ===")
+        for phase, seconds in self.phases:
+            print(f"{phase}: {seconds:.3f}秒")
+        print(f"合計: {self.last - self.started_at:.3f}秒\n")
@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+直近のコメントを保持するメモリ上のストア
+
+オーバーレイやモデレーションのツールが、CSVを読み直さずに直近のコメントを参照できるようにします。
+ストリームごとに直近のcapacity件を固定サイズの領域に保持するため、長時間の配信でもメモリ使用量は増えません。
+
+- 時刻・ユーザーID・レベル・種類・本文の位置は、件数分の長さのarrayにリングバッファとして持つ
+- ユーザー名は整数のIDに置き換えて1回だけ保持し、保持しているコメントがなくなったユーザー名は解放する
+- 本文はUTF-8で1つのbytearray（text_bytesバイト）に続けて書き込み、一杯になったら先頭から上書きする
+  （上書きされた本文のコメントは件数に空きがあっても取り出さない）
+
+使い方:
+    store = CommentStore()
+    recent = store.stream("whowatch", "12345")
+    recent.add_row(WHOWATCH, [timestamp, username, comment])
+    recent.last(100) / recent.by_user("ユーザー") / recent.since(time.time() - 60)
+
+各抽出ツールと multistream / engine は --metrics-port のHTTPエンドポイントの /recent で、
+別のプロセスからも参照できるようにします（query_recent を参照）。
+
+    /recent?n=100                 直近の100件
+    /recent?user=名前             指定したユーザーのコメント
+    /recent?since=エポック秒      指定した時刻以降のコメント
+    /recent?stream=whowatch:12345 ストリームの指定（複数のストリームを抽出している場合）
+"""
+
+import threading
+import time
+from array import array
+from datetime import datetime
+
+from comment_capture.sinks import parse_level
+
+# コメントの種類（Platform.fieldsの"type"）をIDにする
+_TYPES = ["user", "system"]
+
+# レベルがないことを表す値
+_NO_LEVEL = -1
+
+
+def _comment(at, username, level, comment, comment_type):
+    """保持しているコメント1件をdictにする"""
+    return {
+        "time": at,
+        "timestamp": datetime.fromtimestamp(at).strftime("%Y-%m-%d %H:%M:%S"),
+        "username": username,
+        "level": level,
+        "comment": comment,
+        "type": comment_type,
+    }
+
+
+class RecentComments:
+    """
+    1つのストリームの直近のコメント
+
+    追加は取得ループのスレッドから、参照は別のスレッドからでも行えます。
+
+    Parameters:
+        capacity (int): 保持するコメントの最大件数
+        text_bytes (int): 本文を保持する領域の大きさ（バイト）
+    """
+
+    def __init__(self, capacity=10000, text_bytes=1024 * 1024):
+        if capacity <= 0 or text_bytes <= 0:
+            raise ValueError(f"保持する件数と領域の大きさは正の値を指定してください: {capacity}件、{text_bytes}バイト")
+        self.capacity = capacity
+        self.text_bytes = text_bytes
+        self.lock = threading.Lock()
+
+        # コメントごとの値（添字は追加した順の通し番号 % capacity）
+        self.times = array('d', bytes(8 * capacity))
+        self.users = array('l', [0]) * capacity
+        self.levels = array('l', [0]) * capacity
+        self.types = array('b', [0]) * capacity
+        self.offsets = array('q', [0]) * capacity
+        self.lengths = array('l', [0]) * capacity
+
+        # 本文のリングバッファ（offsetsは書き込んだ総バイト数で数えた位置）
+        self.text = bytearray(text_bytes)
+        self.written_bytes = 0
+
+        # ユーザー名の辞書（保持しているコメントの数を数え、0になったら解放して番号を再利用する）
+        self.user_ids = {}
+        self.user_names = []
+        self.user_refs = array('l')
+        self.free_ids = []
+
+        # 追加したコメントの総数（次の通し番号）
+        self.count = 0
+
+    def __len__(self):
+        with self.lock:
+            return self.count - self._first_valid()
+
+    def add(self, username, comment, level=None, comment_type="user", at=None):
+        """
+        コメントを1件追加する（一杯の場合は最も古いコメントを上書きする）
+
+        Parameters:
+            username (str): ユーザー名
+            comment (str): コメント
+            level (int): ユーザーのレベル（ない場合はNone）
+            comment_type (str): コメントの種類（"user" または "system"）
+            at (float): コメントの時刻（エポック秒。省略時は現在時刻）
+
+        Returns:
+            dict: 追加したコメント（last などで返すものと同じ形式）
+        """
+        at = time.time() if at is None else at
+        comment_type = comment_type if comment_type in _TYPES else "user"
+        encoded = (comment or "").encode("utf-8")[:self.text_bytes]
+        with self.lock:
+            slot = self.count % self.capacity
+            if self.count >= self.capacity:
+                self._release_user(self.users[slot])
+            self.times[slot] = at
+            self.users[slot] = self._intern_user(username or "")
+            self.levels[slot] = _NO_LEVEL if level is None else int(level)
+            self.types[slot] = _TYPES.index(comment_type)
+            self.offsets[slot] = self.written_bytes
+            self.lengths[slot] = len(encoded)
+            self._write_text(encoded)
+            self.count += 1
+        return _comment(at, username or "", level, comment or "", comment_type)
+
+    def add_row(self, platform, row, at=None):
+        """
+        抽出ツールの出力の行を1件追加する
+
+        Parameters:
+            platform (Platform): 対象プラットフォームの設定
+            row (list): [タイムスタンプ, 値...]（値はplatform.fieldsの順）
+            at (float): コメントの時刻（エポック秒。省略時は現在時刻）
+
+        Returns:
+            dict: 追加したコメント
+        """
+        values = dict(zip(platform.fields, row[1:]))
+        # Pocochaのレベルは"Lv.12"のように表示されるため、出力先と同じく数値だけを取り出す
+        return self.add(values.get("username"), values.get("comment"), parse_level(values.get("level")),
+                        values.get("type", "user"), at)
+
+    def last(self, count=100):
+        """
+        直近のコメントを返す
+
+        Parameters:
+            count (int): 件数
+
+        Returns:
+            list: コメントのリスト（古い順。各コメントはdict）
+        """
+        with self.lock:
+            first = max(self._first_valid(), self.count - count)
+            return [self._read(seq) for seq in range(first, self.count)]
+
+    def by_user(self, username, count=None):
+        """
+        指定したユーザーのコメントを返す
+
+        Parameters:
+            username (str): ユーザー名
+            count (int): 最大件数（新しいものから数える。省略時は保持している全て）
+
+        Returns:
+            list: コメントのリスト（古い順）
+        """
+        with self.lock:
+            user_id = self.user_ids.get(username)
+            if user_id is None:
+                return []
+            matches = []
+            for seq in range(self.count - 1, self._first_valid() - 1, -1):
+                if self.users[seq % self.capacity] == user_id:
+                    matches.append(self._read(seq))
+                    if count is not None and len(matches) >= count:
+                        break
+            matches.reverse()
+            return matches
+
+    def query(self, count=100, username=None, since=None):
+        """
+        条件に合う直近のコメントを返す（/recent のクエリ用）
+
+        Parameters:
+            count (int): 最大件数（新しいものから数える）
+            username (str): 指定した場合、そのユーザーのコメントだけ
+            since (float): 指定した場合、その時刻（エポック秒）以降のコメントだけ
+
+        Returns:
+            list: コメントのリスト（古い順）
+        """
+        if count <= 0:
+            return []
+        if username is not None:
+            comments = self.by_user(username)
+            if since is not None:
+                comments = [comment for comment in comments if comment["time"] >= since]
+        elif since is not None:
+            comments = self.since(since)
+        else:
+            return self.last(count)
+        return comments[-count:]
+
+    def since(self, timestamp):
+        """
+        指定した時刻以降のコメントを返す
+
+        Parameters:
+            timestamp (float): 時刻（エポック秒）
+
+        Returns:
+            list: コメントのリスト（古い順）
+        """
+        with self.lock:
+            # 時刻は追加した順に並んでいるため、二分探索で始まりを探す
+            low, high = self._first_valid(), self.count
+            while low < high:
+                middle = (low + high) // 2
+                if self.times[middle % self.capacity] < timestamp:
+                    low = middle + 1
+                else:
+                    high = middle
+            return [self._read(seq) for seq in range(low, self.count)]
+
+    def unique_users(self):
+        """辞書に保持しているユーザー名の数を返す（保持できるコメントの件数を超えない）"""
+        with self.lock:
+            return len(self.user_ids)
+
+    def memory_bytes(self):
+        """保持している領域のおおよその大きさ（バイト）を返す（ユーザー名の文字列を除く）"""
+        arrays = (self.times, self.users, self.levels, self.types, self.offsets, self.lengths, self.user_refs)
+        return sum(item.itemsize * len(item) for item in arrays) + len(self.text)
+
+    def _first_valid(self):
+        """まだ上書きされていない最も古いコメントの通し番号"""
+        first = max(0, self.count - self.capacity)
+        # 本文が上書きされたコメントは取り出さない
+        while first < self.count and self.offsets[first % self.capacity] < self.written_bytes - self.text_bytes:
+            first += 1
+        return first
+
+    def _read(self, seq):
+        """通し番号のコメントを取り出す"""
+        slot = seq % self.capacity
+        level = self.levels[slot]
+        return _comment(self.times[slot], self.user_names[self.users[slot]], None if level == _NO_LEVEL else level,
+                        self._read_text(self.offsets[slot], self.lengths[slot]), _TYPES[self.types[slot]])
+
+    def _write_text(self, encoded):
+        """本文をリングバッファに書き込む（終わりに達したら先頭に続ける）"""
+        start = self.written_bytes % self.text_bytes
+        head = min(len(encoded), self.text_bytes - start)
+        self.text[start:start + head] = encoded[:head]
+        if head < len(encoded):
+            self.text[:len(encoded) - head] = encoded[head:]
+        self.written_bytes += len(encoded)
+
+    def _read_text(self, offset, length):
+        """リングバッファから本文を読み出す"""
+        start = offset % self.text_bytes
+        head = min(length, self.text_bytes - start)
+        data = bytes(self.text[start:start + head])
+        if head < length:
+            data += bytes(self.text[:length - head])
+        return data.decode("utf-8", errors="replace")
+
+    def _intern_user(self, username):
+        """ユーザー名をIDにする（保持しているコメントの数を1増やす）"""
+        user_id = self.user_ids.get(username)
+        if user_id is None:
+            if self.free_ids:
+                user_id = self.free_ids.pop()
+                self.user_names[user_id] = username
+            else:
+                user_id = len(self.user_names)
+                self.user_names.append(username)
+                self.user_refs.append(0)
+            self.user_ids[username] = user_id
+        self.user_refs[user_id] += 1
+        return user_id
+
+    def _release_user(self, user_id):
+        """上書きするコメントのユーザーの数を1減らす（0になったらユーザー名を解放する）"""
+        self.user_refs[user_id] -= 1
+        if self.user_refs[user_id] == 0:
+            del self.user_ids[self.user_names[user_id]]
+            self.user_names[user_id] = None
+            self.free_ids.append(user_id)
+
+
+class CommentStore:
+    """
+    ストリームごとの直近のコメント
+
+    Parameters:
+        capacity (int): ストリームごとに保持するコメントの最大件数
+        text_bytes (int): ストリームごとに本文を保持する領域の大きさ（バイト）
+    """
+
+    def __init__(self, capacity=10000, text_bytes=1024 * 1024):
+        self.capacity = capacity
+        self.text_bytes = text_bytes
+        self.lock = threading.Lock()
+        self.streams = {}
+
+    def stream(self, platform_name, stream_id):
+        """
+        ストリームの直近のコメントを返す（ない場合は作成する）
+
+        Parameters:
+            platform_name (str): プラットフォーム名（Platform.name）
+            stream_id (str): ストリームID
+
+        Returns:
+            RecentComments: ストリームの直近のコメント
+        """
+        key = f"{platform_name}:{stream_id}"
+        with self.lock:
+            if key not in self.streams:
+                self.streams[key] = RecentComments(self.capacity, self.text_bytes)
+            return self.streams[key]
+
+    def labels(self):
+        """保持しているストリームの一覧（"プラットフォーム名:ストリームID"）を返す"""
+        with self.lock:
+            return list(self.streams)
+
+    def get(self, label):
+        """
+        保持しているストリームの直近のコメントを返す
+
+        Parameters:
+            label (str): "プラットフォーム名:ストリームID"
+
+        Returns:
+            RecentComments: ストリームの直近のコメント（ない場合はNone）
+        """
+        with self.lock:
+            return self.streams.get(label)
+
+
+def query_recent(store, query):
+    """
+    /recent のクエリに合う直近のコメントを返す
+
+    Parameters:
+        store (CommentStore): ストリームごとの直近のコメント
+        query (dict): HTTPリクエストのクエリ（parse_qsの結果。stream、n、user、since）
+
+    Returns:
+        dict: {"stream": ストリーム, "comments": コメントのリスト（古い順）}
+
+    Raises:
+        ValueError: クエリの値が正しくない場合や、複数のストリームがあるのにstreamを指定していない場合
+        KeyError: 指定したストリームがない場合
+    """
+    labels = store.labels()
+    if "stream" in query:
+        label = query["stream"][0]
+    elif len(labels) == 1:
+        label = labels[0]
+    else:
+        raise ValueError(f"streamを指定してください（{', '.join(labels)}）")
+    recent = store.get(label)
+    if recent is None:
+        raise KeyError(label)
+    count = int(query["n"][0]) if "n" in query else 100
+    since = float(query["since"][0]) if "since" in query else None
+    username = query["user"][0] if "user" in query else None
+    return {"stream": label, "comments": recent.query(count, username, since)}
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+配信の終了の判定
+
+配信が終了するまで抽出を続けるモード（--until-end）で使います。次のどちらかで終了と判定します。
+
+- ページに配信の終了を知らせる文言（platform.offline_texts）が表示された
+  （コメント欄の中の文言は、視聴者の投稿と区別できないため対象にしない）
+- コメント領域が一定の時間（grace秒）見つからない
+"""
+
+import time
+
+# コメント領域とscriptなどを除いた、ページに表示されている文言から終了の文言を探すJavaScript
+_OFFLINE_JS = """
+var texts = arguments[0];
+var container = document.querySelector(arguments[1]);
+if (!document.body || !texts.length) return null;
+var skipTags = {SCRIPT: true, STYLE: true, NOSCRIPT: true, TEMPLATE: true};
+var walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT, {
+    acceptNode: function(node) {
+        var parent = node.parentNode;
+        if (!parent || skipTags[parent.nodeName]) return NodeFilter.FILTER_REJECT;
+        if (container && container.contains(node)) return NodeFilter.FILTER_REJECT;
+        return NodeFilter.FILTER_ACCEPT;
+    }
+});
+var node;
+while ((node = walker.nextNode())) {
+    var value = node.nodeValue;
+    for (var i = 0; i < texts.length; i++) {
+        if (value.indexOf(texts[i]) !== -1) return texts[i];
+    }
+}
+return null;
+"""
+
+
+class StreamEndDetector:
+    """
+    配信が終了したかを判定する
+
+    使い方: 取得のたびにcheck()を呼び出し、Trueが返ったら抽出を終える
+
+    Parameters:
+        platform (Platform): 対象プラットフォームの設定
+        check_every (float): 終了の文言を探す間隔（秒）
+        grace (float): コメント領域が見つからない状態がこの秒数続いたら終了と判定する
+    """
+
+    def __init__(self, platform, check_every=30, grace=180):
+        self.platform = platform
+        self.check_every = check_every
+        self.grace = grace
+        self.next_check = time.monotonic() + check_every
+        self.missing_since = None
+
+    def check(self, driver, rows):
+        """
+        配信が終了したかを判定する
+
+        Parameters:
+            driver: Selenium WebDriver
+            rows (list): 今回の取得結果（コメント領域が見つからなかった場合はNone）
+
+        Returns:
+            bool: 配信が終了したと判定した場合はTrue
+        """
+        now = time.monotonic()
+        if rows is None:
+            if self.missing_since is None:
+                self.missing_since = now
+            elif now - self.missing_since >= self.grace:
+                print(f"コメント領域が{self.grace:.0f}秒間見つからないため、配信が終了したと判断します")
+                return True
+        else:
+            self.missing_since = None
+
+        if now < self.next_check:
+            return False
+        self.next_check = now + self.check_every
+        try:
+            text = driver.execute_script(_OFFLINE_JS, self.platform.offline_texts, self.platform.container_selector)
+        except Exception as e:
+            print(f"配信の終了を確認できませんでした: {str(e)}")
+            return False
+        if text:
+            print(f"ページに「{text}」と表示されたため、配信が終了したと判断します")
+            return True
+        return False
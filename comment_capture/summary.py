@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+抽出結果の概要の集計
+
+抽出中にコメントを1件ずつ集計しておき、終了時に出力ファイルを読み直さずに概要を表示します。
+抽出中でも snapshot() で途中の集計を取り出せます。
+
+ユニークユーザー数と上位ユーザーは、既定では全ユーザーを記憶して正確に数えます。
+approximate=True の場合は HyperLogLog と Space-Saving で概算し、
+ユーザー数がどれだけ増えてもメモリ使用量は一定です。
+"""
+
+import hashlib
+import math
+import threading
+from collections import Counter, deque
+
+
+def _hash64(value):
+    """文字列から64ビットのハッシュ値を作成する"""
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """
+    HyperLogLogによる異なり数の概算（標準誤差はおよそ 1.04 / sqrt(2 ** precision)）
+
+    Parameters:
+        precision (int): レジスタ数の指数（14の場合は16384個、誤差はおよそ0.8%）
+    """
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    def add(self, value):
+        """値を追加する"""
+        hashed = _hash64(value)
+        index = hashed >> (64 - self.precision)
+        rest = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        """異なり数の概算値を返す"""
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # 少ない場合は空のレジスタの数から求める（Linear Counting）
+            return round(self.size * math.log(self.size / zeros))
+        return round(estimate)
+
+
+class SpaceSaving:
+    """
+    Space-Savingアルゴリズムによる上位の要素の概算（記憶する要素数は一定）
+
+    capacity件より多い要素があると、最も少ない要素を置き換えます。
+    上位の要素の件数は実際より多めになることがありますが、capacityが上位件数より
+    十分大きければ順位はほぼ正確です。
+    要素は件数ごとのまとまり（Stream-Summary）に分けて持ち、最も少ない件数を覚えておくため、
+    置き換えも含めて1件あたりの処理は要素数によらず一定です。
+
+    Parameters:
+        capacity (int): 記憶する要素の最大数
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = {}
+        # 件数ごとの要素（dictを追加した順の集合として使う）
+        self.buckets = {}
+        self.min_count = 0
+
+    def add(self, item):
+        """要素を1件数える"""
+        count = self.counts.get(item)
+        if count is None:
+            if len(self.counts) < self.capacity:
+                count = 0
+                self.min_count = 1
+            else:
+                # 最も少ない件数の要素のうち、最も前からその件数のものを置き換える
+                count = self.min_count
+                smallest = next(iter(self.buckets[count]))
+                del self.counts[smallest]
+                self._remove(smallest, count)
+        else:
+            self._remove(item, count)
+        self.counts[item] = count + 1
+        self.buckets.setdefault(count + 1, {})[item] = None
+
+    def _remove(self, item, count):
+        """件数countのまとまりから要素を外す（空になったまとまりは消し、最も少ない件数を更新する）"""
+        bucket = self.buckets[count]
+        del bucket[item]
+        if not bucket:
+            del self.buckets[count]
+            if self.min_count == count:
+                # 外した要素はcount + 1に入れ直すため、最も少ない件数は1つ増える
+                self.min_count = count + 1
+
+    def most_common(self, count):
+        """件数の多い順に (要素, 件数) のリストを返す"""
+        return Counter(self.counts).most_common(count)
+
+
+class CommentSummary:
+    """
+    抽出したコメントの概要を逐次集計する
+
+    Parameters:
+        platform (Platform): 対象プラットフォームの設定
+        approximate (bool): ユニークユーザー数と上位ユーザーを固定メモリで概算するかどうか
+        sample_size (int): 表示する最初・最新のコメントの件数
+    """
+
+    def __init__(self, platform, approximate=False, sample_size=5):
+        self.platform = platform
+        self.approximate = approximate
+        self.total = 0
+        self.type_counts = Counter()
+        self.first_time = None
+        self.last_time = None
+        self.first_comments = []
+        self.last_comments = deque(maxlen=sample_size)
+        self.sample_size = sample_size
+        if approximate:
+            self.unique_users = HyperLogLog()
+            self.user_counts = SpaceSaving()
+        else:
+            self.unique_users = set()
+            self.user_counts = Counter()
+        self.lock = threading.Lock()
+
+    def add(self, row):
+        """
+        コメント1件を集計する
+
+        Parameters:
+            row (list): [タイムスタンプ, 値...]（値はplatform.fieldsの順）
+        """
+        values = dict(zip(self.platform.fields, row[1:]))
+        comment_type = values.get("type", "user")
+        with self.lock:
+            self.total += 1
+            self.type_counts[comment_type] += 1
+            if self.first_time is None:
+                self.first_time = row[0]
+            self.last_time = row[0]
+            if len(self.first_comments) < self.sample_size:
+                self.first_comments.append(row)
+            self.last_comments.append(row)
+            # 運営メッセージはユーザーの集計に含めない
+            if comment_type == "user":
+                username = values.get("username")
+                self.unique_users.add(username)
+                if self.approximate:
+                    self.user_counts.add(username)
+                else:
+                    self.user_counts[username] += 1
+
+    def snapshot(self, top=5):
+        """
+        現在の集計を返す（抽出中に別のスレッドから呼び出せる）
+
+        Parameters:
+            top (int): 上位ユーザーの件数
+
+        Returns:
+            dict: 合計、種類ごとの件数、ユニークユーザー数、上位ユーザー、最初と最後の時間
+        """
+        with self.lock:
+            return {
+                "total": self.total,
+                "type_counts": dict(self.type_counts),
+                "unique_users": self.unique_users.count() if self.approximate else len(self.unique_users),
+                "top_users": self.user_counts.most_common(top),
+                "first_time": self.first_time,
+                "last_time": self.last_time,
+                "first_comments": list(self.first_comments),
+                "last_comments": list(self.last_comments),
+            }
+
+    def print_report(self):
+        """抽出結果の概要を表示する"""
+        snapshot = self.snapshot()
+        if snapshot["total"] == 0:
+            return
+        approx = "（概算）" if self.approximate else ""
+        print("\n=== 抽出結果の概要 ===")
+        print(f"合計コメント数: {snapshot['total']}")
+        if "type" in self.platform.fields:
+            print(f"ユーザーコメント数: {snapshot['type_counts'].get('user', 0)}")
+            print(f"運営メッセージ数: {snapshot['type_counts'].get('system', 0)}")
+        if snapshot["top_users"]:
+            print(f"ユニークユーザー数{approx}: {snapshot['unique_users']}")
+            # トップユーザーの表示
+            print(f"\n最もコメントの多いユーザー（上位5名）{approx}:")
+            for user, count in snapshot["top_users"]:
+                print(f"{user}: {count}件")
+        print(f"\n最初のコメント時間: {snapshot['first_time']}")
+        print(f"最後のコメント時間: {snapshot['last_time']}")
+        print(f"\n最初の{len(snapshot['first_comments'])}件のコメント:")
+        for row in snapshot["first_comments"]:
+            print(self.platform.format_comment(row[0], row[1:]))
+        print(f"\n最新の{len(snapshot['last_comments'])}件のコメント:")
+        for row in snapshot["last_comments"]:
+            print(self.platform.format_comment(row[0], row[1:]))
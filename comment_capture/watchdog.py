@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+ブラウザのメモリ監視とタブの作り直し
+
+長時間の抽出では、Chromeのタブのメモリ使用量が増え続けることがあります。
+MemoryWatchdogは一定の間隔でCDPの Performance.getMetrics（JavaScriptのヒープ、DOMノード数）と、
+psutilがある場合はChromeのプロセスのRSSを調べ、上限を超えたらタブを作り直します。
+
+- "tab": 新しいタブでページを開き、コメント領域が表示されてから古いタブを閉じる（レンダラーのメモリが解放される）
+- "reload": 同じタブでページを再読み込みする
+
+重複判定の状態（CommentDeduplicator）はそのまま引き継ぎ、作り直した後に表示される
+過去のコメントは取得済みのコメント列と照合して取り除くため、コメントが重複したり失われたりしません。
+"""
+
+import time
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+RECYCLE_MODES = ("tab", "reload")
+
+_MB = 1024 * 1024
+
+
+def _import_psutil():
+    """psutilを読み込む（ない場合はNone。RSSは調べずにヒープだけを監視する）"""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil
+
+
+class MemoryWatchdog:
+    """
+    ブラウザのメモリ使用量を監視し、上限を超えたらタブを作り直す
+
+    使い方: 取得のたびにcheck()を呼び出す（実際に調べるのはinterval秒ごと）
+
+    Parameters:
+        url (str): 作り直したタブで開くライブストリームURL
+        platform (Platform): 対象プラットフォームの設定
+        deduplicator (CommentDeduplicator): 作り直した後の重複を取り除く重複判定
+        max_heap_mb (float): JavaScriptのヒープ使用量の上限（MB、0の場合は調べない）
+        max_rss_mb (float): Chromeの全プロセスのRSSの合計の上限（MB、0の場合は調べない）
+        interval (float): メモリ使用量を調べる間隔（秒）
+        mode (str): 作り直し方（"tab" または "reload"）
+        prepare_tab (callable): 新しいタブでページを開く前に呼び出す関数（引数はWebDriver）
+        after_load (callable): ページを開いた後に呼び出す関数（ダイアログを閉じるなど。引数はWebDriver）
+    """
+
+    def __init__(self, url, platform, deduplicator, max_heap_mb=1024, max_rss_mb=4096, interval=60,
+                 mode="tab", prepare_tab=None, after_load=None):
+        if mode not in RECYCLE_MODES:
+            raise ValueError(f"modeは{RECYCLE_MODES}のいずれかを指定してください: {mode}")
+        self.url = url
+        self.platform = platform
+        self.deduplicator = deduplicator
+        self.max_heap_mb = max_heap_mb
+        self.max_rss_mb = max_rss_mb
+        self.interval = interval
+        self.mode = mode
+        self.prepare_tab = prepare_tab
+        self.after_load = after_load
+        self.psutil = _import_psutil() if max_rss_mb else None
+        if max_rss_mb and self.psutil is None:
+            print("psutilがないため、ブラウザのRSSは調べずにJavaScriptのヒープだけを監視します")
+        self.next_check = time.monotonic() + interval
+        self.enabled_handles = set()
+        self.recycles = 0
+        self.last = {}
+
+    def sample(self, driver):
+        """
+        現在のタブとブラウザのメモリ使用量を調べる
+
+        Parameters:
+            driver: Selenium WebDriver
+
+        Returns:
+            dict: heap_mb（ヒープ使用量）、heap_total_mb、nodes（DOMノード数）、
+                rss_mb（全プロセスの合計）、renderer_rss_mb（最も大きいレンダラー）。調べられない値はNone
+        """
+        handle = driver.current_window_handle
+        if handle not in self.enabled_handles:
+            driver.execute_cdp_cmd("Performance.enable", {})
+            self.enabled_handles.add(handle)
+        metrics = {item["name"]: item["value"]
+                   for item in driver.execute_cdp_cmd("Performance.getMetrics", {}).get("metrics", [])}
+        result = {
+            "heap_mb": metrics.get("JSHeapUsedSize", 0) / _MB,
+            "heap_total_mb": metrics.get("JSHeapTotalSize", 0) / _MB,
+            "nodes": int(metrics.get("Nodes", 0)),
+            "rss_mb": None,
+            "renderer_rss_mb": None,
+        }
+        if self.psutil is not None:
+            result.update(self._process_rss(driver))
+        self.last = result
+        return result
+
+    def _process_rss(self, driver):
+        """ChromeDriverから起動したChromeの全プロセスのRSSの合計と、最も大きいレンダラーのRSSを調べる"""
+        total = 0
+        renderer = 0
+        try:
+            root = self.psutil.Process(driver.service.process.pid)
+            processes = root.children(recursive=True)
+        except (self.psutil.NoSuchProcess, self.psutil.AccessDenied, AttributeError):
+            return {}
+        for process in processes:
+            try:
+                rss = process.memory_info().rss
+                total += rss
+                if "--type=renderer" in process.cmdline():
+                    renderer = max(renderer, rss)
+            except (self.psutil.NoSuchProcess, self.psutil.AccessDenied):
+                continue
+        return {"rss_mb": total / _MB, "renderer_rss_mb": renderer / _MB}
+
+    def check(self, driver):
+        """
+        interval秒が経過していればメモリ使用量を調べ、上限を超えていればタブを作り直す
+
+        Parameters:
+            driver: Selenium WebDriver
+
+        Returns:
+            bool: タブを作り直した場合はTrue（監視モードのMutationObserverは次の取り出しで設置し直される）
+        """
+        now = time.monotonic()
+        if not (self.max_heap_mb or self.max_rss_mb) or now < self.next_check:
+            return False
+        self.next_check = now + self.interval
+
+        try:
+            usage = self.sample(driver)
+        except Exception as e:
+            print(f"メモリ使用量を調べられませんでした: {str(e)}")
+            return False
+
+        reasons = []
+        if self.max_heap_mb and usage["heap_mb"] > self.max_heap_mb:
+            reasons.append(f"ヒープ {usage['heap_mb']:.0f}MB > {self.max_heap_mb:.0f}MB")
+        if self.max_rss_mb and usage["rss_mb"] is not None and usage["rss_mb"] > self.max_rss_mb:
+            reasons.append(f"RSS {usage['rss_mb']:.0f}MB > {self.max_rss_mb:.0f}MB")
+        if not reasons:
+            return False
+
+        print(f"ブラウザのメモリ使用量が上限を超えたため、タブを作り直します（{'、'.join(reasons)}）")
+        self.recycle(driver)
+        return True
+
+    def recycle(self, driver):
+        """
+        タブを作り直す（重複判定の状態は引き継ぐ）
+
+        Parameters:
+            driver: Selenium WebDriver
+        """
+        if self.mode == "tab":
+            old_handle = driver.current_window_handle
+            driver.switch_to.new_window('tab')
+            if self.prepare_tab:
+                self.prepare_tab(driver)
+            driver.get(self.url)
+            self._wait_for_comments(driver)
+            # 新しいタブでコメント領域が表示されてから古いタブを閉じる
+            new_handle = driver.current_window_handle
+            driver.switch_to.window(old_handle)
+            driver.close()
+            driver.switch_to.window(new_handle)
+            self.enabled_handles.discard(old_handle)
+        else:
+            driver.refresh()
+            self._wait_for_comments(driver)
+
+        # 作り直した後に表示される過去のコメントは、取得済みのコメント列と照合して取り除く
+        self.deduplicator.mark_gap()
+        self.recycles += 1
+        try:
+            usage = self.sample(driver)
+            print(f"タブを作り直しました（{self.recycles}回目）。ヒープ: {usage['heap_mb']:.0f}MB")
+        except Exception:
+            print(f"タブを作り直しました（{self.recycles}回目）")
+
+    def _wait_for_comments(self, driver):
+        """作り直したタブでコメント領域が表示されるまで待機する"""
+        if self.after_load:
+            self.after_load(driver)
+        try:
+            WebDriverWait(driver, 20).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, self.platform.container_selector))
+            )
+        except Exception:
+            print("作り直したタブでコメント領域を検出できませんでした。取得を続けながら待機します")
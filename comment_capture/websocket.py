@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+WebSocketサーバーの最小限の実装（標準ライブラリのasyncioのみを使用）
+
+ローカルの確認用サーバーで使うため、テキストフレームの送受信とクローズだけに対応しています。
+"""
+
+import base64
+import hashlib
+import struct
+
+# RFC 6455で決められているハンドシェイク用の文字列
+_HANDSHAKE_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+
+async def read_http_request(reader):
+    """
+    HTTPリクエストのリクエスト行とヘッダーを読み込む
+
+    Parameters:
+        reader (StreamReader): クライアントからの入力
+
+    Returns:
+        tuple: (パス, ヘッダーの辞書（キーは小文字）)。読み込めない場合は (None, {})
+    """
+    request_line = await reader.readline()
+    parts = request_line.decode("latin-1").split()
+    if len(parts) < 2:
+        return None, {}
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return parts[1], headers
+
+
+def is_websocket_request(headers):
+    """WebSocketへのアップグレード要求かどうかを返す"""
+    return headers.get("upgrade", "").lower() == "websocket" and "sec-websocket-key" in headers
+
+
+async def accept_websocket(writer, headers):
+    """
+    WebSocketのハンドシェイクに応答する
+
+    Parameters:
+        writer (StreamWriter): クライアントへの出力
+        headers (dict): read_http_requestで読み込んだヘッダー
+    """
+    digest = hashlib.sha1((headers["sec-websocket-key"] + _HANDSHAKE_GUID).encode("ascii")).digest()
+    writer.write((
+        "HTTP/1.1 101 Switching Protocols\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Accept: {base64.b64encode(digest).decode('ascii')}\r\n"
+        "\r\n"
+    ).encode("ascii"))
+    await writer.drain()
+
+
+def encode_frame(payload, opcode=OPCODE_TEXT):
+    """
+    サーバーから送るフレームを作成する（サーバーからのフレームはマスクしない）
+
+    Parameters:
+        payload (str or bytes): 送信する内容
+        opcode (int): フレームの種類
+
+    Returns:
+        bytes: フレーム
+    """
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def read_frame(reader):
+    """
+    クライアントから送られたフレームを1つ読み込む
+
+    Parameters:
+        reader (StreamReader): クライアントからの入力
+
+    Returns:
+        tuple: (opcode, 内容のbytes)
+    """
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if second & 0x80 else b""
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    return opcode, payload
+
+
+async def send_http_response(writer, body, content_type="text/html; charset=utf-8", status="200 OK"):
+    """
+    通常のHTTPレスポンスを返して接続を閉じる
+
+    Parameters:
+        writer (StreamWriter): クライアントへの出力
+        body (str or bytes): レスポンスの本文
+        content_type (str): Content-Type
+        status (str): ステータス行
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    writer.write((
+        f"HTTP/1.1 {status}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Cache-Control: no-store\r\n"
+        "Connection: close\r\n"
+        "\r\n"
+    ).encode("ascii") + body)
+    await writer.drain()
+    writer.close()
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+グループコミット方式の書き込みスレッド
+
+取得ループはコメントを上限付きのキューに入れるだけにして、ファイルへの書き込みは専用のスレッドで
+まとめて行います。まとめた件数（max_batch）か、最初のコメントを受け取ってからの経過時間
+（max_delay_ms）のどちらかに達した時点で書き込んでフラッシュするため、
+書き込まれていないコメントは最大でもおよそmax_delay_msミリ秒分になります。
+fsyncを有効にすると、フラッシュのたびにディスクへの書き込みまで待ちます。
+新しいコメントがない間もmax_delay_msごとに出力先をフラッシュするため、時間で決まる書き込み
+（Parquetの行グループやファイルの切り替え）はコメントが来なくても行われます。
+
+キューが一杯になった場合の動作は policy で選びます。
+
+- "block": 書き込みが追いつくまで取得側を待たせる（コメントは失わない）
+- "drop": 新しいコメントを捨てて数える（取得は止めない）
+"""
+
+import queue
+import threading
+import time
+
+POLICIES = ("block", "drop")
+
+# キューの終わりを表す値
+_STOP = object()
+
+# コメントがない間に出力先をフラッシュする最短の間隔（秒。max_delay_msが0の場合に空回りしないようにする）
+_MIN_IDLE_FLUSH = 0.05
+
+
+class GroupCommitWriter:
+    """
+    コメントの行をまとめて出力先に書き込むスレッド
+
+    with文で使うと、開始と終了（残りのコメントの書き込み）を自動で行います。
+
+    Parameters:
+        sink: 出力先（write_rows / flush / close を持つオブジェクト。comment_capture.sinksを参照）
+        max_batch (int): 1回にまとめて書き込む最大件数
+        max_delay_ms (float): コメントを受け取ってから書き込むまでの最大の待ち時間（ミリ秒）
+        queue_size (int): キューに入れておける最大件数
+        policy (str): キューが一杯の場合の動作（"block" または "drop"）
+        fsync (bool): フラッシュのたびにディスクへの書き込みまで待つかどうか
+    """
+
+    def __init__(self, sink, max_batch=500, max_delay_ms=200, queue_size=10000, policy="block", fsync=False):
+        if policy not in POLICIES:
+            raise ValueError(f"policyは{POLICIES}のいずれかを指定してください: {policy}")
+        self.sink = sink
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.policy = policy
+        self.fsync = fsync
+        self.queue = queue.Queue(queue_size)
+        self.thread = threading.Thread(target=self._run, name="comment-writer", daemon=True)
+        self.error = None
+
+        # 統計
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.max_queue_depth = 0
+        self.total_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        """書き込みスレッドを開始する"""
+        self.thread.start()
+
+    def put(self, row):
+        """
+        コメントの行を書き込み待ちのキューに入れる
+
+        Parameters:
+            row (list): [タイムスタンプ, 値...]
+
+        Returns:
+            bool: キューに入れた場合はTrue、policyが"drop"でキューが一杯のため捨てた場合はFalse
+        """
+        if self.policy == "drop":
+            try:
+                self.queue.put_nowait(row)
+            except queue.Full:
+                self.dropped += 1
+                return False
+        else:
+            self.queue.put(row)
+        self.enqueued += 1
+        depth = self.queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return True
+
+    def close(self):
+        """キューに残ったコメントを全て書き込んでから出力先を閉じる"""
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+        self.sink.close()
+
+    def stats(self):
+        """
+        書き込みの統計を返す
+
+        Returns:
+            dict: キューの長さ、書き込み件数、破棄件数、フラッシュ回数と所要時間（ミリ秒）
+        """
+        return {
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "avg_flush_ms": self.total_flush_seconds / self.flushes * 1000 if self.flushes else 0.0,
+            "max_flush_ms": self.max_flush_seconds * 1000,
+        }
+
+    def summary(self):
+        """統計を表示用の1行の文字列にする"""
+        stats = self.stats()
+        return (f"書き込み: {stats['written']}件 / フラッシュ: {stats['flushes']}回"
+                f"（平均{stats['avg_flush_ms']:.1f}ms、最大{stats['max_flush_ms']:.1f}ms）"
+                f" / 最大キュー長: {stats['max_queue_depth']} / 破棄: {stats['dropped']}件")
+
+    def _run(self):
+        """キューからコメントを取り出してまとめて書き込む"""
+        stopping = False
+        while not stopping:
+            try:
+                item = self.queue.get(timeout=max(self.max_delay, _MIN_IDLE_FLUSH))
+            except queue.Empty:
+                # コメントがなくても、時間で決まる書き込みやファイルの切り替えを行えるようにする
+                self._idle_flush()
+                continue
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            # 件数か待ち時間の上限に達するまで同じ回の書き込みにまとめる
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _idle_flush(self):
+        """新しいコメントがない間に出力先をフラッシュする"""
+        try:
+            self.sink.flush(self.fsync)
+        except Exception as e:
+            if self.error is None:
+                self.error = e
+                print(f"コメントの書き込みに失敗しました: {str(e)}")
+
+    def _commit(self, batch):
+        """まとめたコメントを書き込んでフラッシュする"""
+        started = time.perf_counter()
+        try:
+            self.sink.write_rows(batch)
+            self.sink.flush(self.fsync)
+        except Exception as e:
+            # 書き込みに失敗しても取得は止めない（最初のエラーを記録して表示する）
+            if self.error is None:
+                self.error = e
+                print(f"コメントの書き込みに失敗しました: {str(e)}")
+            return
+        elapsed = time.perf_counter() - started
+        self.written += len(batch)
+        self.flushes += 1
+        self.total_flush_seconds += elapsed
+        if elapsed > self.max_flush_seconds:
+            self.max_flush_seconds = elapsed
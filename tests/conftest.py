@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""テストから共通モジュール（リポジトリ直下のcomment_capture）を読み込めるようにする"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""CommentDeduplicatorのテスト"""
+
+from comment_capture.dedup import CommentDeduplicator
+
+
+def test_same_comment_twice_is_kept():
+    # 印を付けた要素は2回返されないため、同じ内容の連投は別のコメントとして残す
+    deduplicator = CommentDeduplicator()
+    assert deduplicator.filter([[None, "a", "こんにちは"], [None, "a", "こんにちは"]]) == [
+        ["a", "こんにちは"], ["a", "こんにちは"]]
+    assert deduplicator.duplicates == 0
+
+
+def test_native_key_is_dropped_once_seen():
+    deduplicator = CommentDeduplicator()
+    assert deduplicator.filter([["id:1", "a", "x"]]) == [["a", "x"]]
+    assert deduplicator.filter([["id:1", "a", "x"], ["id:2", "b", "y"]]) == [["b", "y"]]
+    assert deduplicator.duplicates == 1
+
+
+def test_key_capacity_forgets_oldest():
+    deduplicator = CommentDeduplicator(key_capacity=2)
+    deduplicator.filter([["id:1", "a", "x"], ["id:2", "b", "y"], ["id:3", "c", "z"]])
+    assert len(deduplicator.recent_keys) == 2
+    # 最も古いキーは忘れているため、再び返されると新しいコメントとして扱う
+    assert deduplicator.filter([["id:1", "a", "x"]]) == [["a", "x"]]
+
+
+def test_gap_drops_overlapping_prefix():
+    deduplicator = CommentDeduplicator()
+    deduplicator.filter([[None, "a", "1"], [None, "b", "2"], [None, "c", "3"]])
+    # 再描画で印が消え、直近のコメント列の末尾が先頭に再び返された場合
+    deduplicator.mark_gap()
+    assert deduplicator.filter([[None, "b", "2"], [None, "c", "3"], [None, "d", "4"]]) == [["d", "4"]]
+    assert deduplicator.duplicates == 2
+
+
+def test_gap_marker_inside_rows_aligns_following_segment():
+    deduplicator = CommentDeduplicator()
+    rows = [[None, "a", "1"], [None, "b", "2"], None, [None, "a", "1"], [None, "b", "2"], [None, "c", "3"]]
+    assert deduplicator.filter(rows) == [["a", "1"], ["b", "2"], ["c", "3"]]
+
+
+def test_no_overlap_after_gap_keeps_everything():
+    deduplicator = CommentDeduplicator()
+    deduplicator.filter([[None, "a", "1"], [None, "b", "2"]])
+    deduplicator.mark_gap()
+    # 直近のコメント列の末尾と先頭が一致しない場合は取り除かない
+    assert deduplicator.filter([[None, "a", "1"], [None, "c", "3"]]) == [["a", "1"], ["c", "3"]]
+
+
+def test_window_size_bounds_memory():
+    deduplicator = CommentDeduplicator(window_size=3)
+    deduplicator.filter([[None, "u", str(number)] for number in range(10)])
+    assert len(deduplicator.recent_rows) == 3
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""新しいコメントの配信（comment_capture.fanout）のテスト"""
+
+import asyncio
+import json
+import socket
+import time
+import urllib.request
+from urllib.parse import parse_qs
+
+import pytest
+
+from comment_capture.fanout import FanoutServer, _Subscriber
+from comment_capture.platforms import POCOCHA
+from comment_capture.store import RecentComments
+
+
+def comment(username="a", text="こんばんは", level=None, comment_type="user"):
+    return {"username": username, "comment": text, "level": level, "type": comment_type}
+
+
+def subscriber(query, buffer_size=10):
+    return _Subscriber(parse_qs(query), buffer_size)
+
+
+def test_no_filter_matches_everything():
+    assert subscriber("").matches(comment())
+
+
+def test_user_filter():
+    filtered = subscriber("user=a,b&user=c")
+    assert filtered.users == {"a", "b", "c"}
+    assert filtered.matches(comment("b"))
+    assert not filtered.matches(comment("d"))
+
+
+def test_type_and_contains_filters():
+    filtered = subscriber("type=user&contains=ばん")
+    assert filtered.matches(comment())
+    assert not filtered.matches(comment(comment_type="system"))
+    assert not filtered.matches(comment(text="はじめまして"))
+
+
+def test_min_level_keeps_comments_without_level():
+    filtered = subscriber("min_level=10")
+    assert filtered.matches(comment(level=10))
+    assert not filtered.matches(comment(level=9))
+    # レベルのないプラットフォームのコメントは絞り込まない
+    assert filtered.matches(comment(level=None))
+
+
+def test_invalid_min_level_is_rejected():
+    with pytest.raises(ValueError):
+        subscriber("min_level=high")
+
+
+def test_slow_subscriber_drops_oldest():
+    filtered = subscriber("", buffer_size=2)
+    for index in range(5):
+        filtered.push(f"m{index}")
+    messages = asyncio.run(filtered.next_messages())
+    assert messages == [json.dumps({"dropped": 3}), "m3", "m4"]
+    assert filtered.dropped == 0
+
+
+def test_start_raises_when_port_is_busy():
+    with socket.socket() as busy:
+        busy.bind(("127.0.0.1", 0))
+        busy.listen()
+        server = FanoutServer(busy.getsockname()[1])
+        # 待ち受けに失敗した場合は、起動を待ち続けずに例外を返す
+        with pytest.raises(OSError):
+            server.start()
+        server.close()
+
+
+def test_events_replay_and_publish():
+    recent = RecentComments()
+    recent.add_row(POCOCHA, ["2024-01-01 12:00:00", "low", "Lv.3", "こんにちは", "user"], at=100)
+    recent.add_row(POCOCHA, ["2024-01-01 12:00:01", "high", "Lv.12", "こんばんは", "user"], at=101)
+    with FanoutServer(0, recent, "pococha:1") as server:
+        url = f"http://127.0.0.1:{server.port}/events?min_level=10"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            # 接続時に、条件に合う直近のコメントを送る
+            line = response.readline().decode("utf-8")
+            assert json.loads(line[len("data: "):]) == dict(recent.last(1)[0], stream="pococha:1")
+            assert response.readline() == b"\n"
+
+            # 購読者が登録されるのを待ってから新しいコメントを配信する
+            for _ in range(100):
+                if server.subscribers:
+                    break
+                time.sleep(0.01)
+            server.publish(recent.add_row(POCOCHA, ["2024-01-01 12:00:02", "low", "Lv.1", "x", "user"], at=102))
+            server.publish(recent.add_row(POCOCHA, ["2024-01-01 12:00:03", "high", "Lv.12", "y", "user"], at=103))
+            line = response.readline().decode("utf-8")
+            assert json.loads(line[len("data: "):])["comment"] == "y"
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""ネットワークからのコメント取得（comment_capture.network）のテスト"""
+
+import base64
+import json
+import random
+
+import pytest
+
+from comment_capture.network import DECODERS, NetworkCapture
+from comment_capture.platforms import BIGO, POCOCHA, WHOWATCH
+from comment_capture.standin import SAMPLE_COMMENTS, SAMPLE_NOTICES, SAMPLE_USERS, build_frame
+
+
+class FakeDriver:
+    """get_log("performance") でCDPのイベントを返すWebDriverの代わり"""
+
+    def __init__(self, *batches):
+        self.batches = list(batches)
+
+    def get_log(self, log_type):
+        assert log_type == "performance"
+        return self.batches.pop(0) if self.batches else []
+
+
+def event(method, **params):
+    """パフォーマンスログのエントリ1件を作成する"""
+    return {"message": json.dumps({"message": {"method": method, "params": params}}, ensure_ascii=False)}
+
+
+def frame(payload, request_id="1", opcode=1):
+    return event("Network.webSocketFrameReceived", requestId=request_id,
+                 response={"opcode": opcode, "payloadData": payload})
+
+
+@pytest.mark.parametrize("platform", [WHOWATCH, BIGO])
+def test_standin_frames_decode_to_rows(platform):
+    for comment_id in range(20):
+        rows = DECODERS[platform.name](build_frame(platform.name, comment_id, random.Random(comment_id)))
+        assert len(rows) == 1
+        key, username, comment_text = rows[0]
+        assert key == str(comment_id)
+        assert username in SAMPLE_USERS
+        assert comment_text in SAMPLE_COMMENTS
+
+
+def test_pococha_frames_decode_users_and_notices():
+    types = set()
+    for comment_id in range(200):
+        (row,) = DECODERS["pococha"](build_frame("pococha", comment_id, random.Random(comment_id)))
+        key, username, level, comment_text, comment_type = row
+        assert key == str(comment_id)
+        types.add(comment_type)
+        if comment_type == "system":
+            assert (username, level) == ("運営", "")
+            assert comment_text in SAMPLE_NOTICES
+        else:
+            assert username in SAMPLE_USERS
+            assert 1 <= int(level) <= 99
+            assert comment_text in SAMPLE_COMMENTS
+    assert types == {"user", "system"}
+
+
+@pytest.mark.parametrize("payload", [
+    "",
+    "2",                                             # socket.ioのping
+    "not json",
+    "{broken",
+    '{"type": "error", "name": "ws", "message": "接続が切れました"}',
+    '{"status": "ok", "viewers": 10}',
+    '[1, 2, 3]',
+])
+@pytest.mark.parametrize("platform_name", ["whowatch", "bigo", "pococha"])
+def test_non_comment_frames_are_skipped(platform_name, payload):
+    assert DECODERS[platform_name](payload) == []
+
+
+def test_nested_and_double_encoded_frames():
+    inner = json.dumps({"comments": [{"id": 1, "user": {"name": "a"}, "message": "x"},
+                                     {"id": 2, "user": {"name": "b"}, "message": "y"}]})
+    assert DECODERS["whowatch"](json.dumps({"payload": inner})) == [["1", "a", "x"], ["2", "b", "y"]]
+
+
+def test_binary_non_utf8_frame_is_skipped():
+    assert DECODERS["whowatch"](b"\xff\xfe\x00") == []
+
+
+def test_poll_reads_frames_from_performance_log():
+    whowatch_frame = build_frame("whowatch", 7, random.Random(1))
+    binary = base64.b64encode(build_frame("whowatch", 8, random.Random(2)).encode("utf-8")).decode("ascii")
+    driver = FakeDriver([
+        event("Network.webSocketCreated", requestId="1", url="wss://example.com/comments"),
+        {"message": "not json"},
+        {"other": "entry"},
+        event("Page.loadEventFired"),
+        frame(whowatch_frame),
+        frame(binary, opcode=2),
+        frame("2"),
+        event("Network.eventSourceMessageReceived", data=json.dumps({"user": {"name": "a"}, "message": "sse"})),
+    ])
+    capture = NetworkCapture(driver, WHOWATCH)
+    rows = capture.poll()
+    assert [row[0] for row in rows] == ["7", "8", None]
+    assert rows[2][1:] == ["a", "sse"]
+    assert capture.frames == 4
+    assert capture.comments == 3
+    # 次の取得では前回から増えたイベントだけを読む
+    assert capture.poll() == []
+
+
+def test_poll_filters_sockets_by_url():
+    driver = FakeDriver([
+        event("Network.webSocketCreated", requestId="1", url="wss://example.com/comments"),
+        event("Network.webSocketCreated", requestId="2", url="wss://example.com/stats"),
+        frame(build_frame("bigo", 1, random.Random(1)), request_id="1"),
+        frame(build_frame("bigo", 2, random.Random(2)), request_id="2"),
+    ])
+    capture = NetworkCapture(driver, BIGO, url_pattern="/comments")
+    assert [row[0] for row in capture.poll()] == ["1"]
+
+
+def test_decoder_errors_are_counted_and_skipped():
+    def broken(payload):
+        raise ValueError("壊れたフレーム")
+
+    driver = FakeDriver([frame("{}"), frame("{}")])
+    capture = NetworkCapture(driver, POCOCHA, decoder=broken)
+    assert capture.poll() == []
+    assert capture.decode_errors == 2
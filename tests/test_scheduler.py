@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""取得間隔の調整（comment_capture.scheduler）のテスト"""
+
+import pytest
+
+from comment_capture import scheduler
+from comment_capture.scheduler import AdaptiveInterval
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonicを手で進められる時計に置き換える"""
+    now = [1000.0]
+    monkeypatch.setattr(scheduler.time, "monotonic", lambda: now[0])
+    return now
+
+
+def tick(interval, clock, rows, visible=None, lost=0):
+    """intervalの秒数だけ時計を進めてから取得結果を渡す"""
+    clock[0] += interval.interval
+    return interval.update(rows, visible, lost)
+
+
+def test_rejects_invalid_range():
+    with pytest.raises(ValueError):
+        AdaptiveInterval(floor=0)
+    with pytest.raises(ValueError):
+        AdaptiveInterval(floor=5, ceiling=1)
+
+
+def test_initial_interval_is_clamped():
+    assert AdaptiveInterval(initial=30, ceiling=10, verbose=False).interval == 10
+    assert AdaptiveInterval(initial=0.1, floor=0.5, verbose=False).interval == 0.5
+
+
+def test_backs_off_when_idle_up_to_ceiling(clock):
+    interval = AdaptiveInterval(initial=1, ceiling=5, verbose=False)
+    assert [tick(interval, clock, []) for _ in range(4)] == [2, 4, 5, 5]
+
+
+def test_follows_comment_rate(clock):
+    interval = AdaptiveInterval(initial=2, verbose=False)
+    # 2秒で4件（2件/秒）、表示中の100件の半分が増えるまで待つ → 25秒だが最長の10秒
+    assert tick(interval, clock, ["c"] * 4, visible=100) == 10
+    # 表示中が20件なら、10件増えるまで → 10件 / 流量
+    interval = AdaptiveInterval(initial=2, verbose=False)
+    assert tick(interval, clock, ["c"] * 4, visible=20) == pytest.approx(5)
+
+
+def test_goes_to_floor_when_page_is_filling(clock):
+    interval = AdaptiveInterval(initial=3, verbose=False)
+    assert tick(interval, clock, ["c"] * 12, visible=20) == 0.5
+    assert interval.overflows == 1
+
+
+def test_gap_is_ignored_on_first_tick(clock):
+    interval = AdaptiveInterval(initial=3, verbose=False)
+    # 最初の取得では前回の位置がないため、Noneがあっても取り逃がしとして扱わない
+    assert tick(interval, clock, [None, "c"], visible=100) > 0.5
+    assert tick(interval, clock, [None, "c"], visible=100) == 0.5
+
+
+def test_loss_goes_to_floor_and_repolls_once(clock):
+    interval = AdaptiveInterval(initial=3, verbose=False, repoll_on_loss=True)
+    tick(interval, clock, ["c"], lost=5)
+    assert interval.lost == 5
+    assert interval.interval == 0.5
+    assert interval.delay() == 0
+    # 取得し直しても取り逃がした場合は、続けては取得し直さない
+    tick(interval, clock, ["c"], lost=1)
+    assert interval.delay() == 0.5
+    assert interval.lost == 6
+
+
+def test_no_repoll_by_default(clock):
+    interval = AdaptiveInterval(initial=3, verbose=False)
+    tick(interval, clock, ["c"], lost=2)
+    assert interval.delay() == 0.5
+
+
+def test_prints_large_changes_only(clock, capsys):
+    interval = AdaptiveInterval(initial=3)
+    tick(interval, clock, [])
+    assert "取得間隔を6.0秒に変更しました（新しいコメントなし）" in capsys.readouterr().out
+    interval.interval = 10
+    tick(interval, clock, [])
+    assert capsys.readouterr().out == ""
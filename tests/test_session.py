@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""ログイン状態の保存（comment_capture.session）のテスト"""
+
+import os
+import shutil
+import socket
+
+import pytest
+
+from comment_capture.session import copy_profile, profile_in_use
+
+
+def test_unlocked_profile_is_free(tmp_path):
+    assert not profile_in_use(str(tmp_path))
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink") or os.name == "nt", reason="SingletonLockはLinux / macOSのみ")
+def test_singleton_lock_of_running_process(tmp_path):
+    os.symlink(f"{socket.gethostname()}-{os.getpid()}", tmp_path / "SingletonLock")
+    assert profile_in_use(str(tmp_path))
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink") or os.name == "nt", reason="SingletonLockはLinux / macOSのみ")
+def test_stale_singleton_lock_is_ignored(tmp_path):
+    # 終了したプロセスのロックは使用中とみなさず、ロックも消さない
+    lock = tmp_path / "SingletonLock"
+    os.symlink(f"{socket.gethostname()}-99999999", lock)
+    assert not profile_in_use(str(tmp_path))
+    assert os.path.islink(lock)
+
+
+def test_readable_lockfile_is_left_in_place(tmp_path):
+    lockfile = tmp_path / "lockfile"
+    lockfile.write_bytes(b"")
+    assert not profile_in_use(str(tmp_path))
+    assert lockfile.exists()
+
+
+def test_copy_profile_skips_locks_and_caches(tmp_path):
+    profile = tmp_path / "profile"
+    (profile / "Default" / "Cache").mkdir(parents=True)
+    (profile / "Default" / "Cookies").write_text("cookies")
+    (profile / "lockfile").write_text("")
+    copy = copy_profile(str(profile))
+    try:
+        assert sorted(os.listdir(copy)) == ["Default"]
+        assert os.listdir(os.path.join(copy, "Default")) == ["Cookies"]
+    finally:
+        shutil.rmtree(copy)
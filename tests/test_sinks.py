@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""出力先（comment_capture.sinks）のテスト"""
+
+import csv
+import os
+import sqlite3
+import time
+
+import pytest
+
+from comment_capture.platforms import POCOCHA, WHOWATCH
+from comment_capture.sinks import ColumnarSink, CsvSink, SqliteSink, create_sink, to_unified
+from comment_capture.writer import GroupCommitWriter
+
+POCOCHA_ROWS = [
+    ["2024-01-01 12:00:00", "さくら", "Lv.12", "こんばんは", "user"],
+    ["2024-01-01 12:00:01", "運営", "", "ライブが始まりました", "system"],
+]
+
+
+def test_to_unified_parses_level_digits():
+    assert to_unified(POCOCHA, "123", POCOCHA_ROWS[0]) == (
+        "2024-01-01 12:00:00", "pococha", "123", "さくら", 12, "こんばんは", "user")
+    assert to_unified(POCOCHA, "123", POCOCHA_ROWS[1])[4] is None
+    # レベルのないプラットフォームはユーザーコメントとして扱う
+    assert to_unified(WHOWATCH, "1", ["2024-01-01 12:00:00", "a", "x"])[4:] == (None, "x", "user")
+
+
+def test_csv_round_trip(tmp_path):
+    path = str(tmp_path / "comments.csv")
+    sink = CsvSink(path, POCOCHA.csv_header)
+    sink.write_rows(POCOCHA_ROWS)
+    sink.flush(fsync=True)
+    sink.close()
+    with open(path, newline="", encoding="utf-8") as file:
+        rows = list(csv.reader(file))
+    assert rows == [POCOCHA.csv_header] + POCOCHA_ROWS
+    assert sink.paths() == [path]
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "arrow"])
+def test_columnar_round_trip(tmp_path, file_format):
+    pa = pytest.importorskip("pyarrow")
+    sink = create_sink(file_format, str(tmp_path / "comments.csv"), POCOCHA, "https://www.pococha.com/app/lives/123")
+    sink.write_rows(POCOCHA_ROWS)
+    sink.flush()
+    sink.close()
+    (path,) = sink.paths()
+    assert path.startswith(str(tmp_path / "comments_"))
+    if file_format == "parquet":
+        table = pa.parquet.read_table(path)
+    else:
+        with pa.OSFile(path, "rb") as source:
+            table = pa.ipc.open_stream(source).read_all()
+    columns = table.to_pydict()
+    assert [str(value) for value in columns["ユーザー名"]] == ["さくら", "運営"]
+    assert columns["レベル"] == [12, None]
+    assert columns["コメントタイプ"] == ["user", "system"]
+
+
+def test_parquet_row_group_is_written_on_time_bound(tmp_path):
+    pytest.importorskip("pyarrow")
+    sink = ColumnarSink(str(tmp_path / "comments"), POCOCHA, "123", "parquet", row_group_seconds=0)
+    sink.write_rows(POCOCHA_ROWS[:1])
+    # 行グループの件数に達していなくても、時間の上限を過ぎていればフラッシュで書き込む
+    sink.flush()
+    assert sink.buffered == 0
+    assert os.path.getsize(sink.paths()[0]) > 0
+    sink.close()
+
+
+def test_columnar_rolls_from_flush_without_new_rows(tmp_path):
+    pytest.importorskip("pyarrow")
+    sink = ColumnarSink(str(tmp_path / "comments"), POCOCHA, "123", "arrow", roll_minutes=0)
+    # Arrowはコメントを受け取った時点で書き込む
+    sink.write_rows(POCOCHA_ROWS[:1])
+    assert sink.writer is not None
+    # コメントが来なくても、切り替えの時間を過ぎていればフラッシュでファイルを閉じる
+    sink.flush()
+    assert sink.writer is None
+    sink.write_rows(POCOCHA_ROWS[1:])
+    sink.flush()
+    sink.close()
+    assert len(sink.paths()) == 2
+
+
+def test_sqlite_round_trip(tmp_path):
+    path = str(tmp_path / "comments.db")
+    sink = SqliteSink(path, POCOCHA, "123")
+    sink.write_rows(POCOCHA_ROWS)
+    # 挿入はフラッシュでまとめて行う
+    assert sqlite3.connect(path).execute("SELECT count(*) FROM comments").fetchone() == (0,)
+    sink.flush()
+
+    # 書き込み中でも別の接続から検索できる
+    reader = sqlite3.connect(path)
+    assert reader.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    assert reader.execute(
+        "SELECT プラットフォーム, ストリーム, ユーザー名, レベル, コメントタイプ FROM comments ORDER BY id").fetchall() == [
+        ("pococha", "123", "さくら", 12, "user"),
+        ("pococha", "123", "運営", None, "system"),
+    ]
+    reader.close()
+    sink.close()
+    assert sink.paths() == [path]
+
+
+def test_create_sink_uses_db_extension(tmp_path):
+    sink = create_sink("sqlite", str(tmp_path / "comments.csv"), WHOWATCH, "https://whowatch.tv/viewer/1")
+    sink.close()
+    assert sink.paths() == [str(tmp_path / "comments.db")]
+
+
+def wait_until(condition, timeout=5):
+    """conditionが真になるまで待つ（書き込みスレッドの処理を待つ）"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_writer_writes_parquet_row_group_without_new_comments(tmp_path):
+    pytest.importorskip("pyarrow")
+    sink = ColumnarSink(str(tmp_path / "comments"), POCOCHA, "123", "parquet", row_group_seconds=0.2)
+    writer = GroupCommitWriter(sink, max_delay_ms=50)
+    writer.start()
+    try:
+        writer.put(POCOCHA_ROWS[0])
+        # コメントが1件だけで後が続かなくても、時間の上限を過ぎれば書き込みスレッドが行グループを書き込む
+        assert wait_until(lambda: sink.buffered == 0 and sink.paths())
+        assert os.path.getsize(sink.paths()[0]) > 0
+    finally:
+        writer.close()
+
+
+def test_writer_rolls_file_without_new_comments(tmp_path):
+    pytest.importorskip("pyarrow")
+    sink = ColumnarSink(str(tmp_path / "comments"), POCOCHA, "123", "arrow", roll_minutes=0.5 / 60)
+    writer = GroupCommitWriter(sink, max_delay_ms=50)
+    writer.start()
+    try:
+        writer.put(POCOCHA_ROWS[0])
+        assert wait_until(lambda: sink.writer is not None)
+        # 新しいコメントがなくても、切り替えの時間を過ぎれば書き込みスレッドがファイルを閉じる
+        assert wait_until(lambda: sink.writer is None)
+    finally:
+        writer.close()
+    assert len(sink.paths()) == 1
+
+
+def test_sqlite_indexes_lookup_by_platform_and_stream(tmp_path):
+    path = str(tmp_path / "comments.db")
+    for platform in (POCOCHA, WHOWATCH):
+        sink = SqliteSink(path, platform, "123")
+        sink.write_rows([row[:1] + row[1:len(platform.fields) + 1] for row in POCOCHA_ROWS[:1]])
+        sink.close()
+    reader = sqlite3.connect(path)
+    # 同じストリームIDでも、プラットフォームごとに分けて検索できる
+    assert reader.execute("SELECT count(*) FROM comments WHERE プラットフォーム = 'pococha' AND ストリーム = '123'"
+                          ).fetchone() == (1,)
+    plan = " ".join(row[-1] for row in reader.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM comments WHERE プラットフォーム = 'whowatch' AND ストリーム = '123'"
+        " ORDER BY タイムスタンプ"))
+    assert "idx_comments_platform_stream_time" in plan
+    reader.close()
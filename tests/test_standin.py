@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""ローカルの代替サーバー（comment_capture.standin）のテスト"""
+
+import socket
+import urllib.request
+
+import pytest
+
+from comment_capture.standin import StandInServer
+
+
+def test_start_in_thread_serves_page():
+    server = StandInServer("whowatch", rate=1, seed=1)
+    url = server.start_in_thread()
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.status == 200
+    finally:
+        server.stop()
+
+
+def test_start_in_thread_raises_when_port_is_busy():
+    with socket.socket() as busy:
+        busy.bind(("127.0.0.1", 0))
+        busy.listen()
+        server = StandInServer("whowatch", rate=1, seed=1)
+        # 待ち受けに失敗した場合は、起動を待ち続けずに例外を返す
+        with pytest.raises(OSError):
+            server.start_in_thread(port=busy.getsockname()[1])
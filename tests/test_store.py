@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""直近のコメントのストア（comment_capture.store）のテスト"""
+
+import json
+from urllib.error import HTTPError
+from urllib.parse import parse_qs
+from urllib.request import urlopen
+
+import pytest
+
+from comment_capture.metrics import MetricsExporter, MetricsRegistry
+from comment_capture.platforms import POCOCHA, WHOWATCH
+from comment_capture.store import CommentStore, RecentComments, query_recent
+
+
+def test_rejects_invalid_size():
+    with pytest.raises(ValueError):
+        RecentComments(capacity=0)
+
+
+def test_ring_keeps_newest_capacity():
+    recent = RecentComments(capacity=3)
+    for index in range(5):
+        recent.add(f"user{index}", f"comment{index}", at=100 + index)
+    assert len(recent) == 3
+    assert [comment["comment"] for comment in recent.last(10)] == ["comment2", "comment3", "comment4"]
+    assert [comment["comment"] for comment in recent.last(2)] == ["comment3", "comment4"]
+
+
+def test_by_user_and_since():
+    recent = RecentComments(capacity=10)
+    for index, username in enumerate(["a", "b", "a", "c", "a"]):
+        recent.add(username, f"comment{index}", at=100 + index)
+    assert [comment["comment"] for comment in recent.by_user("a")] == ["comment0", "comment2", "comment4"]
+    assert [comment["comment"] for comment in recent.by_user("a", count=2)] == ["comment2", "comment4"]
+    assert recent.by_user("unknown") == []
+    assert [comment["comment"] for comment in recent.since(103)] == ["comment3", "comment4"]
+    assert recent.since(200) == []
+
+
+def test_overwritten_text_is_not_returned():
+    # 本文の領域（10バイト）が一杯になったら、上書きされた本文のコメントは取り出さない
+    recent = RecentComments(capacity=10, text_bytes=10)
+    recent.add("a", "12345")
+    recent.add("b", "67890")
+    recent.add("c", "abc")
+    assert [comment["comment"] for comment in recent.last()] == ["67890", "abc"]
+    assert len(recent) == 2
+
+
+def test_text_wraps_around_buffer():
+    recent = RecentComments(capacity=10, text_bytes=8)
+    recent.add("a", "こん")
+    recent.add("b", "ばん")
+    assert recent.last(1)[0]["comment"] == "ばん"
+
+
+def test_users_are_released_when_overwritten():
+    recent = RecentComments(capacity=2)
+    recent.add("a", "x")
+    recent.add("b", "y")
+    recent.add("c", "z")
+    assert recent.unique_users() == 2
+    assert recent.by_user("a") == []
+    # 解放したIDは新しいユーザーに使い回すため、辞書は保持できる件数より大きくならない
+    recent.add("d", "w")
+    assert len(recent.user_names) == 2
+    assert [comment["username"] for comment in recent.last()] == ["c", "d"]
+
+
+def test_add_row_parses_pococha_level():
+    recent = RecentComments()
+    comment = recent.add_row(POCOCHA, ["2024-01-01 12:00:00", "さくら", "Lv.3", "こんばんは", "user"], at=100)
+    assert comment["level"] == 3
+    recent.add_row(POCOCHA, ["2024-01-01 12:00:01", "運営", "", "お知らせ", "system"], at=101)
+    assert [(item["level"], item["type"]) for item in recent.last()] == [(3, "user"), (None, "system")]
+
+
+def test_add_row_without_level():
+    recent = RecentComments()
+    comment = recent.add_row(WHOWATCH, ["2024-01-01 12:00:00", "a", "x"], at=100)
+    assert (comment["username"], comment["level"], comment["comment"], comment["type"]) == ("a", None, "x", "user")
+
+
+def test_comment_store_streams():
+    store = CommentStore(capacity=5)
+    assert store.stream("whowatch", "1") is store.stream("whowatch", "1")
+    store.stream("bigo", "2")
+    assert store.labels() == ["whowatch:1", "bigo:2"]
+
+
+def test_query_filters():
+    recent = RecentComments(capacity=10)
+    for index, username in enumerate(["a", "b", "a", "c", "a"]):
+        recent.add(username, f"comment{index}", at=100 + index)
+    assert [comment["comment"] for comment in recent.query(2)] == ["comment3", "comment4"]
+    assert [comment["comment"] for comment in recent.query(username="a", since=101)] == ["comment2", "comment4"]
+    assert [comment["comment"] for comment in recent.query(1, since=102)] == ["comment4"]
+    assert recent.query(0) == []
+
+
+def test_query_recent_selects_stream():
+    store = CommentStore()
+    store.stream("whowatch", "1").add("a", "x", at=100)
+    result = query_recent(store, parse_qs("n=5&user=a"))
+    assert result["stream"] == "whowatch:1"
+    assert [comment["comment"] for comment in result["comments"]] == ["x"]
+
+    # 複数のストリームがある場合はstreamの指定が必要
+    store.stream("bigo", "2").add("b", "y", at=101)
+    with pytest.raises(ValueError):
+        query_recent(store, {})
+    assert query_recent(store, parse_qs("stream=bigo:2"))["comments"][0]["comment"] == "y"
+    with pytest.raises(KeyError):
+        query_recent(store, parse_qs("stream=bigo:3"))
+    with pytest.raises(ValueError):
+        query_recent(store, parse_qs("stream=bigo:2&n=many"))
+
+
+def test_recent_endpoint():
+    store = CommentStore()
+    store.stream("whowatch", "1").add("a", "こんばんは", at=100)
+    exporter = MetricsExporter(MetricsRegistry(), port=0, store=store)
+    exporter.start()
+    try:
+        base = f"http://127.0.0.1:{exporter.server.server_address[1]}"
+        with urlopen(f"{base}/recent?since=50") as response:
+            result = json.loads(response.read().decode("utf-8"))
+        assert [comment["comment"] for comment in result["comments"]] == ["こんばんは"]
+        with pytest.raises(HTTPError) as error:
+            urlopen(f"{base}/recent?stream=bigo:2")
+        assert error.value.code == 404
+    finally:
+        exporter.close()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""コメントの概要の集計（comment_capture.summary）のテスト"""
+
+import pytest
+
+from comment_capture.platforms import POCOCHA, WHOWATCH
+from comment_capture.summary import CommentSummary, HyperLogLog, SpaceSaving
+
+
+@pytest.mark.parametrize("count", [10, 1000, 50000])
+def test_hyperloglog_estimate_is_close(count):
+    sketch = HyperLogLog()
+    for index in range(count):
+        sketch.add(f"user{index}")
+        # 同じ値を何度追加しても数は変わらない
+        sketch.add(f"user{index}")
+    # 標準誤差は約0.8%のため、3%以内に収まる
+    assert abs(sketch.count() - count) <= max(1, count * 0.03)
+
+
+def test_hyperloglog_empty():
+    assert HyperLogLog().count() == 0
+
+
+def test_space_saving_exact_below_capacity():
+    counter = SpaceSaving(capacity=10)
+    for item in ["a"] * 5 + ["b"] * 3 + ["c"]:
+        counter.add(item)
+    assert counter.most_common(2) == [("a", 5), ("b", 3)]
+
+
+def test_space_saving_keeps_heavy_hitters_over_capacity():
+    counter = SpaceSaving(capacity=20)
+    for index in range(2000):
+        counter.add("heavy" if index % 4 == 0 else f"rare{index}")
+        if index % 10 == 0:
+            counter.add("second")
+    assert len(counter.counts) == 20
+    top = counter.most_common(2)
+    assert [item for item, _ in top] == ["heavy", "second"]
+    # 件数は実際以上になることはあっても、下回ることはない
+    assert top[0][1] >= 500
+
+
+@pytest.mark.parametrize("approximate", [False, True])
+def test_comment_summary_counts_users_only(approximate):
+    summary = CommentSummary(POCOCHA, approximate=approximate, sample_size=2)
+    rows = [
+        ["2024-01-01 12:00:00", "さくら", "Lv.3", "こんばんは", "user"],
+        ["2024-01-01 12:00:01", "運営", "", "ライブが始まりました", "system"],
+        ["2024-01-01 12:00:02", "さくら", "Lv.3", "よろしく", "user"],
+        ["2024-01-01 12:00:03", "たろう", "Lv.1", "はじめまして", "user"],
+    ]
+    for row in rows:
+        summary.add(row)
+    snapshot = summary.snapshot(top=1)
+    assert snapshot["total"] == 4
+    assert snapshot["type_counts"] == {"user": 3, "system": 1}
+    assert snapshot["unique_users"] == 2
+    assert snapshot["top_users"] == [("さくら", 2)]
+    assert snapshot["first_time"] == "2024-01-01 12:00:00"
+    assert snapshot["last_time"] == "2024-01-01 12:00:03"
+    assert snapshot["first_comments"] == rows[:2]
+    assert snapshot["last_comments"] == rows[2:]
+
+
+def test_comment_summary_without_type_field():
+    summary = CommentSummary(WHOWATCH)
+    summary.add(["2024-01-01 12:00:00", "a", "x"])
+    summary.add(["2024-01-01 12:00:01", "b", "y"])
+    assert summary.snapshot()["unique_users"] == 2
+
+
+def test_space_saving_replaces_oldest_smallest_and_tracks_minimum():
+    counter = SpaceSaving(capacity=3)
+    for item in ["a", "a", "b", "c"]:
+        counter.add(item)
+    assert counter.min_count == 1
+    # 件数が最も少ない要素（b、c）のうち、先に1件になったbを置き換えて件数を引き継ぐ
+    counter.add("d")
+    assert counter.counts == {"a": 2, "c": 1, "d": 2}
+    counter.add("e")
+    assert counter.counts == {"a": 2, "d": 2, "e": 2}
+    assert counter.min_count == 2
+    assert counter.buckets == {2: {"a": None, "d": None, "e": None}}
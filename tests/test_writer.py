@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""GroupCommitWriterのテスト"""
+
+import threading
+
+import pytest
+
+from comment_capture.writer import GroupCommitWriter
+
+
+class RecordingSink:
+    """書き込みとフラッシュを記録する出力先"""
+
+    def __init__(self, block=None):
+        self.batches = []
+        self.flushes = []
+        self.closed = False
+        self.block = block
+
+    def write_rows(self, rows):
+        if self.block is not None:
+            self.block.wait()
+        self.batches.append(list(rows))
+
+    def flush(self, fsync=False):
+        self.flushes.append(fsync)
+
+    def close(self):
+        self.closed = True
+
+
+def test_batches_are_bounded_by_max_batch():
+    sink = RecordingSink()
+    writer = GroupCommitWriter(sink, max_batch=3, max_delay_ms=1000)
+    # 書き込みスレッドを開始する前に入れておき、件数の上限で区切られることを確かめる
+    for number in range(7):
+        writer.put([number])
+    writer.start()
+    writer.close()
+    assert [len(batch) for batch in sink.batches] == [3, 3, 1]
+    assert sum(sink.batches, []) == [[number] for number in range(7)]
+    assert sink.closed
+
+
+def test_every_batch_is_flushed_with_fsync_setting():
+    sink = RecordingSink()
+    with GroupCommitWriter(sink, max_delay_ms=1, fsync=True) as writer:
+        writer.put(["a"])
+    assert sink.flushes and all(sink.flushes)
+    assert writer.stats()["written"] == 1
+
+
+def test_drop_policy_counts_rejected_rows():
+    block = threading.Event()
+    sink = RecordingSink(block)
+    writer = GroupCommitWriter(sink, max_batch=1, max_delay_ms=0, queue_size=2, policy="drop")
+    results = [writer.put([number]) for number in range(5)]
+    assert results == [True, True, False, False, False]
+    assert writer.stats()["dropped"] == 3
+    writer.start()
+    block.set()
+    writer.close()
+    assert writer.stats()["written"] == 2
+
+
+def test_write_error_is_recorded_and_capture_continues():
+    class FailingSink(RecordingSink):
+        def write_rows(self, rows):
+            raise OSError("disk full")
+
+    with GroupCommitWriter(FailingSink(), max_delay_ms=1) as writer:
+        assert writer.put(["a"])
+    assert isinstance(writer.error, OSError)
+    assert writer.stats()["written"] == 0
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        GroupCommitWriter(RecordingSink(), policy="wait")